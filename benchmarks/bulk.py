@@ -0,0 +1,55 @@
+#!/usr/bin/python
+"""
+Throughput of pygrafana.bulk.generate() for one dashboard per host with 1, 2, 4, ...
+worker processes up to the number of CPUs.
+
+Usage: python benchmarks/bulk.py [hosts]
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana import bulk
+from pygrafana.dashboard import Dashboard, Row, GraphPanel, SingleStat, Target, set_grafana_version, set_composition
+
+def host_dashboard(host):
+    d = Dashboard("Host %s" % host)
+    for metric in ("cpu", "memory", "disk", "network"):
+        r = Row(metric)
+        for i in range(4):
+            t = Target("%s_%d" % (metric, i))
+            t.add_tag("host", host)
+            g = GraphPanel(title="%s %d" % (metric, i), span=3)
+            g.add_target(t)
+            r.add_panel(g)
+        s = SingleStat(title="%s now" % metric)
+        s.add_target(t)
+        r.add_panel(s)
+        d.add_row(r)
+    return d
+
+if __name__ == "__main__":
+    hosts = 2000
+    if len(sys.argv) > 1:
+        hosts = int(sys.argv[1])
+    set_grafana_version("3.1.1")
+    set_composition("cow")
+    names = ["node%05d" % i for i in range(hosts)]
+    start = time.time()
+    for n in names:
+        host_dashboard(n).get_json()
+    serial = time.time() - start
+    print "serial      %8.1f dashboards/s" % (hosts / serial,)
+    procs = 1
+    while procs <= multiprocessing.cpu_count():
+        start = time.time()
+        count = 0
+        for res in bulk.generate(host_dashboard, names, processes=procs, ordered=False):
+            count += res["status"] == "ok"
+        duration = time.time() - start
+        print "%2d processes %8.1f dashboards/s  speedup %.2f (%d ok)" % (procs, hosts / duration, serial / duration, count,)
+        procs *= 2
@@ -0,0 +1,57 @@
+#!/usr/bin/python
+"""
+Dashboards per second when building every variant with the object model compared to
+rendering a CompiledDashboard with slots for the host name.
+
+Usage: python benchmarks/compiled.py [variants]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.compiled import CompiledDashboard, slot
+from pygrafana.dashboard import Dashboard, Row, GraphPanel, SingleStat, Target, set_grafana_version, set_composition
+
+def host_dashboard(host):
+    d = Dashboard("Host %s" % host)
+    for metric in ("cpu", "memory", "disk", "network"):
+        r = Row(metric)
+        for i in range(4):
+            t = Target("%s_%d" % (metric, i))
+            t.add_tag("host", host)
+            t.set_alias("%s %s" % (host, metric))
+            g = GraphPanel(title="%s %d" % (metric, i), span=3)
+            g.add_target(t)
+            r.add_panel(g)
+        s = SingleStat(title="%s now" % metric)
+        s.add_target(t)
+        r.add_panel(s)
+        d.add_row(r)
+    return d
+
+if __name__ == "__main__":
+    variants = 100000
+    if len(sys.argv) > 1:
+        variants = int(sys.argv[1])
+    set_grafana_version("3.1.1")
+    set_composition("cow")
+    hosts = ["node%05d" % i for i in range(variants)]
+    n = min(variants, 1000)
+    start = time.time()
+    for h in hosts[:n]:
+        host_dashboard(h).get_json()
+    built = n / (time.time() - start)
+    start = time.time()
+    c = CompiledDashboard(host_dashboard(slot("host")))
+    compiled = time.time() - start
+    start = time.time()
+    size = 0
+    for h in hosts:
+        size += len(c.render(host=h))
+    duration = time.time() - start
+    print "object model  %10.1f dashboards/s" % (built,)
+    print "compiled      %10.1f dashboards/s  (%d variants in %.2f s, compile %.3f s, %d slots, %.1f MB)" % \
+          (variants / duration, variants, duration, compiled, len(c.slots), size / 1048576.0,)
@@ -0,0 +1,75 @@
+#!/usr/bin/python
+"""
+Build time and memory of a dashboard with 50 rows x 20 panels x 4 targets in the
+"copy" and "cow" composition modes. Every mode runs in its own process and the
+memory is the growth of the resident set size while building the dashboard.
+
+Usage: python benchmarks/composition.py
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+ROWS = 50
+PANELS = 20
+TARGETS = 4
+
+def rss():
+    """
+    Current resident set size in kB, the maximum one if /proc is not available
+    """
+    try:
+        f = open("/proc/self/statm")
+        try:
+            return int(f.read().split()[1]) * resource.getpagesize() / 1024
+        finally:
+            f.close()
+    except IOError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def build():
+    from pygrafana.dashboard import Dashboard, Row, GraphPanel, Target
+    targets = []
+    for i in range(TARGETS):
+        t = Target("metric%d" % i)
+        t.add_tag("host", "$hostname", operator="=~")
+        t.add_groupBy("tag", "host")
+        targets.append(t)
+    d = Dashboard("Benchmark")
+    for i in range(ROWS):
+        r = Row("Row %d" % i)
+        for j in range(PANELS):
+            g = GraphPanel(title="Panel %d" % j)
+            for t in targets:
+                g.add_target(t)
+            r.add_panel(g)
+        d.add_row(r)
+    return d
+
+def run(mode):
+    from pygrafana import dashboard
+    dashboard.set_grafana_version("3.1.1")
+    dashboard.set_composition(mode)
+    base = rss()
+    start = time.time()
+    d = build()
+    built = time.time() - start
+    mem = rss() - base
+    start = time.time()
+    size = len(d.get_json())
+    serialized = time.time() - start
+    print "%-5s build %7.3f s  get_json %7.3f s  memory %8d kB  (%d bytes JSON)" % (mode, built, serialized, mem, size,)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run(sys.argv[1])
+    else:
+        print "%d rows x %d panels x %d targets" % (ROWS, PANELS, TARGETS,)
+        for mode in ("copy", "cow"):
+            sys.stdout.flush()
+            subprocess.call([sys.executable, os.path.abspath(__file__), mode])
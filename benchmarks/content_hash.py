@@ -0,0 +1,41 @@
+#!/usr/bin/python
+"""
+Time for the content hash of a large dashboard: the first call, a cached call, a call after
+editing one target and hashing the JSON document without the model objects.
+
+Usage: python benchmarks/content_hash.py [rows]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lazy import big_dashboard
+from pygrafana.dashboard import content_hash
+
+if __name__ == "__main__":
+    rows = 400
+    if len(sys.argv) > 1:
+        rows = int(sys.argv[1])
+    d = big_dashboard(rows)
+    s = d.get_json("3.1.1")
+    start = time.time()
+    d.content_hash("3.1.1")
+    first = time.time() - start
+    start = time.time()
+    d.content_hash("3.1.1")
+    cached = time.time() - start
+    d.rows[rows / 2].panels[1].targets[0].set_alias("changed")
+    start = time.time()
+    d.content_hash("3.1.1")
+    edited = time.time() - start
+    start = time.time()
+    content_hash(s)
+    document = time.time() - start
+    print "%d rows, %.1f MB" % (rows, len(s) / 1048576.0,)
+    print "first call    %8.4f s" % (first,)
+    print "cached        %8.4f s" % (cached,)
+    print "after edit    %8.4f s" % (edited,)
+    print "JSON document %8.4f s" % (document,)
@@ -0,0 +1,43 @@
+#!/usr/bin/python
+"""
+Time for the structural diff and patch of large dashboards with a few changed rows,
+compared to parsing the documents only.
+
+Usage: python benchmarks/diff.py [rows]
+"""
+
+import copy
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lazy import big_dashboard
+from pygrafana.diff import diff, patch
+
+if __name__ == "__main__":
+    rows = 400
+    if len(sys.argv) > 1:
+        rows = int(sys.argv[1])
+    for n in (rows, rows * 4):
+        s = big_dashboard(n).get_json("3.1.1")
+        start = time.time()
+        old = json.loads(s)
+        parsed = time.time() - start
+        new = copy.deepcopy(old)
+        rs = new["dashboard"]["rows"]
+        rs[5]["title"] = "renamed"
+        rs[7]["panels"][1]["span"] = 6
+        del rs[n / 2]
+        rs.insert(1, copy.deepcopy(rs[-1]))
+        rs[1]["title"] = "inserted"
+        start = time.time()
+        ops = diff(old, new)
+        diffed = time.time() - start
+        start = time.time()
+        patch(old, ops)
+        patched = time.time() - start
+        print "%5d rows, %.1f MB: json.loads %.3f s  diff %.3f s (%d operations)  patch %.3f s  %s" % \
+              (n, len(s) / 1048576.0, parsed, diffed, len(ops), patched, str(old == new),)
@@ -0,0 +1,48 @@
+#!/usr/bin/python
+"""
+Targets per second for Target.get() with and without the compiled target cache of
+pygrafana.influxql, for Grafana 2.x (with query generation) and 3.x.
+
+Usage: python benchmarks/influxql.py [targets]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana import influxql
+from pygrafana.dashboard import Target, set_grafana_version
+
+def make_targets(n):
+    targets = []
+    for i in range(n):
+        t = Target("cpu_%d" % (i % 20,))
+        t.add_tag("host", "$hostname", operator="=~")
+        t.add_tag("cluster", "prod")
+        t.add_groupBy("tag", "host")
+        t.add_select("mean", [])
+        targets.append(t)
+    return targets
+
+if __name__ == "__main__":
+    n = 50000
+    if len(sys.argv) > 1:
+        n = int(sys.argv[1])
+    for version in ("2.6.1", "3.1.1"):
+        set_grafana_version(version)
+        for size in (0, 10000):
+            influxql.set_cache_size(size)
+            targets = make_targets(n)
+            start = time.time()
+            for t in targets:
+                t.get()
+            duration = time.time() - start
+            print "Grafana %s  cache %-5s %10.1f targets/s" % (version, size > 0 and "on" or "off", n / duration,)
+    influxql.set_cache_size(0)
+    start = time.time()
+    for i in range(n):
+        influxql.build_query("cpu", [], [{"key" : "host", "operator" : "=~", "value" : "/$hostname$/"}],
+                             [{"type" : "tag", "params" : ["host"]}])
+    print "build_query                %10.1f queries/s" % (n / (time.time() - start),)
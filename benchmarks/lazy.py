@@ -0,0 +1,63 @@
+#!/usr/bin/python
+"""
+Time for small edits of a large dashboard document with read_json() and the object model
+compared to LazyDashboard.
+
+Usage: python benchmarks/lazy.py [rows]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.dashboard import Dashboard, Row, GraphPanel, SingleStat, Target, Template, read_json
+from pygrafana.lazy import LazyDashboard
+
+def big_dashboard(rows):
+    d = Dashboard("Cluster")
+    d.add_template(Template("host", "SHOW TAG VALUES WITH KEY = host", datasource="influx"))
+    for n in range(rows):
+        r = Row("node%04d" % n)
+        for metric in ("cpu", "memory", "disk", "network"):
+            t = Target(metric)
+            t.add_tag("host", "node%04d" % n)
+            g = GraphPanel(title=metric, span=3)
+            g.add_target(t)
+            r.add_panel(g)
+        s = SingleStat(title="load")
+        s.add_target(Target("load"))
+        r.add_panel(s)
+        d.add_row(r)
+    return d
+
+def edit_model(s):
+    d = read_json(s)
+    d.templates[0].set_datasource("influx2")
+    d.rows[7].set_title("renamed")
+    d.rows[9].panels[1].targets[0].set_alias("mem")
+    return d.get_json("3.1.1")
+
+def edit_lazy(s):
+    d = LazyDashboard(s)
+    d.get_templates()[0].set_datasource("influx2")
+    d.get_rows()[7].set_field("title", "renamed")
+    d.get_rows()[9].get_panels()[1].get_targets()[0].set_alias("mem")
+    return d.get_json("3.1.1")
+
+if __name__ == "__main__":
+    rows = 180
+    if len(sys.argv) > 1:
+        rows = int(sys.argv[1])
+    s = big_dashboard(rows).get_json("3.1.1")
+    for name, func in (("read_json", edit_model), ("LazyDashboard", edit_lazy)):
+        start = time.time()
+        out = func(s)
+        duration = time.time() - start
+        print "%-14s %8.3f s  (%.1f MB in, %.1f MB out)" % (name, duration, len(s) / 1048576.0, len(out) / 1048576.0,)
+    start = time.time()
+    json.loads(s)
+    print "%-14s %8.3f s" % ("json.loads", time.time() - start,)
+    print "same result:", json.loads(edit_model(s)) == json.loads(edit_lazy(s))
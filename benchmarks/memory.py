@@ -0,0 +1,48 @@
+#!/usr/bin/python
+"""
+Memory per instance of the dashboard model classes. Every class is measured in its own
+process by the growth of the maximum resident set size while holding N copies of an
+instance, including its child objects like Tooltip, Legend and Grid of a GraphPanel.
+
+Usage: python benchmarks/memory.py [N]
+"""
+
+import copy
+import os
+import resource
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+def make(name):
+    from pygrafana import dashboard
+    dashboard.set_grafana_version("3.1.1")
+    if name == "Target":
+        t = dashboard.Target("metric")
+        t.add_tag("host", "$hostname", operator="=~")
+        return t
+    if name == "Template":
+        return dashboard.Template("hostname", "host")
+    if name == "Dashboard":
+        return dashboard.Dashboard("Benchmark")
+    return getattr(dashboard, name)()
+
+def run(name, n):
+    proto = make(name)
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    objs = [copy.deepcopy(proto) for i in range(n)]
+    mem = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base
+    print "%-12s %8d bytes/object" % (name, mem * 1024 / n,)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        run(sys.argv[1], int(sys.argv[2]))
+    else:
+        n = 100000
+        if len(sys.argv) > 1:
+            n = int(sys.argv[1])
+        for name in ("Target", "Legend", "Tooltip", "Grid", "GraphPanel", "SingleStat",
+                     "TextPanel", "Row", "Template", "Dashboard"):
+            sys.stdout.flush()
+            subprocess.call([sys.executable, os.path.abspath(__file__), name, str(n)])
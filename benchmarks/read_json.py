@@ -0,0 +1,57 @@
+#!/usr/bin/python
+"""
+Dashboards per second when loading dumped dashboards with read_json() compared to parsing
+them with json.loads() only. Half of the dumps are Grafana 2.x documents, half 3.x.
+
+Usage: python benchmarks/read_json.py [dashboards]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.dashboard import Dashboard, Row, GraphPanel, SingleStat, Target, read_json
+
+def host_dashboard(host):
+    d = Dashboard("Host %s" % host)
+    for metric in ("cpu", "memory", "disk", "network"):
+        r = Row(metric)
+        for i in range(4):
+            t = Target("%s_%d" % (metric, i))
+            t.add_tag("host", host)
+            t.set_alias("%s %s" % (host, metric))
+            g = GraphPanel(title="%s %d" % (metric, i), span=3)
+            g.add_target(t)
+            r.add_panel(g)
+        s = SingleStat(title="%s now" % metric)
+        s.add_target(t)
+        r.add_panel(s)
+        d.add_row(r)
+    return d
+
+if __name__ == "__main__":
+    count = 2000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    versions = ("2.6.1", "3.1.1")
+    dumps = [host_dashboard("node%05d" % i).get_json(versions[i % 2]) for i in range(count)]
+    size = sum([len(s) for s in dumps]) / 1048576.0
+    start = time.time()
+    for s in dumps:
+        json.loads(s)
+    parsed = time.time() - start
+    start = time.time()
+    for s in dumps:
+        read_json(s)
+    loaded = time.time() - start
+    start = time.time()
+    for i, s in enumerate(dumps):
+        read_json(s).get_json(versions[i % 2])
+    roundtrip = time.time() - start
+    print "%d dashboards, %.1f MB" % (count, size,)
+    print "json.loads          %8.1f dashboards/s" % (count / parsed,)
+    print "read_json           %8.1f dashboards/s  %6.2f MB/s" % (count / loaded, size / loaded,)
+    print "read_json+get_json  %8.1f dashboards/s" % (count / roundtrip,)
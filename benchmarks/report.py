@@ -0,0 +1,33 @@
+#!/usr/bin/python
+"""
+Time for the size and complexity report of a large dashboard compared to encoding it once
+with json.dumps().
+
+Usage: python benchmarks/report.py [rows]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from lazy import big_dashboard
+from pygrafana.report import analyze
+
+if __name__ == "__main__":
+    rows = 400
+    if len(sys.argv) > 1:
+        rows = int(sys.argv[1])
+    d = big_dashboard(rows).get("3.1.1")["dashboard"]
+    start = time.time()
+    s = json.dumps(d)
+    encode = time.time() - start
+    start = time.time()
+    res = analyze(d)
+    report = time.time() - start
+    assert res["bytes"] == len(s)
+    print "%d rows, %d panels, %.1f MB" % (rows, res["counts"]["panels"], len(s) / 1048576.0,)
+    print "json.dumps %8.4f s" % (encode,)
+    print "analyze    %8.4f s" % (report,)
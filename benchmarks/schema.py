@@ -0,0 +1,50 @@
+#!/usr/bin/python
+"""
+Dashboards per second when migrating an archive of Grafana 2.x dashboards to the 3.x layout
+with one worker process and with one per CPU.
+
+Usage: python benchmarks/schema.py [dashboards]
+"""
+
+import json
+import multiprocessing
+import os
+import StringIO
+import sys
+import tarfile
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from read_json import host_dashboard
+from pygrafana.schema import migrate_archive
+
+def write_archive(path, count):
+    tar = tarfile.open(path, "w:gz")
+    for i in range(count):
+        host = "node%05d" % i
+        s = json.dumps({"dashboard" : host_dashboard(host).get("2.6.1")["dashboard"], "meta" : {}})
+        info = tarfile.TarInfo("1/host-%s.json" % host)
+        info.size = len(s)
+        info.mtime = time.time()
+        tar.addfile(info, StringIO.StringIO(s))
+    tar.close()
+
+if __name__ == "__main__":
+    count = 2000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    tmp = tempfile.mkdtemp()
+    src = os.path.join(tmp, "src.tar.gz")
+    dst = os.path.join(tmp, "dst.tar.gz")
+    write_archive(src, count)
+    print "%d dashboards, %.1f MB archive" % (count, os.path.getsize(src) / 1048576.0,)
+    for processes in sorted(set([1, multiprocessing.cpu_count()])):
+        stats = migrate_archive(src, dst, processes=processes, chunksize=32)
+        print "%2d processes  %8.1f dashboards/s  %6.2f MB/s  (%d migrated, %d failed)" % \
+              (processes, stats["rate"], stats["bytes"] / 1048576.0 / stats["duration"],
+               stats["migrated"], stats["failed"],)
+    os.remove(src)
+    os.remove(dst)
+    os.rmdir(tmp)
@@ -0,0 +1,41 @@
+#!/usr/bin/python
+"""
+Dashboards per second when validating a batch of dashboards before an upload, as parsed
+JSON documents and as Dashboard objects, compared to serializing the objects only.
+
+Usage: python benchmarks/validate.py [dashboards]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from read_json import host_dashboard
+from pygrafana.validate import Validator
+
+if __name__ == "__main__":
+    count = 2000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    hosts = ["node%05d" % i for i in range(count)]
+    docs = [json.loads(host_dashboard(h).get_json("3.1.1")) for h in hosts]
+    v = Validator("3.1.1")
+    start = time.time()
+    failed = v.validate_many(docs)
+    parsed = time.time() - start
+    dashboards = [host_dashboard(h) for h in hosts]
+    start = time.time()
+    for d in dashboards:
+        d.get("3.1.1")
+    serialized = time.time() - start
+    dashboards = [host_dashboard(h) for h in hosts]
+    start = time.time()
+    failed_objects = v.validate_many(dashboards)
+    objects = time.time() - start
+    print "%d dashboards, %d/%d invalid" % (count, len(failed), len(failed_objects),)
+    print "validate documents  %8.1f dashboards/s" % (count / parsed,)
+    print "validate objects    %8.1f dashboards/s" % (count / objects,)
+    print "get() only          %8.1f dashboards/s" % (count / serialized,)
@@ -1,3 +1,3 @@
 #!/usr/bin/env python
 
-__all__ = ["dashboard", "api"]
+__all__ = ["dashboard", "api", "fleet", "mirror", "backup", "migration", "reconcile", "bulk", "compiled", "influxql", "lazy", "schema", "validate", "diff", "split", "lint", "load", "compact", "report"]
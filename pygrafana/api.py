@@ -12,6 +12,7 @@ except ImportError:
     import urllib
 
 import dashboard
+import validate
 
 
 global_valid_themes = ["light", "dark"]
@@ -154,12 +155,14 @@ class Connection(object):
             data = json.dumps(data)
         elif isinstance(data, dict):
             data = json.dumps(data)
-        elif not data:
+        elif not data and method != 'DELETE':
             method = 'GET'
         try:
             #opener = urllib2.build_opener(urllib2.HTTPHandler)
             if data and method != 'GET':
                 req = RequestWithMethod(method=method, url=url, data=str(data), headers=self.headers)
+            elif method == 'DELETE':
+                req = RequestWithMethod(method=method, url=url, headers=self.headers)
             else:
                 req = urllib2.Request(url, headers=self.headers)
             resp = urllib2.urlopen(req, timeout=self.timeout)
@@ -407,11 +410,8 @@ class Connection(object):
             all_types = self.get_ds_types()
             avail = False
             if len(all_types) > 0:
-                for k in all_types.keys():
-                    if k.has_key("type") and k["type"] == typ:
-                        avail = True
-                        break
-            elif grafana_version.startswith("3"):
+                avail = all_types.has_key(typ)
+            elif self.grafana_version and self.grafana_version.startswith("3"):
                 avail= True
             if avail:
                 d.update({"type" : typ})
@@ -437,7 +437,7 @@ class Connection(object):
             d.update({"basicAuthUser" : basicAuthUser})
         if basicAuthPassword and isinstance(basicAuthPassword, str):
             d.update({"basicAuthPassword" : basicAuthPassword})
-        err, estr, data = self._put(self.url+"datasources/%s" % (str(dsid),))
+        err, estr, data = self._put(self.url+"datasources/%s" % (str(dsid),), d)
         if err == 200:
             return data
         else:
@@ -506,11 +506,9 @@ class Connection(object):
         elif data.has_key("message"):
             print "ERROR",data["message"]
         return False
-    def add_dashboard(self, d, org=None): 
+    def add_dashboard(self, d, org=None, check=False, budget=None):
         if not self.connected:
             return self.empty_json
-        if org:
-            self.change_active_org(org)
         out = json.loads("{}")
         if isinstance(d, str) or isinstance(d, dict):
             try:
@@ -519,9 +517,19 @@ class Connection(object):
                 return 400, "Input not a valid JSON document"
         else:
             try:
-                out = d.get_json()
+                out = d.get(self.grafana_version)
             except:
                 return 400, "Input not a valid pygrafana Dashboard object"
+        if check:
+            errors = validate.validate(out)
+            if len(errors) > 0:
+                return 400, "Dashboard not valid: %s" % ("; ".join(["%s: %s" % e for e in errors]),)
+        if budget:
+            errors = budget.check(out)
+            if len(errors) > 0:
+                return 400, "Dashboard exceeds budget: %s" % ("; ".join(["%s: %s" % e for e in errors]),)
+        if org:
+            self.change_active_org(org)
         err, estr, data = self._post(self.url+"dashboards/db", json.dumps(out))
         if err == 200:
             return data
@@ -610,6 +618,23 @@ class Connection(object):
                 for e in d:
                     res.append(e)
         return res
+    def get_dashboards(self, oid=None):
+        """
+        Returns the search entries of all dashboards in the current organization
+
+        :param oid: Organization ID to switch to before listing
+        :return list of search entries with 'id', 'title', 'uri' and 'tags'
+        """
+        if not self.connected:
+            return self.empty_json
+        if oid:
+            self.change_active_org(oid)
+        err, estr, data = self._get(self.url+"search/")
+        if err == 200:
+            return data
+        elif data.has_key("message"):
+            print "ERROR",data["message"]
+        return self.empty_json
     def star_dashboard_by_id(self, did, oid=None):
         if not self.connected:
             return self.empty_json
@@ -858,7 +883,7 @@ class Connection(object):
             print estr
         return self.empty_json
     def del_uid_from_orgid(self, uid, oid):
-        err, estr, data = self._del(self.url+"orgs/%s/users/%s", (str(oid), str(uid),))
+        err, estr, data = self._del(self.url+"orgs/%s/users/%s" % (str(oid), str(uid),))
         if err == 200:
             return data
         else:
@@ -904,7 +929,7 @@ class Connection(object):
             d.update({"loginOrEmail" : login})
         elif email:
             d.update({"loginOrEmail" : email})
-        err, estr, data = self._post(self.url+"orgs/%s/users" % (str(oid), str(uid),), d)
+        err, estr, data = self._post(self.url+"orgs/%s/users" % (str(oid),), d)
         if err == 200:
             return data
         else:
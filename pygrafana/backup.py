@@ -0,0 +1,161 @@
+#!/usr/bin/python
+
+import json
+import os
+import tarfile
+import time
+import StringIO
+
+from parallel import run_parallel
+import changes
+
+
+class Backup(object):
+    """
+    Dashboard backup of a Grafana instance into a directory of tar.gz archives plus a manifest
+
+    The manifest (manifest.json) records for every dashboard its id, title, tags, version
+    and the archive holding its latest copy. An incremental run only archives dashboards
+    which are new or changed compared to the manifest and writes them into a new delta archive.
+    The search listing of Grafana has no version, so all dashboards are downloaded to detect
+    changes unless verify=False is given.
+    """
+    def __init__(self, con, directory, workers=8, timeout=None):
+        """
+        Construct a new Backup object
+
+        :param con: Connection object
+        :param directory: Directory for the archives and the manifest
+        :param workers: Number of parallel dashboard downloads
+        :param timeout: Deadline per dashboard download in seconds
+        """
+        self.con = con
+        self.directory = directory
+        self.workers = workers
+        self.timeout = timeout
+        self.manifest_file = os.path.join(directory, "manifest.json")
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_file):
+            return {"dashboards" : {}, "archives" : []}
+        f = open(self.manifest_file)
+        try:
+            return json.load(f)
+        finally:
+            f.close()
+    def _save_manifest(self, manifest):
+        tmp = self.manifest_file + ".tmp"
+        f = open(tmp, "w")
+        try:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        finally:
+            f.close()
+        os.rename(tmp, self.manifest_file)
+    def run(self, incremental=True, oids=None, verify=True):
+        """
+        Perform a backup.
+
+        :param incremental: Only archive dashboards that are new or changed according to the manifest
+        :param oids: List of organization IDs to back up, defaults to all organizations
+        :param verify: Download all dashboards and archive the ones with a different id, title, tags, version or update time. Otherwise only dashboards with a changed id, title or tags in the search listing are downloaded and edits of the content are missed.
+        :return dict with the archive name, the number of listed, fetched, archived and removed dashboards and the 'errors' of organizations that were skipped. The manifest entries of skipped organizations are kept.
+        """
+        if not self.con.is_connected():
+            print "Connection not established"
+            return {}
+        if incremental and not verify:
+            changes.warn_unverified()
+        start = time.time()
+        manifest = self.load_manifest()
+        if not incremental:
+            manifest = {"dashboards" : {}, "archives" : manifest.get("archives", [])}
+        old = manifest["dashboards"]
+        current = self.con.get_current_org()
+        if not oids:
+            oids = [o["id"] for o in self.con.get_orgs() if o.has_key("id")]
+            if len(oids) == 0 and current.has_key("id"):
+                oids = [current["id"]]
+        archive = "dashboards-%s.tar.gz" % (time.strftime("%Y%m%d-%H%M%S"),)
+        i = 1
+        while os.path.exists(os.path.join(self.directory, archive)) or archive in manifest["archives"]:
+            archive = "dashboards-%s-%d.tar.gz" % (time.strftime("%Y%m%d-%H%M%S"), i,)
+            i += 1
+        tar = tarfile.open(os.path.join(self.directory, archive), "w:gz")
+        seen = {}
+        stats = {"archive" : archive, "listed" : 0, "fetched" : 0, "archived" : 0, "removed" : 0,
+                 "errors" : []}
+        for oid in oids:
+            listing = None
+            if not self.con.change_active_org(oid):
+                error = "Cannot switch to organization %d" % (oid,)
+            else:
+                listing = self.con.get_dashboards()
+                error = "Listing the dashboards of organization %d failed" % (oid,)
+            if not isinstance(listing, list):
+                print error
+                stats["errors"].append(error)
+                for key in old.keys():
+                    if key.startswith("%d/" % (oid,)):
+                        seen[key] = True
+                continue
+            entries = {}
+            for e in listing:
+                if e.get("type", "dash-db") == "dash-db" and e.has_key("uri"):
+                    entries["%d/%s" % (oid, e["uri"].split("/")[-1])] = e
+            stats["listed"] += len(entries)
+            for key in entries.keys():
+                seen[key] = True
+            fetch = changes.get_fetch(entries, old, verify)
+            res = run_parallel(lambda key: self.con.get_dashboard(key.split("/", 1)[1]),
+                               fetch, workers=self.workers, timeout=self.timeout)
+            for key, r in zip(fetch, res):
+                if r["status"] != "ok" or not r["result"].has_key("dashboard"):
+                    print "Fetching dashboard %s failed: %s" % (key, r["error"],)
+                    continue
+                stats["fetched"] += 1
+                state = changes.dashboard_state(entries[key], r["result"])
+                if not changes.is_changed(state, old.get(key)):
+                    continue
+                data = json.dumps(r["result"])
+                info = tarfile.TarInfo(key + ".json")
+                info.size = len(data)
+                info.mtime = time.time()
+                tar.addfile(info, StringIO.StringIO(data))
+                state["archive"] = archive
+                old[key] = state
+                stats["archived"] += 1
+        tar.close()
+        if current.has_key("id"):
+            self.con.change_active_org(current["id"])
+        for key in old.keys():
+            if not seen.has_key(key):
+                del old[key]
+                stats["removed"] += 1
+        if stats["archived"] > 0:
+            manifest["archives"].append(archive)
+        else:
+            os.remove(os.path.join(self.directory, archive))
+            stats["archive"] = None
+        manifest["updated"] = time.time()
+        self._save_manifest(manifest)
+        stats["duration"] = time.time() - start
+        return stats
+    def get_dashboard(self, oid, slug):
+        """
+        Read the latest backed up copy of a dashboard
+
+        :param oid: Organization ID
+        :param slug: Dashboard slug
+        :return dict as returned by Connection.get_dashboard() or empty dict
+        """
+        key = "%d/%s" % (int(oid), slug,)
+        manifest = self.load_manifest()
+        if not manifest["dashboards"].has_key(key):
+            return {}
+        tar = tarfile.open(os.path.join(self.directory, manifest["dashboards"][key]["archive"]), "r:gz")
+        try:
+            f = tar.extractfile(key + ".json")
+            return json.loads(f.read())
+        finally:
+            tar.close()
@@ -0,0 +1,74 @@
+#!/usr/bin/python
+
+import json
+import multiprocessing
+import pickle
+import time
+
+import dashboard
+from parallel import imap_bounded
+
+
+def _build(job):
+    """
+    Runs in the worker processes: calls the factory and serializes its result
+    """
+    index, factory, params, version, composition = job
+    start = time.time()
+    res = {"index" : index, "params" : params, "status" : "error",
+           "result" : None, "error" : None, "duration" : 0.0}
+    try:
+        dashboard.set_grafana_version(version)
+        dashboard.set_composition(composition)
+        d = factory(params)
+        if hasattr(d, "get_json"):
+            d = d.get_json()
+        elif not isinstance(d, basestring):
+            d = json.dumps(d)
+        res["result"] = d
+        res["status"] = "ok"
+    except Exception as e:
+        res["error"] = "%s: %s" % (e.__class__.__name__, e,)
+    res["duration"] = time.time() - start
+    return res
+
+
+def generate(factory, params, processes=None, ordered=True, chunksize=8):
+    """
+    Builds and serializes dashboards in a pool of processes
+
+    factory(p) is called for every parameter set p and has to return a Dashboard object,
+    a dictionary or a JSON string. The factory and the parameter sets are sent to the worker
+    processes, so they must be picklable, i.e. the factory has to be a module-level function.
+    The Grafana version and composition mode of the calling process are used in the workers.
+    On platforms without fork() the calling script must protect its main code with
+    if __name__ == "__main__".
+
+    The parameter sets are read in chunks as the results are consumed, see
+    parallel.imap_bounded().
+
+    :param factory: Module-level function building one dashboard from a parameter set
+    :param params: Iterable with parameter sets, read in chunks while the results are consumed
+    :param processes: Number of worker processes, defaults to the number of CPUs
+    :param ordered: Return the results in input order, otherwise as they complete
+    :param chunksize: Number of parameter sets sent to a worker at once
+    :raises ValueError: if the factory is not picklable
+    :return generator of dicts {'index': ..., 'params': ..., 'status': 'ok'/'error', 'result': JSON string, 'error': ..., 'duration': ...}
+    """
+    try:
+        pickle.dumps(factory, 2)
+    except Exception as e:
+        raise ValueError("Factory %s cannot be sent to the worker processes: %s" % (factory, e,))
+    version = dashboard.grafana_version
+    composition = dashboard.composition
+    jobs = ((i, factory, p, version, composition) for i, p in enumerate(params))
+    if not processes:
+        processes = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes)
+    try:
+        for res in imap_bounded(pool, _build, jobs, processes, chunksize, ordered):
+            yield res
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,75 @@
+#!/usr/bin/python
+
+# Change detection of dashboards shared by Mirror and Backup. The search listing of
+# Grafana 2.x/3.x contains the id, title and tags of a dashboard but no version, so content
+# edits are only visible after downloading a dashboard. Dashboards are compared by their
+# state {'id', 'title', 'tags', 'version', 'updated'}, 'version' and 'updated' come from the
+# downloaded document and its meta data.
+
+
+def listing_state(entry):
+    """
+    Returns the state known from a search listing entry, 'version' and 'updated' are None
+    unless the listing provides them
+    """
+    return {"id" : entry.get("id"), "title" : entry.get("title"),
+            "tags" : sorted(entry.get("tags", [])), "version" : entry.get("version"),
+            "updated" : entry.get("updated")}
+
+def dashboard_state(entry, data):
+    """
+    Returns the state of a downloaded dashboard
+
+    :param entry: Search listing entry of the dashboard
+    :param data: Result of Connection.get_dashboard() with 'dashboard' and 'meta'
+    :return dict with 'id', 'title', 'tags', 'version' and 'updated'
+    """
+    dash = data.get("dashboard", {})
+    state = listing_state(entry)
+    state["version"] = dash.get("version")
+    state["updated"] = data.get("meta", {}).get("updated")
+    return state
+
+def is_listing_changed(entry, old):
+    """
+    Compares a search listing entry with the stored state. Edits that keep the id, title
+    and tags are not detected.
+    """
+    if not old:
+        return True
+    new = listing_state(entry)
+    for k in ("id", "title"):
+        if new[k] != old.get(k):
+            return True
+    if new["tags"] != sorted(old.get("tags", [])):
+        return True
+    if new["version"] != None and new["version"] != old.get("version"):
+        return True
+    return False
+
+def is_changed(state, old):
+    """
+    Compares the state of a downloaded dashboard with the stored state
+    """
+    if not old:
+        return True
+    for k in ("id", "title", "version", "updated"):
+        if state[k] != old.get(k):
+            return True
+    return state["tags"] != sorted(old.get("tags", []))
+
+def get_fetch(entries, old, verify=True):
+    """
+    Returns the keys of the dashboards to download
+
+    :param entries: Dictionary key -> search listing entry
+    :param old: Dictionary key -> stored state
+    :param verify: Download all dashboards, otherwise only new ones and the ones with changes in the listing
+    :return sorted list of keys
+    """
+    if verify:
+        return sorted(entries.keys())
+    return sorted([k for k in entries.keys() if is_listing_changed(entries[k], old.get(k))])
+
+def warn_unverified():
+    print "WARNING: Without verify only changes of the id, title and tags of dashboards are detected, edits of the content are skipped"
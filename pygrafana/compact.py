@@ -0,0 +1,216 @@
+#!/usr/bin/python
+
+import copy
+import re
+
+import dashboard
+from dashboard import Dashboard, Template, canonical_json
+from lint import _literal_regex_pattern, _str
+
+
+# Members containing the entity that are rewritten with the template variable, besides the
+# tag values
+text_fields = frozenset(["title", "alias", "query", "target"])
+
+
+def _tag_entity(value):
+    """
+    Returns the literal value of a tag value like web1 or /^web1$/ or None
+    """
+    value = _str(value)
+    m = _literal_regex_pattern.match(value)
+    if m:
+        value = m.group(1)
+    elif value.startswith("/"):
+        return None
+    if not value or "$" in value or "[[" in value:
+        return None
+    return value
+
+def _get_tags(o, tags):
+    if isinstance(o, dict):
+        for k, v in o.iteritems():
+            if k == "tags" and isinstance(v, list) and o.has_key("measurement"):
+                tags.extend([t for t in v if isinstance(t, dict)])
+            else:
+                _get_tags(v, tags)
+    elif isinstance(o, list):
+        for v in o:
+            _get_tags(v, tags)
+    return tags
+
+def get_entities(o):
+    """
+    Returns the tags with exactly one value in all targets of a row or panel
+
+    :param o: Row or panel dictionary
+    :return dict tag key -> value
+    """
+    values = {}
+    for t in _get_tags(o, []):
+        key = _str(t.get("key", ""))
+        values.setdefault(key, set()).add(_tag_entity(t.get("value", "")))
+    entities = {}
+    for key, v in values.iteritems():
+        if len(v) == 1 and None not in v:
+            entities[key] = v.pop()
+    return entities
+
+def _substitute(o, key, entity, pattern, name):
+    """
+    Returns a copy of o with the entity replaced by the variable name
+    """
+    if isinstance(o, dict):
+        out = {}
+        for k, v in o.iteritems():
+            if k in text_fields and isinstance(v, basestring):
+                out[k] = pattern.sub("$" + name, _str(v))
+            elif k == "tags" and isinstance(v, list) and o.has_key("measurement"):
+                out[k] = [_substitute_tag(t, key, entity, name) for t in v]
+            else:
+                out[k] = _substitute(v, key, entity, pattern, name)
+        return out
+    elif isinstance(o, list):
+        return [_substitute(v, key, entity, pattern, name) for v in o]
+    return o
+
+def _substitute_tag(t, key, entity, name):
+    if not isinstance(t, dict) or _str(t.get("key", "")) != key or _tag_entity(t.get("value", "")) != entity:
+        return t
+    t = dict(t)
+    if _str(t["value"]).startswith("/"):
+        t["value"] = "/^$%s$/" % (name,)
+    else:
+        t["value"] = "$" + name
+    return t
+
+def _count_panels(d):
+    return sum([len(r.get("panels", [])) for r in d.get("rows", [])])
+
+
+class Compactor(object):
+    """
+    Collapses consecutive rows, or panels within a row, that only differ in the value of one
+    tag into one element repeated by a multi-value template. Grafana renders the repeated
+    element once per selected value, so the stored dashboard shrinks by the number of
+    repetitions.
+
+    Elements are collapsed if they have a tag key with exactly one value in all their targets
+    and are equal after replacing this value by the variable in the tag values, titles,
+    aliases and queries (ids are ignored). The new templates are of type 'custom', named
+    like the tag key and have all values selected, so the dashboard shows the same panels as
+    before.
+    """
+    def __init__(self, min_repeat=2, version=None, panels=True):
+        """
+        Construct a new Compactor object
+
+        :param min_repeat: Minimal number of equal consecutive elements to collapse
+        :param version: Grafana version string used for Dashboard objects
+        :param panels: Also collapse panels within the rows
+        """
+        self.min_repeat = min_repeat
+        self.version = version
+        self.panels = panels
+    def _load(self, d):
+        if isinstance(d, Dashboard):
+            return d._get_shared(self.version)["dashboard"]
+        d = dashboard._load(d)
+        if isinstance(d, dict) and isinstance(d.get("dashboard"), dict):
+            d = d["dashboard"]
+        return d
+    def _get_signature(self, o, key, entity):
+        pattern = re.compile(r"(?<!\w)%s(?!\w)" % (re.escape(entity),))
+        return canonical_json(_substitute(o, key, entity, pattern, key))
+    def _find_run(self, elements, entities, i):
+        """
+        Returns the tag key and the values of the longest run of collapsible elements
+        starting at index i or None
+        """
+        best = None
+        if elements[i].get("repeat"):
+            return None
+        for key, entity in sorted(entities[i].iteritems()):
+            signature = self._get_signature(elements[i], key, entity)
+            run = [entity]
+            for j in range(i + 1, len(elements)):
+                x = entities[j].get(key)
+                if x == None or x in run or elements[j].get("repeat"):
+                    break
+                if self._get_signature(elements[j], key, x) != signature:
+                    break
+                run.append(x)
+            if len(run) >= self.min_repeat and (best == None or len(run) > len(best[1])):
+                best = (key, run)
+        return best
+    def _get_name(self, key, used):
+        base = re.sub(r"\W", "_", key) or "entity"
+        name = base
+        n = 1
+        while name in used:
+            n += 1
+            name = "%s_%d" % (base, n,)
+        used.add(name)
+        return name
+    def get_template(self, name, values):
+        """
+        Returns the dictionary of a multi-value template with all values selected
+        """
+        t = Template(name, ",".join(values), multi=True, refresh=False, type="custom", includeAll=True,
+                     current={"text" : " + ".join(values), "value" : list(values)})
+        t.add_option([{"text" : v, "value" : v, "selected" : True} for v in values])
+        return t.get(self.version)
+    def _compact(self, elements, path, used, templates, repeats):
+        entities = [get_entities(e) for e in elements]
+        out = []
+        i = 0
+        while i < len(elements):
+            run = self._find_run(elements, entities, i)
+            if run == None:
+                out.append(elements[i])
+                i += 1
+                continue
+            key, values = run
+            name = self._get_name(key, used)
+            pattern = re.compile(r"(?<!\w)%s(?!\w)" % (re.escape(values[0]),))
+            x = _substitute(elements[i], key, values[0], pattern, name)
+            x["repeat"] = name
+            templates.append(self.get_template(name, values))
+            repeats.append(("%s[%d]" % (path, len(out),), name, values))
+            out.append(x)
+            i += len(values)
+        return out
+    def compact(self, d):
+        """
+        Returns a compacted copy of a dashboard
+
+        :param d: Dashboard object, dictionary or JSON string, with or without the API wrapper
+        :return tuple with the dashboard dictionary and a report with 'bytes_before', 'bytes_after', 'rows_before', 'rows_after', 'panels_before', 'panels_after' and the 'repeats' as list of (path, variable, values)
+        """
+        d = copy.deepcopy(self._load(d))
+        report = {"bytes_before" : len(canonical_json(d)), "rows_before" : len(d.get("rows", [])),
+                  "panels_before" : _count_panels(d), "repeats" : []}
+        templating = d.setdefault("templating", {})
+        templating.setdefault("list", [])
+        used = set([_str(t.get("name", "")) for t in templating["list"]])
+        templates = []
+        rows = self._compact(d.get("rows", []), "rows", used, templates, report["repeats"])
+        if self.panels:
+            for i, r in enumerate(rows):
+                panels = self._compact(r.get("panels", []), "rows[%d].panels" % (i,), used, templates, report["repeats"])
+                if len(panels) < len(r.get("panels", [])):
+                    r = dict(r)
+                    r["panels"] = panels
+                    rows[i] = r
+        d["rows"] = rows
+        templating["list"] = templating["list"] + templates
+        report["bytes_after"] = len(canonical_json(d))
+        report["rows_after"] = len(rows)
+        report["panels_after"] = _count_panels(d)
+        return d, report
+
+def compact(d, min_repeat=2, version=None):
+    """
+    Collapse repeated rows and panels of a dashboard, see Compactor.compact()
+    """
+    return Compactor(min_repeat, version).compact(d)
@@ -0,0 +1,181 @@
+#!/usr/bin/python
+
+import json
+import re
+from json.encoder import encode_basestring_ascii
+
+
+# Slots are delimited by the control characters STX and ETX, they do not occur in dashboards
+# and do not collide with Grafana's $name, [[name]] and {{label}} syntax
+_open = "\x02"
+_close = "\x03"
+_name_pattern = re.compile(r"^\w+$")
+# Slot in a string of the decoded dashboard and in the serialized JSON document
+_slot_pattern = re.compile(r"\x02(\w+)\x03")
+_encoded_slot_pattern = re.compile(r"\\u0002(\w+)\\u0003")
+
+# Members with InfluxQL query text
+query_fields = frozenset(["query"])
+
+_regex_special = re.compile(r"([\\.+*?()|\[\]{}^$/])")
+
+
+def slot(name):
+    """
+    Returns the marker of a slot to put in any string of a dashboard
+
+    :param name: Name of the slot, only letters, digits and _
+    :raises ValueError: if the name is invalid
+    :return string
+    """
+    if not _name_pattern.match(name):
+        raise ValueError("Invalid slot name %s" % (name,))
+    return _open + name + _close
+
+def _escape_string(value):
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+def _escape_identifier(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+def _escape_regex(value):
+    return _regex_special.sub(r"\\\1", value)
+
+# Escaping of the values per context of the slot, applied before the JSON escaping
+_escapes = {"text" : lambda v: v, "string" : _escape_string,
+            "identifier" : _escape_identifier, "regex" : _escape_regex}
+
+def _escape(value, context="text"):
+    """
+    Returns value escaped for the context of the slot and encoded as content of a JSON
+    string, i.e. without the surrounding quotes
+    """
+    if not isinstance(value, basestring):
+        value = unicode(value)
+    return encode_basestring_ascii(_escapes[context](value))[1:-1]
+
+def _query_contexts(s):
+    """
+    Returns the contexts of the slots in InfluxQL query text: 'string' within '...',
+    'identifier' within "...", 'regex' within /.../ after =~ or !~, 'text' otherwise
+    """
+    contexts = []
+    states = {None : "text", "'" : "string", '"' : "identifier", "/" : "regex"}
+    state = None
+    i = 0
+    while i < len(s):
+        m = _slot_pattern.match(s, i)
+        if m:
+            contexts.append(states[state])
+            i = m.end()
+            continue
+        c = s[i]
+        if state == None:
+            if c in "'\"":
+                state = c
+            elif c == "/" and s[:i].rstrip().endswith(("=~", "!~")):
+                state = c
+        elif c == "\\":
+            i += 1
+        elif c == state:
+            state = None
+        i += 1
+    return contexts
+
+def _string_contexts(s, key):
+    n = len(_slot_pattern.findall(s))
+    if n == 0:
+        return []
+    if key in query_fields:
+        return _query_contexts(s)
+    if key == "value" and len(s) > 1 and s.startswith("/") and s.endswith("/"):
+        return ["regex"] * n
+    return ["text"] * n
+
+def _get_contexts(o, key, contexts):
+    """
+    Collects the contexts of the slots in o in the order of the JSON encoding
+    """
+    if isinstance(o, dict):
+        for k, v in o.iteritems():
+            _get_contexts(k, None, contexts)
+            _get_contexts(v, k, contexts)
+    elif isinstance(o, list):
+        for v in o:
+            _get_contexts(v, key, contexts)
+    elif isinstance(o, basestring):
+        contexts.extend(_string_contexts(o, key))
+    return contexts
+
+
+class CompiledDashboard(object):
+    """
+    Dashboard serialized once into JSON fragments with named slots in between
+
+    Slots are marked with slot(name) in any string of the dashboard, e.g. in titles,
+    measurement names, tag values or aliases. The dashboard is serialized only once, so
+    render() just escapes the values and joins them with the pre-encoded fragments.
+    The values are escaped for the context of the slot: within InfluxQL query text for
+    the string literal, identifier or regular expression around the slot, within tag
+    values like /^...$/ for the regular expression, and always for JSON.
+    """
+    def __init__(self, d):
+        """
+        Construct a new CompiledDashboard object
+
+        :param d: Dashboard object, dictionary or JSON string containing slot markers
+        """
+        if hasattr(d, "_get_shared"):
+            d = d._get_shared()
+        elif isinstance(d, basestring):
+            d = json.loads(d)
+        data = json.dumps(d)
+        parts = _encoded_slot_pattern.split(data)
+        self.fragments = parts[0::2]
+        self.slots = parts[1::2]
+        self.contexts = _get_contexts(d, None, [])
+        if len(self.contexts) != len(self.slots):
+            self.contexts = ["text"] * len(self.slots)
+        self.names = []
+        for name in self.slots:
+            if name not in self.names:
+                self.names.append(name)
+        self._pairs = zip(self.slots, self.contexts, self.fragments[1:])
+        self._keys = sorted(set(zip(self.slots, self.contexts)))
+    def get_slots(self):
+        return list(self.names)
+    def render(self, values={}, **kwargs):
+        """
+        Returns the JSON document with the slots filled
+
+        :param values: Dictionary slot name -> value, values are converted with unicode()
+        :param kwargs: More slot values as keyword arguments
+        :raises ValueError: if a slot has no value
+        :return JSON string
+        """
+        if kwargs:
+            values = dict(values, **kwargs)
+        for name in self.names:
+            if not values.has_key(name):
+                raise ValueError("No value for slot %s" % (name,))
+        enc = {}
+        for name, context in self._keys:
+            enc[(name, context)] = _escape(values[name], context)
+        out = [self.fragments[0]]
+        for name, context, frag in self._pairs:
+            out.append(enc[(name, context)])
+            out.append(frag)
+        return "".join(out)
+    def render_many(self, values):
+        """
+        Returns a generator with a rendered JSON document for every set of slot values
+
+        :param values: Iterable of dictionaries slot name -> value
+        :return generator of JSON strings
+        """
+        for v in values:
+            yield self.render(v)
+    def __str__(self):
+        return "CompiledDashboard(slots=%s, fragments=%d)" % (str(self.names), len(self.fragments),)
+    def __repr__(self):
+        return self.__str__()
@@ -1,44 +1,77 @@
 #!/usr/bin/python
 
 import copy
+import datetime
+import hashlib
 import json
 import re
+import threading
+import weakref
+
+import influxql
 
 grafana_version = "2.6.1"
 
+# Patterns used by the setters and the validate module, compiled once
+_version_pattern = re.compile(r"\d+\.\d+\.\d+")
+_major_pattern = re.compile(r"(\d+)(\.|$)")
+_relative_time_pattern = re.compile(r"now(?:-(\d+)([smhdwMy]))?(?:/([smhdwMy]))?$")
+_absolute_time_pattern = re.compile(r"(\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(\.\d+)?Z?|\d+)$")
+_rgba_pattern = re.compile(r"rgba\((\d+),\s*(\d+),\s*(\d+),\s*([01]?(?:\.\d+)?)\)$")
+_rgb_pattern = re.compile(r"rgb\((\d+),\s*(\d+),\s*(\d+)\)$")
+_hex_color_pattern = re.compile(r"#[0-9a-fA-F]{6}$")
+_height_pattern = re.compile(r"\d+(px|cm)?$")
+_font_size_pattern = re.compile(r"\d+%$")
+
 def set_grafana_version(version):
-    if version and re.match("\d+\.\d+\.\d+", version):
+    if isinstance(version, str) and _version_pattern.match(version):
         global grafana_version
         grafana_version = version
 
+_majors = {}
+def get_major(version=None):
+    """
+    Returns the major Grafana version the serializers use for a version string. The
+    get() functions of all classes accept a version, so one process can create dashboards
+    for Grafana 2.x and 3.x at the same time.
+
+    :param version: Grafana version string like '3.1.1', defaults to the version set with set_grafana_version()
+    :raises ValueError: if the version string is not valid
+    :return '2' or '3'
+    """
+    if version == None:
+        version = grafana_version
+    if not _majors.has_key(version):
+        m = _major_pattern.match(str(version))
+        if not m:
+            raise ValueError("Invalid Grafana version %s" % (version,))
+        if int(m.group(1)) < 3:
+            _majors[version] = "2"
+        else:
+            _majors[version] = "3"
+    return _majors[version]
+
 # s (seconds), m (minutes), h (hours), d (days), w (weeks), M (months), y (years
 time_limits = { "s" : 60, "m" : 60, "h" : 24, "d" : 31, "w": 52, "M" : 12, "y" : 100}
 def check_timerange(t):
     """
     Checks a timerange string for validity
     
-    Checks if string is anything like now-1h, or now-6h/h up to a date like 2016-09-17 04:31:00
+    Checks if string is anything like now, now-1h, now/d or now-6h/h up to a date like
+    2016-09-17 04:31:00 or a timestamp in milliseconds
     
     :param t: timerange string
     :return True/False
     """
     if isinstance(t, str):
-        if time == "now":
-            return True
-        if "now" in t:
-            m = re.match("now[-]([\d]+[smhdwMy])$")
-            if m:
-                return True
-            m = re.match("now[-]([\d]+)([smhdwMy])/[smhdwMy]$")
-            if m and len(m.groups) == 2:
-                val, sym = m.groups()
-                if int(val) > 0 and int(val) < time_limits[sym]:
-                    return True
-                else:
-                    print "out of range"
-                    return False
-        m = re.match("([\d][\d][\d][\d])-([\d][\d])-([\d][\d]) ([\d][\d]):([\d][\d]):([\d][\d])")
+        m = _relative_time_pattern.match(t)
         if m:
+            val, sym, rounding = m.groups()
+            if val and rounding and not 0 < int(val) < time_limits[sym]:
+                print "out of range"
+                return False
+            return True
+        if _absolute_time_pattern.match(t):
             return True
     return False
 
@@ -50,14 +83,14 @@ def check_color(c):
     :return c or None
     """
     if isinstance(c, str):
-        m = re.match("rgba\((\d+),\s*(\d+),\s*(\d+),\s*(0.[\d]+)\)", c)
-        if m and int(m.group(1)) < 255 and int(m.group(2)) < 255 and int(m.group(3)) < 255 and float(m.group(4)) > 0 and float(m.group(4)) <= 1:
+        m = _rgba_pattern.match(c)
+        if m and int(m.group(1)) < 256 and int(m.group(2)) < 256 and int(m.group(3)) < 256 and \
+                 m.group(4) not in ("", ".") and 0 < float(m.group(4)) <= 1:
             return c
-        m = re.match("rgb\((\d+),\s*(\d+),\s*(\d+)\)", c)
-        if m and int(m.group(1)) < 255 and int(m.group(2)) < 255 and int(m.group(3)) < 255:
+        m = _rgb_pattern.match(c)
+        if m and int(m.group(1)) < 256 and int(m.group(2)) < 256 and int(m.group(3)) < 256:
             return c
-        m = re.match("#[0-9a-fA-F][0-9a-fA-F][0-9a-fA-F][0-9a-fA-F][0-9a-fA-F][0-9a-fA-F]$", c)
-        if m:
+        if _hex_color_pattern.match(c):
             return c
     elif isinstance(c, tuple):
         if len(c) == 3 and int(c[0]) > 0 and int(c[0]) < 256 and \
@@ -71,20 +104,497 @@ def check_color(c):
             return "rgba(%d,%d,%d, %f)" % (int(c[0]), int(c[1]), int(c[2]), float(c[3]),)
     return None
 
-target_id = 0
-def _get_next_target_refID():
-    global target_id
-    c = chr(ord('A') + target_id)
-    target_id += 1
-    return c
+def _encode(o):
+    """
+    Returns o with all unicode strings converted to UTF-8 encoded str objects
+    """
+    if isinstance(o, unicode):
+        return o.encode("utf-8")
+    elif isinstance(o, list):
+        return [_encode(v) for v in o]
+    elif isinstance(o, dict):
+        return dict([(_encode(k), _encode(v)) for k, v in o.iteritems()])
+    return o
+
+def _encode_pairs(pairs):
+    # Nested objects were already converted by earlier calls, only strings and lists remain
+    d = {}
+    for k, v in pairs:
+        if isinstance(v, unicode):
+            v = v.encode("utf-8")
+        elif isinstance(v, list):
+            v = _encode_list(v)
+        d[k.encode("utf-8")] = v
+    return d
+
+def _encode_list(l):
+    out = []
+    for v in l:
+        if isinstance(v, unicode):
+            v = v.encode("utf-8")
+        elif isinstance(v, list):
+            v = _encode_list(v)
+        out.append(v)
+    return out
+
+def _load(j):
+    """
+    Returns the parsed JSON document if j is a string, otherwise j. The strings are converted
+    to str objects while parsing, since the setters expect str and not unicode objects.
+    """
+    if isinstance(j, basestring):
+        return json.loads(j, object_pairs_hook=_encode_pairs)
+    return j
+
+_encoder = json.JSONEncoder()
+
+# Keys left out of the canonical encoding: panel and dashboard ids are assigned by Grafana or
+# when serializing, the version is incremented by Grafana on every save
+volatile_fields = frozenset(["id", "version"])
+_canonical_encoder = json.JSONEncoder(sort_keys=True, separators=(",", ":"), allow_nan=False)
+
+def _normalize(o):
+    """
+    Returns o without the volatile fields and with integral floats as integers
+    """
+    if isinstance(o, dict):
+        return dict([(k, _normalize(v)) for k, v in o.iteritems() if k not in volatile_fields])
+    elif isinstance(o, list):
+        return [_normalize(v) for v in o]
+    elif isinstance(o, float) and o.is_integer() and abs(o) < 2**53:
+        return int(o)
+    return o
+
+def canonical_json(o):
+    """
+    Returns the canonical JSON encoding of a serialized object: sorted keys, no whitespace,
+    no volatile fields (see volatile_fields) and floats with integral values written as
+    integers, other floats with the shortest representation. Equal content gives equal bytes
+    independent of the dictionary order, the ids and the process.
+
+    :param o: Dictionary like the result of get()
+    :raises ValueError: for NaN or infinite floats
+    :return JSON string
+    """
+    return _canonical_encoder.encode(_normalize(o))
+
+# Members of the serialized objects whose elements are hashed separately, so that the content
+# hash of a dashboard is built from the hashes of its rows and the row hashes from the panels
+_hash_members = ("rows", "panels")
+
+def _hash_content(d, children=None):
+    if children != None:
+        d = dict(d)
+        d[children[0]] = children[1]
+    return hashlib.sha1(canonical_json(d)).hexdigest()
+
+def content_hash(o, version=None):
+    """
+    Returns the content hash of a model object or of a serialized dashboard, row or panel.
+    Objects and their serialized dictionaries have the same hash.
+
+    :param o: Model object, dictionary or JSON string, dashboards with or without the API wrapper
+    :param version: Grafana version string for model objects
+    :return SHA-1 hex digest
+    """
+    if isinstance(o, (_Cacheable, _CowRef)):
+        return o.content_hash(version)
+    o = _load(o)
+    if isinstance(o, dict) and isinstance(o.get("dashboard"), dict):
+        o = o["dashboard"]
+    if isinstance(o, dict):
+        for key in _hash_members:
+            if isinstance(o.get(key), list):
+                return _hash_content(o, (key, [content_hash(v) for v in o[key]]))
+    return _hash_content(o)
+
+class _Stream(object):
+    """
+    Placeholder for a list of objects in a dictionary which is encoded item by item by _iterencode
+    """
+    def __init__(self, items, func):
+        self.items = items
+        self.func = func
+
+def _iterencode(o):
+    """
+    Generator returning the same chunks of JSON as json.dumps(o) but resolves _Stream
+    placeholders one item at a time, so only a single item is held in memory.
+    """
+    if isinstance(o, _Stream):
+        yield "["
+        first = True
+        for item in o.items:
+            if not first:
+                yield ", "
+            first = False
+            for chunk in _iterencode(o.func(item)):
+                yield chunk
+        yield "]"
+    elif isinstance(o, dict):
+        yield "{"
+        first = True
+        for k, v in o.iteritems():
+            if not first:
+                yield ", "
+            first = False
+            yield _encoder.encode(k) + ": "
+            for chunk in _iterencode(v):
+                yield chunk
+        yield "}"
+    else:
+        for chunk in _encoder.iterencode(o):
+            yield chunk
+
+composition = "copy"
+
+def set_composition(mode):
+    """
+    Set how the add_* functions store the added objects.
+
+    In "copy" mode (default) every added object is deep-copied. In "cow" mode the added
+    object is shared by reference through a copy-on-write wrapper. The wrapper copies the
+    object as soon as it is changed through the container, and the containers receive a
+    copy before the original object is changed. Reading a list or a model object through
+    a wrapper counts as change, because it might be changed afterwards.
+
+    :param mode: "copy" or "cow"
+    :return True/False
+    """
+    global composition
+    if mode in ("copy", "cow"):
+        composition = mode
+        return True
+    return False
+
+def _compose(obj):
+    obj = _unwrap(obj)
+    if composition == "cow":
+        return _CowRef(obj)
+    return copy.deepcopy(obj)
+
+def _unwrap(obj):
+    if type(obj) is _CowRef:
+        return obj._cow_obj
+    return obj
+
+_plain = frozenset([str, unicode, int, long, float, bool, dict, type(None)])
+def _link(parent, value):
+    """
+    Registers parent at all model objects in value, so that changes in the children invalidate
+    the cached get() results of the parent
+    """
+    if type(value) in _plain:
+        return
+    if type(value) is _CowRef:
+        if value._cow_container is None:
+            object.__setattr__(value, "_cow_container", weakref.ref(parent))
+    elif isinstance(value, _Cacheable):
+        parents = value._parents
+        if parents is None:
+            parents = []
+            object.__setattr__(value, "_parents", parents)
+        for ref in parents:
+            if ref() is parent:
+                return
+        parents.append(weakref.ref(parent))
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            _link(parent, v)
+
+_containers = (dict, list)
+
+def _copy_json(o):
+    """
+    Returns a copy of the dictionaries and lists of a serialized object, other values are shared
+    """
+    if type(o) is dict:
+        return dict([(k, _copy_json(v) if type(v) in _containers else v) for k, v in o.iteritems()])
+    elif type(o) is list:
+        return [_copy_json(v) if type(v) in _containers else v for v in o]
+    return o
+
+# Set while serializing without storing the results, see Dashboard.iter_json()
+_uncached = threading.local()
+
+def _get_uncached(o, version):
+    """
+    Returns the serialized object without storing the results of o and its children,
+    results stored before are used
+    """
+    active = getattr(_uncached, "active", False)
+    _uncached.active = True
+    try:
+        return o._get_shared(version)
+    finally:
+        _uncached.active = active
+
+def _cached(get):
+    """
+    Decorator for get() functions of model objects. The decorated get(version=None) resolves
+    the Grafana version once and passes the major version to the serializer, which hands it
+    on to its children. The result is stored per major version until the object or one of
+    its children is changed. get() returns a copy of the stored result, the serializers of
+    the parents and get_json() use the stored result directly through _get_shared().
+    """
+    def shared_get(self, version=None):
+        version = get_major(version)
+        key = version
+        if not self._versioned:
+            key = ""
+        cache = self._cache
+        if cache is not None and cache.has_key(key):
+            return cache[key]
+        res = get(self, version)
+        if not getattr(_uncached, "active", False):
+            if cache is None:
+                cache = {}
+                object.__setattr__(self, "_cache", cache)
+            cache[key] = res
+        return res
+    def cached_get(self, version=None):
+        return _copy_json(shared_get(self, version))
+    cached_get.__name__ = get.__name__
+    cached_get.__doc__ = get.__doc__
+    cached_get.shared = shared_get
+    return cached_get
+
+_slots = {}
+def _get_slots(cls):
+    if not _slots.has_key(cls):
+        names = []
+        for c in cls.__mro__:
+            names.extend(c.__dict__.get("__slots__", ()))
+        _slots[cls] = names
+    return _slots[cls]
+
+class _Cacheable(object):
+    """
+    Base class of the dashboard model objects. The get() results are cached and invalidated
+    whenever a public attribute is assigned. The set_*/add_* functions assign new lists
+    instead of changing them in place, so changes of lists or dictionaries have to be done
+    with them, otherwise get() returns outdated results.
+
+    get() returns a copy of the cached result that can be modified freely. _get_shared()
+    returns the cached result itself for serializers and read-only users, it must not be
+    modified.
+
+    The model classes use __slots__ and keep their tables of valid values as class attributes.
+    Classes with the same output for all Grafana versions set _versioned to False, so their
+    get() result is shared between the versions.
+    """
+    __slots__ = ("_cache", "_parents", "_proxies", "__weakref__")
+    _versioned = True
+    def __new__(cls, *args, **kwargs):
+        self = object.__new__(cls)
+        object.__setattr__(self, "_cache", None)
+        object.__setattr__(self, "_parents", None)
+        object.__setattr__(self, "_proxies", None)
+        return self
+    def __setattr__(self, name, value):
+        if name[0] == "_":
+            object.__setattr__(self, name, value)
+            return
+        # New objects without parents, wrappers or cache skip the bookkeeping
+        if self._parents or self._proxies:
+            self._before_change()
+        object.__setattr__(self, name, value)
+        if type(value) not in _plain:
+            _link(self, value)
+        if self._cache is not None or self._parents:
+            self._invalidate()
+    def _before_change(self):
+        """
+        Hands a copy of the current state to all copy-on-write wrappers sharing this object
+        or one of its parents
+        """
+        if self._parents:
+            for ref in self._parents:
+                parent = ref()
+                if parent is not None:
+                    parent._before_change()
+        if self._proxies:
+            proxies = self._proxies
+            object.__setattr__(self, "_proxies", None)
+            for ref in proxies:
+                proxy = ref()
+                if proxy is not None:
+                    proxy._cow_own()
+    def _invalidate(self):
+        object.__setattr__(self, "_cache", None)
+        if self._parents:
+            for ref in self._parents:
+                parent = ref()
+                if parent is not None:
+                    parent._invalidate()
+    # Attribute with the children hashed separately by content_hash() and their member name
+    _hash_children = None
+    def _get_shared(self, version=None):
+        return self.get.shared(self, version)
+    def _get_content(self, version):
+        return self._get_shared(version)
+    def get_canonical_json(self, version=None):
+        """
+        Returns the JSON document of the object in canonical encoding, see canonical_json()
+
+        :param version: Grafana version string, defaults to the version set with set_grafana_version()
+        :return JSON string
+        """
+        return canonical_json(self._get_content(version))
+    def content_hash(self, version=None):
+        """
+        Returns the SHA-1 hash of the canonical encoding. Dashboards and rows hash the hashes
+        of their rows and panels instead of their content. The hashes are cached like the
+        get() results, after a change only the changed objects and their parents are encoded
+        again.
+
+        :param version: Grafana version string, defaults to the version set with set_grafana_version()
+        :return SHA-1 hex digest
+        """
+        version = get_major(version)
+        key = "#" + version
+        if not self._versioned:
+            key = "#"
+        cache = self._cache
+        if cache is None:
+            cache = {}
+            object.__setattr__(self, "_cache", cache)
+        if not cache.has_key(key):
+            children = None
+            if self._hash_children:
+                children = (self._hash_children, [_unwrap(c).content_hash(version) for c in getattr(self, self._hash_children)])
+            cache[key] = _hash_content(self._get_content(version), children)
+        return cache[key]
+    def clone(self):
+        """
+        Returns an independent deep copy of the object
+
+        :return copy of the object
+        """
+        return copy.deepcopy(self)
+    def __getstate__(self):
+        state = {}
+        if hasattr(self, "__dict__"):
+            state.update(self.__dict__)
+        for name in _get_slots(self.__class__):
+            if not name.startswith("_") and hasattr(self, name):
+                state[name] = getattr(self, name)
+        return state
+    def __setstate__(self, state):
+        for name, value in state.iteritems():
+            object.__setattr__(self, name, value)
+            if not name.startswith("_"):
+                _link(self, value)
+
+class _CowRef(object):
+    """
+    Copy-on-write wrapper for model objects shared between containers in "cow" composition
+    mode. Reading scalar attributes and serializing is forwarded to the shared object, calls
+    of set_*/add_*/del_* functions and access to lists, dictionaries and model objects make
+    a private copy first.
+    """
+    __slots__ = ("_cow_obj", "_cow_owned", "_cow_container", "__weakref__")
+    def __init__(self, obj):
+        object.__setattr__(self, "_cow_obj", obj)
+        object.__setattr__(self, "_cow_owned", False)
+        object.__setattr__(self, "_cow_container", None)
+        proxies = obj._proxies
+        if proxies is None:
+            proxies = []
+            object.__setattr__(obj, "_proxies", proxies)
+        proxies.append(weakref.ref(self))
+    @property
+    def __class__(self):
+        return self._cow_obj.__class__
+    def _cow_own(self):
+        if self._cow_owned:
+            return
+        obj = copy.deepcopy(self._cow_obj)
+        object.__setattr__(self, "_cow_obj", obj)
+        object.__setattr__(self, "_cow_owned", True)
+        container = self._cow_container and self._cow_container()
+        if container is not None:
+            _link(container, obj)
+            container._invalidate()
+    def _cow_write(self):
+        if not self._cow_owned:
+            container = self._cow_container and self._cow_container()
+            if container is not None:
+                container._before_change()
+            self._cow_own()
+        return self._cow_obj
+    def __getattr__(self, name):
+        if name.startswith(("set_", "add_", "del_")) or name in ("read_json", "invert_colors"):
+            return getattr(self._cow_write(), name)
+        value = getattr(self._cow_obj, name)
+        if not self._cow_owned and not name.startswith("_") and \
+           isinstance(value, (list, dict, _Cacheable)):
+            value = getattr(self._cow_write(), name)
+        return value
+    def __setattr__(self, name, value):
+        setattr(self._cow_write(), name, value)
+    def __deepcopy__(self, memo):
+        return _CowRef(self._cow_obj)
+    def __reduce__(self):
+        return (_CowRef, (self._cow_obj,))
+    def __str__(self):
+        return str(self._cow_obj)
+    def __repr__(self):
+        return repr(self._cow_obj)
+
+def _allocate_ids(used, first=1):
+    """
+    Generator of panel ids counting up from first and skipping the ids in used
+    """
+    used = set(used)
+    i = first
+    while True:
+        if i not in used:
+            yield i
+        i += 1
+
+def _allocate_refIds(used):
+    """
+    Generator of target refIds A, B, ..., Z, AA, AB, ... skipping the refIds in used
+    """
+    used = set(used)
+    i = 0
+    while True:
+        n = i
+        refId = ""
+        while True:
+            refId = chr(ord('A') + n % 26) + refId
+            n = n / 26 - 1
+            if n < 0:
+                break
+        if refId not in used:
+            yield refId
+        i += 1
 
-class Target(object):
+def _assign_ids(dicts, objs, key, ids):
+    """
+    Returns the serialized objects where every object without explicit identifier gets the
+    next one of ids. The dictionaries from the caches are copied, not changed.
+    """
+    out = []
+    for d, o in zip(dicts, objs):
+        if getattr(o, key) == None:
+            d = dict(d)
+            d[key] = ids.next()
+        out.append(d)
+    return out
+
+class Target(_Cacheable):
     """
     Encapsulates an query and evaluation target used in Grafana's panels
     """
+    __slots__ = ("dsType", "tags", "groupBy", "alias", "select", "measurement", "query",
+                 "policy", "refId", "resultFormat", "rawQuery", "hide")
+    validGroupBy = frozenset(['fill', 'time', 'tag'])
+    validResultFormat = frozenset(["time_series"])
     def __init__(self, measurement, dsType="influxdb", alias="", tags=[],
                   groupBy=[], select=[], query="", resultFormat="time_series",
-                  policy="default"):
+                  policy="default", rawQuery=None, hide=None):
         """
         Construct a new Target object
         
@@ -96,153 +606,66 @@ class Target(object):
         :param select: Which elements in a measurement should be returned and further processed. (Format: {'type': 'field' or any valid function, 'params': [parameter(s) for type, e.g. 'value' if type == 'field' or function argument]})
         :param query: Query that is send to the data source. Not required for InfluxDB but probably the Graphite query is in here.
         :param resultFormat: Currently the only supported option is 'time_series'. There are others but not implemented yet.
+        :param rawQuery: True if the query is edited as text, False if it is built from the settings, None to leave it out
+        :param hide: True to hide the target, None to leave it out
         """
         self.dsType = dsType
-        self.tags = tags
-        self.groupBy = groupBy
+        self.tags = list(tags)
+        self.groupBy = list(groupBy)
         self.alias = alias
-        self.select = select
+        self.select = list(select)
         self.measurement = measurement
         self.query = query
         self.policy = policy
-        self.refId = _get_next_target_refID()
+        self.refId = None
         self.resultFormat = resultFormat
-        self.validGroupBy = ['fill', 'time', 'tag']
-        self.validResultFormat = ["time_series"]
-        self.grafana_version = grafana_version
-    def get(self):
+        self.rawQuery = rawQuery
+        self.hide = hide
+    @_cached
+    def get(self, version):
         """
-        Returns a dictionary with the Target object's configuration. Performs some sanitation like removing duplicated groupBy options
-        and creates a valid query for InfluxDB based on the configuration.
+        Returns a dictionary with the Target object's configuration. Completes the select and groupBy
+        options with Grafana's defaults and creates the InfluxQL query for Grafana 2.x, see influxql.compile_target().
         
+        :param version: Grafana version string, defaults to the version set with set_grafana_version()
         :return dict with the Target object's settings
         """
-        global grafana_version
-        t = None
         t = {}
         t["dsType"] = self.dsType
         t["tags"] = self.tags
-        #t["groupBy"] = self.groupBy
         t["alias"] = self.alias
-        t["select"] = [self.select]
         t["measurement"] = self.measurement
-        if grafana_version.startswith("2"):
-            t["query"] = self.query
         t["refId"] = self.refId
         t["resultFormat"] = self.resultFormat
-
-        if grafana_version.startswith("3"):
-            t["policy"] = self.policy
-            grp_has_time = None
-            grp_has_fill = None
-            grpBy = []
-            for g in self.groupBy:
-                if g["type"] == "time":
-                    grp_has_time = g
-                elif g["type"] == "fill":
-                    grp_has_fill = g
-            if not grp_has_time:
-                grpBy.append({'type': 'time', 'params': ['$interval']})
-            else:
-                grpBy.append(grp_has_time)
-            for g in self.groupBy:
-                if g["type"] not in ("time", "fill"):
-                    grpBy.append(g)
-            if not grp_has_fill:
-                grpBy.append({'type': 'fill', 'params': ['null']})
-            else:
-                grpBy.append(grp_has_fill)
-
-            t["groupBy"] = grpBy
-            has_field = False
-            has_func = False
-            newselect = []
-            if len(self.select) > 0:
-                for s in self.select:
-                    news = []
-                    for elem in s:
-                        if elem["type"] == "field":
-                            has_field = True
-                            news.append(elem)
-                        if elem["type"] != "field":
-                            has_func = True
-                            news.append(elem)
-                    if not has_field:
-                        news.append({ "params": [ "value" ], "type": "field" })
-                    if not has_func:
-                        news.append({ "params": [], "type": "mean" })
-                    print news
-                    newselect.append(news)
-            else:
-                news = []
-                news.append({ "params": [ "value" ], "type": "field" })
-                news.append({ "params": [], "type": "mean" })
-                newselect.append(news)
-            t["select"] = newselect
-        else:
-            grp_has_time = False
-            grp_has_fill = False
-            for g in self.groupBy:
-                if g["type"] == "time":
-                    grp_has_time = True
-                elif g["type"] == "fill":
-                    grp_has_fill = True
-            if not grp_has_time:
-                t["groupBy"].append({'type': 'time', 'params': ['$interval']})
-            if not grp_has_fill:
-                t["groupBy"].append({'type': 'fill', 'params': ['null']})
-            has_field = False
-            has_func = False
-            for s in self.select:
-                if s["type"] == "field":
-                    has_field = True
-                if s["type"] != "field":
-                    has_func = True
-            if not has_field:
-                t["select"].append({ "params": [ "value" ], "type": "field" })
-            if not has_func:
-                t["select"].append({ "params": [], "type": "mean" })
-        if grafana_version.startswith("2") and len(self.query) == 0:
-            field = "value"
-            func = "mean"
-            func_params = ""
-            for s in t["select"][0]:
-                if s["type"] == "field":
-                    field = ",".join(s["params"])
-                else:
-                    func = s["type"]
-                    if len(s["params"]) > 0:
-                        func_params = "," + ",".join(s["params"])
-            t["query"] = "SELECT %s (\"%s\"%s) FROM \"%s\" WHERE $timeFilter" % (func, field, func_params, self.measurement,)
-            filt = ""
-            for s in t["tags"]:
-                op = s["operator"]
-                val = s["value"]
-                key = s["key"]
-                
-                if val[0] == "$" and val[-1] != "$":
-                    val += "$"
-                
-                if op in ["=~", "!~"]:
-                    if val[0] != "/":
-                        val = "/^"+val
-                    if val[-1] != "/":
-                        val += "$/"
-                if s.has_key("condition"):
-                    filt += "%s %s %s %s " % (s["condition"], key, op, val,)
-                else:
-                    filt += "%s %s %s " % (key, op, val,)
-            
-            if len(filt) > 0:
-                t["query"] += " AND %s" % (filt,)
+        c = influxql.compile_target(self.measurement, self.select, self.tags,
+                                    self.groupBy, self.policy, version)
+        t["select"] = c["select"]
+        t["groupBy"] = c["groupBy"]
+        if self.rawQuery is not None:
+            t["rawQuery"] = self.rawQuery
+        if self.hide is not None:
+            t["hide"] = self.hide
+        self._serializers[version](self, t, c)
         return t
-    def get_json(self):
+    def _get_2(self, t, c):
+        t["query"] = self.query
+        if len(self.query) == 0 or self.rawQuery == False:
+            t["query"] = c["query"]
+    def _get_3(self, t, c):
+        t["policy"] = self.policy
+        if self.rawQuery == False:
+            t["query"] = influxql.build_query(self.measurement, c["select"], self.tags, c["groupBy"], self.policy)
+        elif len(self.query) > 0:
+            t["query"] = self.query
+    _serializers = {"2" : _get_2, "3" : _get_3}
+    def get_json(self, version=None):
         """
         Returns a JSON string with the Target object's configuration.
         
+        :param version: Grafana version string, defaults to the version set with set_grafana_version()
         :return JSON string with the Target object's settings
         """
-        return json.dumps(self.get())
+        return json.dumps(self._get_shared(version))
     def __str__(self):
         return str(self.get())
     def __repr__(self):
@@ -270,12 +693,13 @@ class Target(object):
         return True
     def set_refId(self, refId):
         """
-        Set reference identifier (refId).
+        Set reference identifier (refId). Targets without refId get the next free one
+        of their panel when the panel is serialized.
         
-        :param refId: Reference identifier string(!) like 'A','B'
+        :param refId: Reference identifier string(!) like 'A','B' or None
         :return True/False
         """
-        if not isinstance(refId, str):
+        if refId != None and not isinstance(refId, str):
             try:
                 refId = str(refId)
             except ValueError:
@@ -311,6 +735,29 @@ class Target(object):
             self.resultFormat = fmt
             return True
         return False
+    def set_rawQuery(self, rawQuery):
+        """
+        Set whether the query is edited as text. Grafana 2.x gets the query of a target
+        with rawQuery False created from the settings.
+
+        :param rawQuery: True/False or None to leave it out
+        :return True/False
+        """
+        if rawQuery != None and not isinstance(rawQuery, bool):
+            return False
+        self.rawQuery = rawQuery
+        return True
+    def set_hide(self, hide):
+        """
+        Set whether the target is hidden in the panel.
+
+        :param hide: True/False or None to leave it out
+        :return True/False
+        """
+        if hide != None and not isinstance(hide, bool):
+            return False
+        self.hide = hide
+        return True
     def add_tag(self, key, value, operator='=', condition='AND'):
         """
         Add a tag to this target.
@@ -336,7 +783,7 @@ class Target(object):
                 tag = {'key': key, 'value': val, 'operator': operator}
             else:
                 tag = {'key': key, 'value': val, 'operator': operator, 'condition': condition}
-            self.tags.append(tag)
+            self.tags = self.tags + [tag]
             return True
         except:
             pass
@@ -349,11 +796,11 @@ class Target(object):
         :param sel_params: Parameters of select like 'value' for 'field' or function arguments. If parameter is not a list, the parameter is put in one.
         :return True/False
         """
-        if not isinstance(sel_type, list):
-            sel_type = [sel_type]
+        if not isinstance(sel_params, list):
+            sel_params = [sel_params]
         s = { "params": sel_params, "type": sel_type }
-        if not s in select:
-            self.select.append(s)
+        if not s in self.select:
+            self.select = self.select + [s]
             return True
         return False
     def add_groupBy(self, grp_type, grp_params):
@@ -367,25 +814,27 @@ class Target(object):
         if grp_type not in self.validGroupBy:
             return False
         if grp_type != 'tag':
-            for g in self.groupBy:
+            for i, g in enumerate(self.groupBy):
                 if g["type"] == grp_type:
-                    g["params"] = grp_params
+                    self.groupBy = self.groupBy[:i] + [{'type': grp_type, 'params': grp_params}] + self.groupBy[i+1:]
                     return True
         d = {'type': grp_type, 'params': [grp_params]}
         if d not in self.groupBy:
-            self.groupBy.append(d)
+            self.groupBy = self.groupBy + [d]
             return True
         return False
     def read_json(self, j):
         """
-        Configure Target object according to settings in JSON document describing a Target
+        Configure Target object according to settings in JSON document describing a Target.
+        The query of a target with measurement is only kept for raw queries, otherwise it is
+        created from the settings again. rawQuery and hide are kept as they are.
         
-        :param sel_type: Type of groupBy options. Valid types are 'fill', 'time' and 'tag'.
-        :param sel_params: Parameter to the groupBy type. 
+        :param j: JSON string or dictionary
         :return True/False
         """
-        if isinstance(j, str):
-            j = json.loads(j)
+        j = _load(j)
+        if not isinstance(j, dict):
+            return False
         if j.has_key("resultFormat"):
             self.set_resultFormat(j["resultFormat"])
         if j.has_key("alias"):
@@ -394,74 +843,37 @@ class Target(object):
             self.set_refId(j["refId"])
         if j.has_key("dsType"):
             self.set_dsType(j["dsType"])
-        if j.has_key("query"):
+        if j.has_key("query") and isinstance(j["query"], basestring) and \
+                (j.get("rawQuery") or not j.get("measurement")):
             self.query = j["query"]
+        if j.has_key("rawQuery"):
+            self.set_rawQuery(j["rawQuery"])
+        if j.has_key("hide"):
+            self.set_hide(j["hide"])
         if j.has_key("policy"):
             self.policy = j["policy"]
         if j.has_key("measurement"):
             self.measurement = j["measurement"]
-        if j.has_key("tags"):
-            if isinstance(j["tags"], list):
-                for t in j["tags"]:
-                    key = None
-                    value = None
-                    operator = "="
-                    if t.has_key("key") and t.has_key("value"):
-                        key = t["key"]
-                        value = t["value"]
-                    else:
-                        print "Invalid tag %s, Format is {'key': '', 'value': '', 'operator': '', 'condition': ''}" % str(t)
-                        continue
-                    if t.has_key("operator"):
-                        operator = t["operator"]
-                    if t.has_key("condition"):
-                        self.add_tag(key, value, operator=operator, condition=t["condition"])
-                    else:
-                        self.add_tag(key, value, operator=operator)
-        if f.has_key("groupBy"):
-            if isinstance(j["groupBy"], list):
-                for gb in j["groupBy"]:
-                    t = None
-                    p = None
-                    if gb.has_key("type"):
-                        t = gb["type"]
-                    if gb.has_key("params"):
-                        p = gb["params"]
-                    if not t or not p:
-                        print "Invalid groupBy JSON %s, Format is {'type': '', 'params': []}" % str(gb)
-                        continue
-                    if not isinstance(p, list):
-                        print "Invalid groupBy JSON %s, Format is {'type': '', 'params': []}" % str(gb)
-                        continue
-                    self.add_groupBy(t, p)
-        if f.has_key("select"):
-            if isinstance(j["select"], list):
-                for sel in j["select"]:
-                    t = None
-                    p = None
-                    if sel.has_key("type"):
-                        t = gb["type"]
-                    if sel.has_key("params"):
-                        p = gb["params"]
-                    if not t or not p:
-                        print "Invalid select JSON %s, Format is {'type': '', 'params': []}" % str(sel)
-                        continue
-                    if not isinstance(p, list):
-                        print "Invalid select JSON %s, Format is {'type': '', 'params': []}" % str(sel)
-                        continue
-                    self.add_select(t, p)
-        
+        if j.has_key("tags") and isinstance(j["tags"], list):
+            self.tags = list(j["tags"])
+        if j.has_key("groupBy") and isinstance(j["groupBy"], list):
+            self.groupBy = list(j["groupBy"])
+        if j.has_key("select") and isinstance(j["select"], list):
+            self.select = list(j["select"])
+        return True
 
-class Tooltip(object):
+
+class Tooltip(_Cacheable):
     """
     Encapsulates tooltip configuration used in Grafana's graph panels
     """
+    __slots__ = ("shared", "value_type", "sort", "msResolution")
+    validValueTypes = frozenset(["cumulative"])
     def __init__(self, shared=True, value_type="cumulative", sort=0, msResolution=True):
         self.shared = shared
         self.value_type = value_type
-        self.sort = 0
+        self.sort = sort
         self.msResolution = msResolution
-        self.validValueTypes = ["cumulative"]
     def set_shared(self, s):
         if isinstance(s, bool):
             self.shared = s
@@ -471,36 +883,44 @@ class Tooltip(object):
             return True
         return False
     def set_sort(self, sort):
-        if isinstance(sort, int) and grafana_version.startswith("3"):
+        if isinstance(sort, int):
             self.sort = sort
             return True
         return False
     def set_msResolution(self, msResolution):
-        if isinstance(msResolution, bool) and grafana_version.startswith("3"):
+        if isinstance(msResolution, bool):
             self.msResolution = msResolution
             return True
         return False
-    def get(self):
-        if grafana_version.startswith("2"):
-            return {"shared" : self.shared, "value_type" : self.value_type}
-        else:
-            return {"shared" : self.shared, "value_type" : self.value_type,
-                    "sort" : self.sort, "msResolution" : self.msResolution}
-    def get_json(self):
-        return json.dumps(self.get())
+    def _get_2(self):
+        return {"shared" : self.shared, "value_type" : self.value_type}
+    def _get_3(self):
+        return {"shared" : self.shared, "value_type" : self.value_type,
+                "sort" : self.sort, "msResolution" : self.msResolution}
+    _serializers = {"2" : _get_2, "3" : _get_3}
+    @_cached
+    def get(self, version):
+        return self._serializers[version](self)
+    def get_json(self, version=None):
+        return json.dumps(self._get_shared(version))
     def __str__(self):
         return str(self.get())
     def __repr__(self):
         return "Tooltip(shared=%s, value_type=\"%s\")" % (str(self.shared), self.value_type)
     def read_json(self, j):
-        if isinstance(j, str):
-            j = json.loads(j)
+        j = _load(j)
         if j.has_key("shared"):
             self.set_shared(j["shared"])
         if j.has_key("value_type"):
             self.set_value_type(j["value_type"])
+        if j.has_key("sort"):
+            self.set_sort(j["sort"])
+        if j.has_key("msResolution"):
+            self.set_msResolution(j["msResolution"])
 
-class Legend(object):
+class Legend(_Cacheable):
+    __slots__ = ("total", "show", "max", "min", "current", "values", "avg")
+    _versioned = False
     def __init__(self, total=False, show=True, max=False, min=False, current=False, values=False, avg=False):
         self.total = total
         self.show = show
@@ -530,12 +950,13 @@ class Legend(object):
     def set_avg(self, m):
         if isinstance(m, bool):
             self.avg = m
-    def get(self):
+    @_cached
+    def get(self, version):
         return {"total" : self.total, "show" : self.show, "max" : self.max,
                 "min" : self.min, "current" : self.current, "values" : self.values,
                 "avg" : self.avg}
-    def get_json(self):
-        return json.dumps(self.get())
+    def get_json(self, version=None):
+        return json.dumps(self._get_shared(version))
     def __str__(self):
         return str(self.get())
     def __repr__(self):
@@ -543,8 +964,7 @@ class Legend(object):
         l += "min=%s, current=%s, values=%s, avg=%s)" % (self.min, self.current, self.values, self.avg,)
         return l
     def read_json(self, j):
-        if isinstance(j, str):
-            j = json.loads(j)
+        j = _load(j)
         if j.has_key("total"):
             self.set_total(j["total"])
         if j.has_key("show"):
@@ -560,11 +980,13 @@ class Legend(object):
         if j.has_key("avg"):
             self.set_avg(j["avg"])
 
-class Grid(object):
+class Grid(_Cacheable):
+    __slots__ = ("leftMax", "threshold2", "rightLogBase", "rightMax", "threshold1",
+                 "leftLogBase", "threshold2Color", "rightMin", "threshold1Color", "leftMin")
+    validLogBases = frozenset([1, 2, 10, 32, 1024])
     def __init__(self, leftMax=None, threshold2=None, rightLogBase=1, rightMax=None, threshold1=None,
                     leftLogBase=1, threshold2Color="rgba(234, 112, 112, 0.22)",rightMin=None,
                     threshold1Color="rgba(216, 200, 27, 0.27)", leftMin=None):
-        self.validLogBases = [1, 2, 10, 32, 1024]
         self.leftMax = leftMax
         self.threshold2 = threshold2
         self.rightLogBase = rightLogBase
@@ -575,56 +997,42 @@ class Grid(object):
         self.rightMin = rightMin
         self.threshold1Color = check_color(threshold1Color)
         self.leftMin = leftMin
-    def get(self):
-        if grafana_version.startswith("2"):
-            return {"leftMax" : self.leftMax, "threshold2" : self.threshold2,
-                    "rightLogBase" : self.rightLogBase, "rightMax" : self.rightMax,
-                    "threshold1" : self.threshold1, "leftLogBase" : self.leftLogBase,
-                    "threshold2Color" : self.threshold2Color, "rightMin" : self.rightMin,
-                    "threshold1Color" : self.threshold1Color, "leftMin" : self.leftMin}
-        elif grafana_version.startswith("3"):
-            return {"threshold1" : self.threshold1, "threshold2" : self.threshold2,
-                    "threshold1Color" : self.threshold1Color,
-                    "threshold2Color" : self.threshold2Color}
-    def get_json(self):
-        return json.dumps(self.get())
+    def _get_2(self):
+        return {"leftMax" : self.leftMax, "threshold2" : self.threshold2,
+                "rightLogBase" : self.rightLogBase, "rightMax" : self.rightMax,
+                "threshold1" : self.threshold1, "leftLogBase" : self.leftLogBase,
+                "threshold2Color" : self.threshold2Color, "rightMin" : self.rightMin,
+                "threshold1Color" : self.threshold1Color, "leftMin" : self.leftMin}
+    def _get_3(self):
+        return {"threshold1" : self.threshold1, "threshold2" : self.threshold2,
+                "threshold1Color" : self.threshold1Color,
+                "threshold2Color" : self.threshold2Color}
+    _serializers = {"2" : _get_2, "3" : _get_3}
+    @_cached
+    def get(self, version):
+        return self._serializers[version](self)
+    def get_json(self, version=None):
+        return json.dumps(self._get_shared(version))
     def __str__(self):
         return str(self.get())
     def __repr__(self):
         return str(self.get())
     def read_json(self, j):
-        if isinstance(j, str):
-            j = json.loads(j)
-        if j.has_key("leftMax"):
-            self.set_leftMax(j["leftMax"])
-        if j.has_key("threshold2"):
-            self.set_threshold2(j["threshold2"])
-        if j.has_key("rightLogBase"):
-            self.set_rightLogBase(j["rightLogBase"])
-        if j.has_key("rightMax"):
-            self.set_rightMax(j["rightMax"])
-        if j.has_key("threshold1"):
-            self.set_threshold1(j["threshold1"])
-        if j.has_key("leftLogBase"):
-            self.set_leftLogBase(j["leftLogBase"])
-        if j.has_key("threshold2Color"):
-            self.set_threshold2Color(j["threshold2Color"])
-        if j.has_key("rightMin"):
-            self.set_rightMin(j["rightMin"])
-        if j.has_key("threshold1Color"):
-            self.set_threshold1Color(j["threshold1Color"])
-        if j.has_key("leftMin"):
-            self.set_leftMin(j["leftMin"])
-
-panel_id = 1
-
-
-
-class Panel(object):
+        j = _load(j)
+        for k in ("leftMax", "threshold2", "rightMax", "threshold1", "rightMin", "leftMin"):
+            if j.has_key(k):
+                setattr(self, k, j[k])
+        for k in ("leftLogBase", "rightLogBase"):
+            if j.has_key(k) and j[k] in self.validLogBases:
+                setattr(self, k, j[k])
+        for k in ("threshold1Color", "threshold2Color"):
+            if j.has_key(k) and check_color(j[k]):
+                setattr(self, k, j[k])
+
+class Panel(_Cacheable):
+    __slots__ = ("id", "span", "title", "editable")
     def __init__(self, span=12, editable=True, title=""):
-        global panel_id
-        self.id = panel_id
-        panel_id += 1
+        self.id = None
         self.span = span
         self.title = title
         self.editable = editable
@@ -645,18 +1053,31 @@ class Panel(object):
         return False
     def set_datasource(self, datasource):
         pass
-    def get(self):
+    @_cached
+    def get(self, version):
         return {}
-    def get_json(self):
-        return json.dumps(self.get())
+    def get_json(self, version=None):
+        return json.dumps(self._get_shared(version))
     def __str__(self):
         return str(self.get())
     def __repr__(self):
         return str(self.get())
     def read_json(self, j):
-        pass
+        j = _load(j)
+        if j.has_key("title"):
+            self.set_title(j["title"])
+        if j.has_key("span"):
+            self.set_span(j["span"])
+        if j.has_key("editable"):
+            self.set_editable(j["editable"])
+        if j.has_key("id"):
+            self.id = j["id"]
+        return True
 
 class TextPanel(Panel):
+    __slots__ = ("style", "links", "type", "mode", "content", "error", "transparent",
+                 "minSpan", "repeat")
+    _versioned = False
     def __init__(self, title="default title", mode="markdown", content="",
                        style={}, span=12, editable=True, error=False,
                        links=[], transparent=False, repeat=None, minSpan=None):
@@ -725,32 +1146,33 @@ class TextPanel(Panel):
             print "For type 'absolute' an url is required"
             return False
         elif typ == "absolute":
-            self.links.append({
+            self.links = self.links + [{
               "type": typ,
               "url": url,
               "title": title,
               
-            })
+            }]
         if typ == "dashboard" and not dashboard:
             print "For type 'dashboard' a dashboard name is required"
             return False
         elif typ == "dashboard":
-            self.links.append({
+            self.links = self.links + [{
               "type": typ,
               "dashboard": dashboard,
               "title": title,
               "dashUri" : "db/"+dashboard.lower().replace("_","-")
-            })
+            }]
         return True
-    def get(self):
+    @_cached
+    def get(self, version):
         return {"title" : self.title, "mode" : self.mode,
                 "content" : self.content, "style" : self.style,
                 "span" : self.span, "editable": self.editable,
                 "id": self.id, "type" : self.type, "error": self.error,
                 "links" : self.links, "transparent" : self.transparent,
                 "repeat" : self.repeat, "minSpan" : self.minSpan}
-    def get_json(self):
-        return json.dumps(self.get())
+    def get_json(self, version=None):
+        return json.dumps(self._get_shared(version))
     def __str__(self):
         return str(self.get())
     def __repr__(self):
@@ -770,8 +1192,7 @@ class TextPanel(Panel):
         p += "minSpan=%s)" % str(self.minSpan)
         return p
     def read_json(self, j):
-        if isinstance(j, str):
-            j = json.loads(j)
+        j = _load(j)
         if j.has_key("type"):
             if j["type"] != 'text':
                 print "No TextPanel"
@@ -793,7 +1214,7 @@ class TextPanel(Panel):
         if j.has_key("repeat"):
             self.set_repeat(j["repeat"])
         if j.has_key("minSpan"):
-            self.set_repeat(j["minSpan"])
+            self.set_minSpan(j["minSpan"])
         if j.has_key("links"):
             for l in j["links"]:
                 if l["type"] == "absolute":
@@ -805,14 +1226,15 @@ class TextPanel(Panel):
         return True
 
 class PlotPanel(Panel):
+    __slots__ = ("links", "isNew", "error", "datasource", "targets")
     def __init__(self, targets=[], datasource="", title="", error=False,
                        editable=True, isNew=True, links=[], span=12):
         Panel.__init__(self, span=span, editable=editable, title=title)
-        self.links = links
+        self.links = list(links)
         self.isNew = isNew
         self.error = error
         self.datasource = datasource
-        self.targets = targets
+        self.targets = list(targets)
     def set_isNew(self, b):
         if isinstance(b, bool):
             self.isNew = b
@@ -825,17 +1247,20 @@ class PlotPanel(Panel):
     def set_title(self, t):
         self.title = str(t)
     def add_link(self, l):
-        self.links.append(l)
+        self.links = self.links + [l]
     def add_target(self, t):
         if isinstance(t, Target):
-            x = copy.deepcopy(t)
-            x.set_refId(chr(ord('A')+len(self.targets)))
-            self.targets.append(x)
-    def get(self):
+            x = _compose(t)
+            self.targets = self.targets + [x]
+    def _get_targets(self, version):
+        refIds = _allocate_refIds([t.refId for t in self.targets if t.refId != None])
+        return _assign_ids([t._get_shared(version) for t in self.targets], self.targets, "refId", refIds)
+    @_cached
+    def get(self, version):
         return {"datasource" : self.datasource, "title" : self.title,
                 "error" : self.error, "isNew" : self.isNew,
                 "span" : self.span, "editable": self.editable,
-                "id": self.id, "targets" : [t.get() for t in self.targets ]}
+                "id": self.id, "targets" : self._get_targets(version)}
     def __str__(self):
         return str(self.get())
     def __repr__(self):
@@ -845,8 +1270,7 @@ class PlotPanel(Panel):
         p += "links=%s, span=%d)"  % (str(self.links), int(span), )
         return p
     def read_json(self, j):
-        if isinstance(j, str):
-            j = json.loads(j)
+        j = _load(j)
         if j.has_key("datasource"):
             self.set_datasource(j["datasource"])
         if j.has_key("title"):
@@ -855,17 +1279,28 @@ class PlotPanel(Panel):
             self.set_error(j["error"])
         if j.has_key("isNew"):
             self.set_isNew(j["isNew"])
-        if j.has_key("links"):
-            self.set_links(j["links"])
+        if j.has_key("links") and isinstance(j["links"], list):
+            self.links = list(j["links"])
         if j.has_key("span"):
             self.set_span(j["span"])
         if j.has_key("editable"):
             self.set_editable(j["editable"])
         if j.has_key("id"):
             self.id = j["id"]
-    
+        if j.has_key("targets") and isinstance(j["targets"], list):
+            targets = []
+            for t in j["targets"]:
+                target = Target("")
+                if target.read_json(t):
+                    targets.append(target)
+            self.targets = targets
+        return True
+
 
-class SeriesOverride(object):
+class SeriesOverride(_Cacheable):
+    __slots__ = ("alias", "bars", "lines", "fill", "linewidth", "fillBelowTo", "steppedLine",
+                 "points", "pointradius", "stack", "yaxis", "zindex")
+    _versioned = False
     def __init__(self, alias):
         self.alias = alias
         self.bars = None
@@ -879,29 +1314,30 @@ class SeriesOverride(object):
         self.stack = None
         self.yaxis = None
         self.zindex = None
-    def get(self):
+    @_cached
+    def get(self, version):
         d = {"alias" : self.alias}
-        if self.bars and isinstance(self.bars, bool):
+        if self.bars is not None and isinstance(self.bars, bool):
             d.update({"bars" : self.bars})
-        if self.lines and isinstance(self.lines, bool):
+        if self.lines is not None and isinstance(self.lines, bool):
             d.update({"lines" : self.lines})
-        if self.fill and isinstance(self.fill, int) and self.fill in range(11):
+        if self.fill is not None and isinstance(self.fill, int) and self.fill in range(11):
             d.update({"fill" : self.fill})
-        if self.linewidth and isinstance(self.linewidth, int) and self.linewidth in range(11):
+        if self.linewidth is not None and isinstance(self.linewidth, int) and self.linewidth in range(11):
             d.update({"linewidth" : self.linewidth})
-        if self.fillBelowTo and isinstance(self.linewidth, str):
+        if self.fillBelowTo is not None and isinstance(self.fillBelowTo, basestring):
             d.update({"fillBelowTo" : self.fillBelowTo})
         if isinstance(self.steppedLine, bool):
             d.update({"steppedLine" : self.steppedLine})
         if isinstance(self.points, bool):
             d.update({"points" : self.points})
-        if self.pointradius and isinstance(self.linewidth, int) and self.pointradius in range(1,6):
+        if self.pointradius is not None and isinstance(self.pointradius, int) and self.pointradius in range(1,6):
             d.update({"pointradius" : self.pointradius})
-        if self.stack and self.stack in [True, False, 2, 3, 4, 5]:
+        if self.stack is not None and self.stack in [True, False, 2, 3, 4, 5]:
             d.update({"stack" : self.stack})
-        if self.yaxis and self.yaxis in [1, 2]:
+        if self.yaxis is not None and self.yaxis in [1, 2]:
             d.update({"yaxis" : self.yaxis})
-        if self.zindex and isinstance(self.linewidth, int) and self.linewidth in range(-3,4):
+        if self.zindex is not None and isinstance(self.zindex, int) and self.zindex in range(-3,4):
             d.update({"zindex" : self.zindex})
         return d
     def set_bars(self, b):
@@ -961,8 +1397,34 @@ class SeriesOverride(object):
             self.alias = b
             self.fillBelowTo = b
             self.lines = False
-    def get_json(self):
-        return json.dumps(self.get())
+    def read_json(self, j):
+        j = _load(j)
+        if j.has_key("alias"):
+            self.alias = j["alias"]
+        if j.has_key("bars"):
+            self.set_bars(j["bars"])
+        if j.has_key("lines"):
+            self.set_lines(j["lines"])
+        if j.has_key("fill"):
+            self.set_fill(j["fill"])
+        if j.has_key("linewidth"):
+            self.set_linewidth(j["linewidth"])
+        if j.has_key("fillBelowTo") and isinstance(j["fillBelowTo"], basestring):
+            self.fillBelowTo = j["fillBelowTo"]
+        if j.has_key("steppedLine"):
+            self.set_steppedLine(j["steppedLine"])
+        if j.has_key("points"):
+            self.set_points(j["points"])
+        if j.has_key("pointradius"):
+            self.set_pointradius(j["pointradius"])
+        if j.has_key("stack"):
+            self.set_stack(j["stack"])
+        if j.has_key("yaxis"):
+            self.set_yaxis(j["yaxis"])
+        if j.has_key("zindex"):
+            self.set_zindex(j["zindex"])
+    def get_json(self, version=None):
+        return json.dumps(self._get_shared(version))
     def __str__(self):
         return str(self.get())
     def __repr__(self):
@@ -970,37 +1432,51 @@ class SeriesOverride(object):
 
 
 class GraphPanel(PlotPanel):
+    __slots__ = ("type", "seriesOverrides", "grid", "tooltip", "legend", "aliasColors",
+                 "y_formats", "leftYAxisLabel", "rightYAxisLabel", "nullPointMode", "bars",
+                 "timeFrom", "timeShift", "hideTimeOverride", "steppedLine", "transparent",
+                 "percentage", "xaxis", "yaxis", "stack", "lines", "points", "linewidth",
+                 "fill", "renderer", "pointradius", "interval")
+    validYFormats = frozenset(['bytes', 'kbytes', 'mbytes', 'gbytes', 'bits',
+                               'bps', 'Bps', 'short', 'joule', 'watt', 'kwatt',
+                               'watth', 'ev', 'amp', 'volt',
+                               'none', 'percent', 'ppm', 'dB', 'ns', 'us',
+                               'ms', 's', 'hertz', 'pps',
+                               'celsius', 'farenheit', 'humidity',
+                               'pressurembar', 'pressurehpa',
+                               'velocityms', 'velocitykmh', 'velocitymph', 'velocityknot'])
+    validNullPointModes = frozenset(["connected", 'null as zero', 'null'])
+    validRenderer = frozenset(["png", "flot"])
     def __init__(self, bars=False, links=[], isNew=True, nullPointMode="connected",
                        renderer="flot", linewidth=2, steppedLine=False, fill=1,
-                       span=12, title="", tooltip=Tooltip(), targets=[],
+                       span=12, title="", tooltip=None, targets=[],
                        seriesOverrides=[], percentage=False, xaxis=True,
                        error=False, editable=True, stack=False, yaxis=True,
                        timeShift=None, aliasColors={}, lines=True, points=False,
-                       datasource="", pointradius=5, y_formats=[], legend=Legend(),
-                       leftYAxisLabel=None, rightYAxisLabel=None, grid=Grid(),
-                       transparent=False, hideTimeOverride=False, timeFrom=None):
-        self.validYFormats = ['bytes', 'kbytes', 'mbytes', 'gbytes', 'bits',
-                              'bps', 'Bps', 'short', 'joule', 'watt', 'kwatt',
-                              'watth', 'ev', 'amp', 'volt'
-                              'none', 'percent', 'ppm', 'dB', 'ns', 'us',
-                              'ms', 's', 'hertz', 'pps',
-                              'celsius', 'farenheit', 'humidity',
-                              'pressurembar', 'pressurehpa',
-                              'velocityms', 'velocitykmh', 'velocitymph', 'velocityknot']
-        self.validNullPointModes = ["connected", 'null as zero', 'null']
-        self.validRenderer = ["png", "flot"]
+                       datasource="", pointradius=5, y_formats=[], legend=None,
+                       leftYAxisLabel=None, rightYAxisLabel=None, grid=None,
+                       transparent=False, hideTimeOverride=False, timeFrom=None,
+                       interval=None):
         PlotPanel.__init__(self, title=title, isNew=isNew, targets=targets, links=links,
                          datasource=datasource, error=error, span=span, editable=editable)
         self.type = "graph"
+        self.interval = None
+        self.set_interval(interval)
         self.set_bars(bars)
         self.set_nullPointMode(nullPointMode)
         self.set_renderer(renderer)
         self.set_linewidth(linewidth)
         self.set_steppedLine(steppedLine)
         self.set_fill(fill)
-        self.seriesOverrides = seriesOverrides
+        self.seriesOverrides = list(seriesOverrides)
         self.set_percentage(percentage)
         self.set_xaxis(xaxis)
+        if grid == None:
+            grid = Grid()
+        if tooltip == None:
+            tooltip = Tooltip()
+        if legend == None:
+            legend = Legend()
         self.grid = grid
         self.tooltip = tooltip
         self.legend = legend
@@ -1030,9 +1506,20 @@ class GraphPanel(PlotPanel):
             self.nullPointMode = m
             return True
         return False
+    def set_interval(self, interval):
+        """
+        Set the minimal group by time interval of the panel's queries
+
+        :param interval: Interval string like '>10s' or None to leave it out
+        :return True/False
+        """
+        if interval != None and not isinstance(interval, basestring):
+            return False
+        self.interval = interval
+        return True
     def add_seriesOverride(self, b):
         if isinstance(b, SeriesOverride):
-            self.seriesOverride.append(b)
+            self.seriesOverrides = self.seriesOverrides + [b]
             return True
         return False
     def set_bars(self, bars):
@@ -1134,74 +1621,167 @@ class GraphPanel(PlotPanel):
         self.leftYAxisLabel = str(l)
     def set_rightYAxisLabel(self, l):
         self.rightYAxisLabel = str(l)
-    def get(self):
+    def read_json(self, j):
+        """
+        Configure GraphPanel object according to settings in JSON document of a Grafana 2.x or
+        3.x graph panel
+
+        :param j: JSON string or dictionary
+        :return True/False
+        """
+        j = _load(j)
+        if not isinstance(j, dict):
+            return False
+        PlotPanel.read_json(self, j)
+        if j.has_key("bars"):
+            self.set_bars(j["bars"])
+        if j.has_key("nullPointMode"):
+            self.set_nullPointMode(j["nullPointMode"])
+        if j.has_key("renderer"):
+            self.set_renderer(j["renderer"])
+        if j.has_key("linewidth"):
+            self.set_linewidth(j["linewidth"])
+        if j.has_key("steppedLine"):
+            self.set_steppedLine(j["steppedLine"])
+        if j.has_key("fill"):
+            self.set_fill(j["fill"])
+        if j.has_key("percentage"):
+            self.set_percentage(j["percentage"])
+        if j.has_key("stack"):
+            self.set_stack(j["stack"])
+        if j.has_key("lines"):
+            self.set_lines(j["lines"])
+        if j.has_key("points"):
+            self.set_points(j["points"])
+        if j.has_key("pointradius"):
+            self.set_pointradius(j["pointradius"])
+        if j.has_key("hideTimeOverride"):
+            self.set_hideTimeOverride(j["hideTimeOverride"])
+        if j.has_key("transparent"):
+            self.set_transparent(j["transparent"])
+        if j.has_key("timeShift"):
+            self.set_timeShift(j["timeShift"])
+        if j.has_key("timeFrom"):
+            self.set_timeFrom(j["timeFrom"])
+        if j.has_key("interval"):
+            self.set_interval(j["interval"])
+        if j.has_key("aliasColors") and isinstance(j["aliasColors"], dict):
+            self.aliasColors = j["aliasColors"]
+        if j.has_key("seriesOverrides") and isinstance(j["seriesOverrides"], list):
+            overrides = []
+            for s in j["seriesOverrides"]:
+                o = SeriesOverride("")
+                o.read_json(s)
+                overrides.append(o)
+            self.seriesOverrides = overrides
+        if j.has_key("tooltip"):
+            t = Tooltip()
+            t.read_json(j["tooltip"])
+            self.tooltip = t
+        if j.has_key("legend"):
+            l = Legend()
+            l.read_json(j["legend"])
+            self.legend = l
+        grid = Grid()
+        if j.has_key("grid"):
+            grid.read_json(j["grid"])
+        left = "short"
+        right = "short"
+        if j.has_key("y_formats") and isinstance(j["y_formats"], list) and len(j["y_formats"]) == 2:
+            left, right = j["y_formats"]
+        if j.has_key("leftYAxisLabel"):
+            self.leftYAxisLabel = j["leftYAxisLabel"]
+        if j.has_key("rightYAxisLabel"):
+            self.rightYAxisLabel = j["rightYAxisLabel"]
+        if j.has_key("x-axis"):
+            self.set_xaxis(j["x-axis"])
+        if j.has_key("y-axis"):
+            self.set_yaxis(j["y-axis"])
+        if j.has_key("xaxis") and isinstance(j["xaxis"], dict) and j["xaxis"].has_key("show"):
+            self.set_xaxis(j["xaxis"]["show"])
+        if j.has_key("yaxes") and isinstance(j["yaxes"], list) and len(j["yaxes"]) == 2:
+            lefty, righty = j["yaxes"]
+            left = lefty.get("format", left)
+            right = righty.get("format", right)
+            self.leftYAxisLabel = lefty.get("label")
+            self.rightYAxisLabel = righty.get("label")
+            if lefty.has_key("show"):
+                self.set_yaxis(lefty["show"])
+            grid.read_json({"leftMax" : lefty.get("max"), "leftMin" : lefty.get("min"),
+                            "leftLogBase" : lefty.get("logBase", 1),
+                            "rightMax" : righty.get("max"), "rightMin" : righty.get("min"),
+                            "rightLogBase" : righty.get("logBase", 1)})
+        self.set_y_formats(left, right)
+        self.grid = grid
+        return True
+    @_cached
+    def get(self, version):
         
         g = {"bars" : self.bars, "timeFrom" : self.timeFrom, "links" : self.links,
                 "isNew" : self.isNew, "nullPointMode" : self.nullPointMode,
                 "renderer" : self.renderer, "linewidth" : self.linewidth,
                 "steppedLine" : self.steppedLine, "id" : self.id, "fill" : self.fill,
-                "span" : self.span, "title" : self.title, "tooltip" : self.tooltip.get(),
-                "targets" : [ t.get() for t in self.targets], "grid" : self.grid.get(),
-                "seriesOverrides" : self.seriesOverrides, "percentage" : self.percentage,
+                "span" : self.span, "title" : self.title, "tooltip" : self.tooltip._get_shared(version),
+                "targets" : self._get_targets(version), "grid" : self.grid._get_shared(version),
+                "seriesOverrides" : [ s._get_shared(version) for s in self.seriesOverrides], "percentage" : self.percentage,
                 "type" : self.type, "error" : self.error,
-                "editable" : self.editable, "legend" : self.legend.get(), "stack" : self.stack,
+                "editable" : self.editable, "legend" : self.legend._get_shared(version), "stack" : self.stack,
                 "timeShift" : self.timeShift,
                 "aliasColors" : self.aliasColors, "lines" : self.lines,
                 "points" : self.points, "datasource" : self.datasource,
                 "pointradius" : self.pointradius}
         if self.transparent:
             g.update({"transparent" : self.transparent})
-        
-        if grafana_version.startswith("2"):
-            if self.leftYAxisLabel:
-                g.update({"leftYAxisLabel" : self.leftYAxisLabel})
-            if self.rightYAxisLabel:
-                g.update({"rightYAxisLabel" : self.rightYAxisLabel})
-            yfmt = ["short","short"]
-            if len(self.y_formats) > 0:
-                yfmt = self.y_formats
-            g.update({"y_formats" : yfmt, "x-axis" : self.xaxis, "y-axis" : self.yaxis})
-        elif grafana_version.startswith("3"):
-            g.update({"xaxis" : { "show" : self.xaxis}})
-            lfmt = "short"
-            if len(self.y_formats) > 0:
-                lfmt = self.y_formats[0]
-            lefty = {"show" : self.yaxis, "logBase" : self.grid.leftLogBase,
-                     "max" : self.grid.leftMax, "min" : self.grid.leftMin,
-                     "format" : lfmt}
-            if self.leftYAxisLabel:
-                lefty.update({"label" : self.leftYAxisLabel})
-            else:
-                lefty.update({"label" : None})
-            rfmt = "short"
-            if len(self.y_formats) > 1:
-                rfmt = self.y_formats[1]
-            righty = {"show" : self.yaxis, "logBase" : self.grid.rightLogBase,
-                     "max" : self.grid.rightMax, "min" : self.grid.rightMin,
-                     "format" : rfmt}
-            if self.rightYAxisLabel:
-                righty.update({"label" : self.rightYAxisLabel})
-            else:
-                righty.update({"label" : None})
-            g.update({"yaxes" : [lefty, righty]})
+        if self.interval != None:
+            g.update({"interval" : self.interval})
+        self._axes[version](self, g)
         return g
+    def _get_axes_2(self, g):
+        if self.leftYAxisLabel:
+            g.update({"leftYAxisLabel" : self.leftYAxisLabel})
+        if self.rightYAxisLabel:
+            g.update({"rightYAxisLabel" : self.rightYAxisLabel})
+        yfmt = ["short","short"]
+        if len(self.y_formats) > 0:
+            yfmt = self.y_formats
+        g.update({"y_formats" : yfmt, "x-axis" : self.xaxis, "y-axis" : self.yaxis})
+    def _get_axes_3(self, g):
+        g.update({"xaxis" : { "show" : self.xaxis}})
+        lfmt = "short"
+        if len(self.y_formats) > 0:
+            lfmt = self.y_formats[0]
+        lefty = {"show" : self.yaxis, "logBase" : self.grid.leftLogBase,
+                 "max" : self.grid.leftMax, "min" : self.grid.leftMin,
+                 "format" : lfmt}
+        if self.leftYAxisLabel:
+            lefty.update({"label" : self.leftYAxisLabel})
+        else:
+            lefty.update({"label" : None})
+        rfmt = "short"
+        if len(self.y_formats) > 1:
+            rfmt = self.y_formats[1]
+        righty = {"show" : self.yaxis, "logBase" : self.grid.rightLogBase,
+                 "max" : self.grid.rightMax, "min" : self.grid.rightMin,
+                 "format" : rfmt}
+        if self.rightYAxisLabel:
+            righty.update({"label" : self.rightYAxisLabel})
+        else:
+            righty.update({"label" : None})
+        g.update({"yaxes" : [lefty, righty]})
+    _axes = {"2" : _get_axes_2, "3" : _get_axes_3}
 
 class PiePanel(PlotPanel):
-    def __init__(self, title, isNew=True, targets=[], links=[], datasource="",
+    __slots__ = ("type", "pieType", "aliasColors", "cacheTimeout", "fontSize", "format",
+                 "interval", "legendType", "maxDataPoints", "nullPointMode", "strokeWidth",
+                 "valueName", "legend")
+    validYFormats = GraphPanel.validYFormats
+    validLegendTypes = frozenset(["Under graph"])
+    validNullPointModes = frozenset(["connected", 'null as zero', 'null'])
+    def __init__(self, title="", isNew=True, targets=[], links=[], datasource="",
                  error=False, span=12, editable=True, aliasColors={}, cacheTimeout=None,
                  fontSize="80%", format="short", interval=None, legendType="Under graph",
                  maxDataPoints=3, nullPointMode="connected", strokeWidth=1, valueName="current",
-                 legend=Legend()):
-        self.validYFormats = ['bytes', 'kbytes', 'mbytes', 'gbytes', 'bits',
-                              'bps', 'Bps', 'short', 'joule', 'watt', 'kwatt',
-                              'watth', 'ev', 'amp', 'volt'
-                              'none', 'percent', 'ppm', 'dB', 'ns', 'us',
-                              'ms', 's', 'hertz', 'pps',
-                              'celsius', 'farenheit', 'humidity',
-                              'pressurembar', 'pressurehpa',
-                              'velocityms', 'velocitykmh', 'velocitymph', 'velocityknot']
-        self.validLegendTypes = ["Under graph"]
-        self.validNullPointModes = ["connected", 'null as zero', 'null']
+                 legend=None):
         PlotPanel.__init__(self, title=title, isNew=isNew, targets=targets, links=links,
                          datasource=datasource, error=error, span=span, editable=editable)
         self.type = "grafana-piechart-panel"
@@ -1215,7 +1795,10 @@ class PiePanel(PlotPanel):
         self.set_maxDataPoints(maxDataPoints)
         self.set_nullPointMode(nullPointMode)
         self.set_strokeWidth(strokeWidth)
-        
+        self.set_valueName(valueName)
+        if legend == None:
+            legend = Legend()
+        self.set_legend(legend)
     def set_aliasColors(self, aliasColors):
         if isinstance(aliasColors, dict):
             self.aliasColors = aliasColors
@@ -1227,7 +1810,7 @@ class PiePanel(PlotPanel):
             return True
         return False
     def set_fontSize(self, fontSize):
-        if re.match("\d+%", fontSize):
+        if isinstance(fontSize, str) and _font_size_pattern.match(fontSize):
             self.fontSize = fontSize
             return True
         return False
@@ -1271,7 +1854,8 @@ class PiePanel(PlotPanel):
             self.legend = legend
         else:
             raise ValueError
-    def get(self):
+    @_cached
+    def get(self, version):
         d = {
           "aliasColors": self.aliasColors,
           "cacheTimeout": self.cacheTimeout,
@@ -1280,10 +1864,10 @@ class PiePanel(PlotPanel):
           "error": self.error,
           "fontSize": self.fontSize,
           "format": self.format,
-          "id": 1,
+          "id": self.id,
           "interval": self.interval,
           "isNew": self.isNew,
-          "legend": self.legend.get(),
+          "legend": self.legend._get_shared(version),
           "legendType": self.legendType,
           "links": self.links,
           "maxDataPoints": self.maxDataPoints,
@@ -1291,77 +1875,67 @@ class PiePanel(PlotPanel):
           "pieType": self.pieType,
           "span": self.span,
           "strokeWidth": self.strokeWidth,
-          "targets": self.targets,
+          "targets": self._get_targets(version),
           "title": self.title,
           "type": self.type,
           "valueName": self.valueName
         }
         return d
-    def get_json(self):
-        return json.dumps(self.get())
+    def get_json(self, version=None):
+        return json.dumps(self._get_shared(version))
     def __str__(self):
         return str(self.get())
     def __repr__(self):
         return str(self.get())
     def read_json(self, j):
+        j = _load(j)
         if not isinstance(j, dict):
-            j = json.loads(j)
+            return False
+        PlotPanel.read_json(self, j)
         if j.has_key("aliasColors"):
             self.set_aliasColors(j["aliasColors"])
         if j.has_key("cacheTimeout"):
             self.set_cacheTimeout(j["cacheTimeout"])
-        if j.has_key("datasource"):
-            self.set_datasource(j["datasource"])
-        if j.has_key("editable"):
-            self.set_editable(j["editable"])
-        if j.has_key("error"):
-            self.set_error(j["error"])
         if j.has_key("fontSize"):
             self.set_fontSize(j["fontSize"])
         if j.has_key("format"):
             self.set_format(j["format"])
         if j.has_key("interval"):
             self.set_interval(j["interval"])
-        if j.has_key("isNew"):
-            self.set_isNew(j["isNew"])
         if j.has_key("legend"):
-            self.set_legend(Legend().read_json(j["legend"]))
+            l = Legend()
+            l.read_json(j["legend"])
+            self.set_legend(l)
         if j.has_key("legendType"):
             self.set_legendType(j["legendType"])
         if j.has_key("maxDataPoints"):
             self.set_maxDataPoints(j["maxDataPoints"])
         if j.has_key("nullPointMode"):
             self.set_nullPointMode(j["nullPointMode"])
-        if j.has_key("span"):
-            self.set_span(j["span"])
+        if j.has_key("pieType"):
+            self.pieType = j["pieType"]
         if j.has_key("strokeWidth"):
             self.set_strokeWidth(j["strokeWidth"])
-        if j.has_key("title"):
-            self.set_title(j["title"])
         if j.has_key("valueName"):
             self.set_valueName(j["valueName"])
-        if j.has_key("links"):
-            for l in j["links"]:
-                self.add_link(l)
-        if j.has_key("targets"):
-            for t in j["targets"]:
-                target = Target("").read_json(t)
-                self.add_target(target)
-        
+        return True
+
 
 
-class Gauge(object):
+class Gauge(_Cacheable):
+    __slots__ = ("maxValue", "minValue", "show", "thresholdLabels", "thresholdMarkers")
+    _versioned = False
+    default_maxValue = 100
+    default_minValue = 0
+    default_show = False
+    default_thresholdLabels = False
+    default_thresholdMarkers = True
     def __init__(self, maxValue=None, minValue=None, show=None, thresholdLabels=None, thresholdMarkers=None):
         self.maxValue = maxValue
         self.minValue = minValue
         self.show = show
         self.thresholdLabels = thresholdLabels
         self.thresholdMarkers = thresholdMarkers
-        self.default_maxValue = 100
-        self.default_minValue = 0
-        self.default_show = False
-        self.default_thresholdLabels = False
-        self.default_thresholdMarkers = True
     def set_show(self, b):
         if isinstance(b, bool):
             self.show = b
@@ -1395,11 +1969,12 @@ class Gauge(object):
                 return False
         self.minValue = b
         return True
-    def get(self):
+    @_cached
+    def get(self, version):
         maV = self.maxValue
         if not maV:
             maV = self.default_maxValue
-        miV = self.maxValue
+        miV = self.minValue
         if not miV:
             miV = self.default_minValue
         s = self.show
@@ -1414,15 +1989,14 @@ class Gauge(object):
         return {"maxValue" : maV, "minValue" : miV,
                 "show" : s, "thresholdLabels" : tl,
                 "thresholdMarkers" : tm}
-    def get_json(self):
-        return json.dumps(self.get())
+    def get_json(self, version=None):
+        return json.dumps(self._get_shared(version))
     def __str__(self):
         return str(self.get())
     def __repr__(self):
         return str(self.get())
     def read_json(self, j):
-        if not isinstance(j, dict):
-            j = json.loads(j)
+        j = _load(j)
         if j.has_key("maxValue"):
             self.set_maxValue(j["maxValue"])
         if j.has_key("minValue"):
@@ -1434,17 +2008,19 @@ class Gauge(object):
         if j.has_key("thresholdMarkers"):
             self.set_thresholdMarkers(j["thresholdMarkers"])
 
-class Sparkline(object):
+class Sparkline(_Cacheable):
+    __slots__ = ("fillColor", "full", "lineColor", "show")
+    _versioned = False
+    default_fillColor = "rgba(31, 118, 189, 0.18)"
+    default_lineColor = "rgb(31, 120, 193)"
+    default_full = False
+    default_show = False
     def __init__(self, fillColor=None, full=None,
                        lineColor=None, show=None):
         self.fillColor = fillColor
         self.full = full
         self.lineColor = lineColor
         self.show = show
-        self.default_fillColor = "rgba(31, 118, 189, 0.18)"
-        self.default_lineColor = "rgb(31, 120, 193)"
-        self.default_full = False
-        self.default_show = False
     def set_full(self, b):
         if isinstance(b, bool):
             self.full = b
@@ -1467,7 +2043,8 @@ class Sparkline(object):
             self.lineColor = c
             return True
         return False
-    def get(self):
+    @_cached
+    def get(self, version):
         fc = self.fillColor
         if not fc:
             fc = self.default_fillColor
@@ -1482,15 +2059,14 @@ class Sparkline(object):
             s = self.default_show
         return { "fillColor" : str(fc), "full" : f,
                  "lineColor" : str(fc), "show" : s }
-    def get_json(self):
-        return json.dumps(self.get())
+    def get_json(self, version=None):
+        return json.dumps(self._get_shared(version))
     def __str__(self):
         return str(self.get())
     def __repr__(self):
         return str(self.get())
     def read_json(self, j):
-        if not isinstance(j, dict):
-            j = json.loads(j)
+        j = _load(j)
         if j.has_key("fillColor"):
             self.set_fillColor(j["fillColor"])
         if j.has_key("lineColor"):
@@ -1501,13 +2077,19 @@ class Sparkline(object):
             self.set_show(j["show"])
 
 class SingleStat(PlotPanel):
+    __slots__ = ("type", "cacheTimeout", "colorBackground", "colorValue", "colors", "format",
+                 "gauge", "interval", "maxDataPoints", "NonePointMode", "NoneText", "postfix",
+                 "postfixFontSize", "prefix", "prefixFontSize", "sparkline", "thresholds",
+                 "valueFontSize", "valueMaps", "valueName")
+    validFontSizes = frozenset(['20%', '30%','50%','70%','80%','100%', '110%', '120%', '150%', '170%', '200%'])
+    validValueNames = frozenset(['min','max','avg', 'current', 'total', 'name'])
     def __init__(self, cacheTimeout=None, colorBackground=False, colorValue=False,
                        colors=[], datasource="", editable=True, error=False,
-                       format="none", gauge=Gauge(), interval=None,
+                       format="none", gauge=None, interval=None,
                        isNew=True, links=[], maxDataPoints=100,
                        NonePointMode="connected", NoneText=None, postfix="",
                        postfixFontSize="50%", prefix="", prefixFontSize="50%",
-                       span=3, sparkline=Sparkline(), targets=[], thresholds="",
+                       span=3, sparkline=None, targets=[], thresholds="",
                        title="", valueFontSize="80%", valueMaps=[], valueName="avg"):
 
         PlotPanel.__init__(self, title=title, isNew=isNew, targets=targets, links=links,
@@ -1516,25 +2098,27 @@ class SingleStat(PlotPanel):
         self.cacheTimeout = cacheTimeout
         self.colorBackground = colorBackground
         self.colorValue = colorValue
-        self.colors = colors
+        self.colors = list(colors)
         self.format = format
+        if gauge == None:
+            gauge = Gauge()
         self.gauge = gauge
         self.interval = interval
         self.maxDataPoints = maxDataPoints
         self.NonePointMode = NonePointMode
         self.NoneText = NoneText
-        self.validFontSizes = ['20%', '30%','50%','70%','80%','100%', '110%', '120%', '150%', '170%', '200%']
         self.postfix = postfix
         #self.postfixFontSize = postfixFontSize
         self.set_postFontSize(postfixFontSize)
         self.prefix = prefix
         self.set_prefixFontSize(prefixFontSize)
         #self.prefixFontSize = prefixFontSize
+        if sparkline == None:
+            sparkline = Sparkline()
         self.sparkline = sparkline
         self.thresholds = thresholds
         self.valueFontSize = valueFontSize
-        self.valueMaps = valueMaps
-        self.validValueNames = ['min','max','avg', 'current', 'total', 'name']
+        self.valueMaps = list(valueMaps)
         self.set_valueName(valueName)
     def set_colorBackground(self, b):
         if isinstance(b, bool):
@@ -1572,32 +2156,81 @@ class SingleStat(PlotPanel):
         else:
             print "invalid value %s for valueFontSize" % (v,)
     def add_valueMap(self, value, text, operator="="):
-        self.valueMaps.append({ "value" : value, "op" : operator, "text": text })
+        self.valueMaps = self.valueMaps + [{ "value" : value, "op" : operator, "text": text }]
     def add_rangeMap(self, start, end, text ):
-        self.valueMaps.append({ "from": start, "to": end, "text": text })
+        self.valueMaps = self.valueMaps + [{ "from": start, "to": end, "text": text }]
     def add_color(self, c):
         if check_color(c):
-            self.colors.append(c)
+            self.colors = self.colors + [c]
     def invert_colors(self):
         self.colors = self.colors[::-1]
-    def get(self):
-        vmaps = []
-        if len(self.valueMaps) == 0:
-            vmaps.append( { "op" : "=", "text" : "N/A", "value" : "None" })
+    def read_json(self, j):
+        j = _load(j)
+        if not isinstance(j, dict):
+            return False
+        PlotPanel.read_json(self, j)
+        if j.has_key("cacheTimeout"):
+            self.cacheTimeout = j["cacheTimeout"]
+        if j.has_key("colorBackground"):
+            self.set_colorBackground(j["colorBackground"])
+        if j.has_key("colorValue"):
+            self.set_colorValue(j["colorValue"])
+        if j.has_key("colors") and isinstance(j["colors"], list):
+            self.colors = list(j["colors"])
+        if j.has_key("format"):
+            self.format = j["format"]
+        if j.has_key("gauge"):
+            g = Gauge()
+            g.read_json(j["gauge"])
+            self.gauge = g
+        if j.has_key("interval"):
+            self.interval = j["interval"]
+        if j.has_key("maxDataPoints"):
+            self.maxDataPoints = j["maxDataPoints"]
+        if j.has_key("nullPointMode"):
+            self.NonePointMode = j["nullPointMode"]
+        if j.has_key("nullText"):
+            self.NoneText = j["nullText"]
+        if j.has_key("postfix"):
+            self.postfix = j["postfix"]
+        if j.has_key("postfixFontSize"):
+            self.set_postFontSize(j["postfixFontSize"])
+        if j.has_key("prefix"):
+            self.prefix = j["prefix"]
+        if j.has_key("prefixFontSize"):
+            self.set_prefixFontSize(j["prefixFontSize"])
+        if j.has_key("sparkline"):
+            s = Sparkline()
+            s.read_json(j["sparkline"])
+            self.sparkline = s
+        if j.has_key("thresholds"):
+            self.thresholds = j["thresholds"]
+        if j.has_key("valueFontSize"):
+            self.set_valueFontSize(j["valueFontSize"])
+        if j.has_key("valueMaps") and isinstance(j["valueMaps"], list):
+            self.valueMaps = list(j["valueMaps"])
+        if j.has_key("valueName"):
+            self.set_valueName(j["valueName"])
+        return True
+    @_cached
+    def get(self, version):
+        vmaps = self.valueMaps
+        if len(vmaps) == 0:
+            vmaps = [{ "op" : "=", "text" : "N/A", "value" : "null" }]
         c = ["rgba(245, 54, 54, 0.9)", "rgba(237, 129, 40, 0.89)", "rgba(50, 172, 45, 0.97)"]
         if len(self.colors) > 0:
             c = self.colors
         return { "cacheTimeout": self.cacheTimeout, "colorBackground": self.colorBackground,
                  "colorValue": self.colorValue, "colors": c,
                  "datasource": self.datasource, "editable": self.editable,
-                 "error": self.error, "format": self.format, "gauge": self.gauge.get(),
+                 "error": self.error, "format": self.format, "gauge": self.gauge._get_shared(version),
                  "id": self.id, "interval": self.interval, "isNew": self.isNew,
                  "links": self.links, "maxDataPoints": self.maxDataPoints,
-                 "NonePointMode": self.NonePointMode, "NoneText": self.NoneText,
+                 "nullPointMode": self.NonePointMode, "nullText": self.NoneText,
                  "postfix": self.postfix, "postfixFontSize": self.postfixFontSize,
                  "prefix": self.prefix, "prefixFontSize": self.prefixFontSize,
-                 "span": self.span, "sparkline": self.sparkline.get(),
-                 "targets": [ t.get() for t in self.targets], "thresholds": self.thresholds,
+                 "span": self.span, "sparkline": self.sparkline._get_shared(version),
+                 "targets": self._get_targets(version), "thresholds": self.thresholds,
                  "title": self.title, "type": self.type,
                  "valueFontSize": self.valueFontSize, "valueName": self.valueName,
                  "valueMaps": vmaps }
@@ -1607,7 +2240,9 @@ class SingleStat(PlotPanel):
 #   - Template: add 'useTags' and others only if type == 'query'
 #   - Warn if repeat template has multi == False
 
-class Row(object):
+class Row(_Cacheable):
+    __slots__ = ("panels", "title", "height", "repeat", "editable", "collapse", "showTitle")
+    _hash_children = "panels"
     def __init__(self, title="", panels=[], editable=True, collapse=False, height="250px", showTitle=False, repeat=None):
         self.set_title(title)
         self.panels = []
@@ -1634,7 +2269,7 @@ class Row(object):
             except ValueError:
                 print "Height must be stringifyable"
                 return False
-        if not re.match("\d+px", height) and not re.match("\d+[cm]*", height):
+        if not _height_pattern.match(height):
             print "Height not valid"
             return False
         self.height = height
@@ -1659,32 +2294,33 @@ class Row(object):
             self.showTitle = showTitle
             return True
         return False
-    def add_panel(self, p):
-        if isinstance(p, Panel):
-            x = copy.deepcopy(p)
-            self.panel.append(x)
-            return True
-        return False
-    def get(self):
-        return {'title': self.title, 'panels': [ p.get() for p in self.panels ],
+    def _get(self, panels):
+        return {'title': self.title, 'panels': panels,
                 'editable': self.editable, 'collapse': self.collapse,
                 'height': self.height, 'repeat' : self.repeat}
-    def get_json(self):
-        return json.dumps(self.get())
+    @_cached
+    def get(self, version):
+        ids = _allocate_ids([p.id for p in self.panels if p.id != None])
+        return self._get(_assign_ids([p._get_shared(version) for p in self.panels], self.panels, "id", ids))
+    def get_json(self, version=None):
+        return json.dumps(self._get_shared(version))
     def __str__(self):
         return str(self.get())
     def __repr__(self):
         return str(self.get())
     def add_panel(self, p):
         if isinstance(p, Panel):
-            x = copy.deepcopy(p)
-            self.panels.append(x)
+            x = _compose(p)
+            self.panels = self.panels + [x]
+            return True
+        return False
     def set_datasource(self, d):
         for p in self.panels:
             p.set_datasource(d)
     def read_json(self, j):
+        j = _load(j)
         if not isinstance(j, dict):
-            j = json.loads(j)
+            return False
         if j.has_key("title"):
             self.set_title(j["title"])
         if j.has_key("editable"):
@@ -1693,35 +2329,34 @@ class Row(object):
             self.set_collapse(j["collapse"])
         if j.has_key("height"):
             self.set_height(j["height"])
-        if j.has_key("panels"):
+        if j.has_key("showTitle"):
+            self.set_showTitle(j["showTitle"])
+        if j.has_key("repeat"):
+            self.set_repeat(j["repeat"])
+        if j.has_key("panels") and isinstance(j["panels"], list):
+            panels = []
             for p in j["panels"]:
-                o = None
-                if p.has_key("type"):
-                    if p["type"] == "singlestat":
-                        o = SingleStat()
-                        o.read_json(p)
-                    if p["type"] == "graph":
-                        o = Graph()
-                        o.read_json(p)
-                    if p["type"] == "text":
-                        o = TextPanel()
-                        o.read_json(p)
+                o = read_panel(p)
                 if o:
-                    self.add_panel(o)
-                    return True
-                return False
+                    panels.append(o)
+            self.panels = panels
+        return True
 
 
-class Template(object):
+class Template(_Cacheable):
+    __slots__ = ("options", "current", "tags", "name", "value", "useTags", "tagsQuery",
+                 "tagValuesQuery", "label", "datasource", "multi", "auto", "auto_count",
+                 "hideLabel", "refresh", "includeAll", "type", "allFormat", "multiFormat")
+    _versioned = False
+    validAllFormats = frozenset(["regex wildcard", "glob"])
+    validMultiFormats = frozenset(["regex values", "glob"])
+    validTypes = frozenset(["query", "interval", "custom"])
+    validAutoCounts = frozenset([3, 5, 10, 30, 50, 100, 200])
     def __init__(self, name, value, multi=True, allFormat="regex wildcard",
                        refresh=True, options=[], current={}, datasource="", tags=[],
                        type="query", multiFormat="regex values", includeAll=False,
                        label=None, hideLabel=False, auto_count=None, auto=False,
                        useTags=False, tagsQuery="", tagValuesQuery=""):
-        self.validAllFormats = ["regex wildcard", "glob"]
-        self.validMultiFormats = ["regex values", "glob"]
-        self.validTypes = ["query", "interval", "custom"]
-        self.validAutoCounts = [3, 5, 10, 30, 50, 100, 200]
         self._set_name_and_value(name, value)
         self.set_multi(multi)
         self.set_allFormat(allFormat)
@@ -1835,7 +2470,7 @@ class Template(object):
             self.options = copy.deepcopy(option)
             return True
         elif isinstance(option, str):
-            self.options.append(option)
+            self.options = self.options + [option]
             return True
         return False
     def add_tag(self, tag):
@@ -1843,12 +2478,13 @@ class Template(object):
             self.tags = copy.deepcopy(tag)
             return True
         elif isinstance(tag, str):
-            self.tags.append(tag)
+            self.tags = self.tags + [tag]
             return True
         return False
-    def get(self):
+    @_cached
+    def get(self, version):
         q = self.value
-        if self.type == "query" and self.datasource == "influxdb" and not q.startswith("SHOW TAG VALUES WITH KEY"):
+        if self.type == "query" and self.datasource == "influxdb" and not q.upper().startswith("SHOW "):
             q = "SHOW TAG VALUES WITH KEY = %s" % (self.value,)
             if len(self.tags) > 0:
                 l = []
@@ -1877,15 +2513,14 @@ class Template(object):
                       "tagsQuery" : self.tagsQuery,
                       "tagValuesQuery" : self.tagValuesQuery})
         return d
-    def get_json(self):
-        return json.dumps(self.get())
+    def get_json(self, version=None):
+        return json.dumps(self._get_shared(version))
     def __str__(self):
         return str(self.get())
     def __repr__(self):
         return str(self.get())
     def read_json(self, j):
-        if not isinstance(j, dict):
-            j = json.loads(j)
+        j = _load(j)
         if j.has_key('name') and j.has_key('value'):
             self._set_name_and_value(j['name'], j['value'])
         if j.has_key('name') and j.has_key('query'):
@@ -1918,21 +2553,26 @@ class Template(object):
             self.set_tagsQuery(j['tagsQuery'])
         if j.has_key('tagValuesQuery'):
             self.set_tagValuesQuery(j['tagValuesQuery'])
-        if j.has_key('query'):
-            self.query(j['query'])
+        if j.has_key('current') and isinstance(j['current'], dict):
+            self.current = j['current']
+        if j.has_key('options') and isinstance(j['options'], list):
+            self.options = list(j['options'])
+        return True
 
 
-class Timepicker(object):
+class Timepicker(_Cacheable):
+    __slots__ = ("time_options", "refresh_intervals")
+    _versioned = False
     def __init__(self, time_options=['5m', '15m', '1h', '6h', '12h', '24h', '2d', '7d', '30d'],
                        refresh_intervals=['5s', '10s', '30s', '1m', '5m', '15m', '30m', '1h', '2h', '1d']):
-        self.time_options = time_options
-        self.refresh_intervals = refresh_intervals
+        self.time_options = list(time_options)
+        self.refresh_intervals = list(refresh_intervals)
     def set_time_options(self, t):
         if isinstance(t, list):
             self.time_options = copy.deepcopy(t)
             return True
         elif isinstance(t, str):
-            self.time_options.append(t)
+            self.time_options = self.time_options + [t]
             return True
         return False
     def set_refresh_intervals(self, t):
@@ -1940,74 +2580,76 @@ class Timepicker(object):
             self.refresh_intervals = copy.deepcopy(t)
             return True
         elif isinstance(t, str):
-            self.refresh_intervals.append(t)
+            self.refresh_intervals = self.refresh_intervals + [t]
             return True
         return False
-    def get(self):
+    @_cached
+    def get(self, version):
         return {'time_options': self.time_options,
                 'refresh_intervals': self.refresh_intervals}
-    def get_json(self):
-        return json.dumps(self.get())
+    def get_json(self, version=None):
+        return json.dumps(self._get_shared(version))
     def __str__(self):
         return str(self.get())
     def __repr__(self):
         return str(self.get())
     def read_json(self, j):
-        if not isinstance(j, dict):
-            j = json.loads(j)
+        j = _load(j)
         if j.has_key('time_options') and isinstance(j['time_options'], list):
             self.set_time_options(j['time_options'])
         if j.has_key('refresh_intervals') and isinstance(j['refresh_intervals'], list):
             self.set_refresh_intervals(j['refresh_intervals'])
 
-dashboard_id = 0
-
-class Dashboard(object):
+class Dashboard(_Cacheable):
+    __slots__ = ("id", "templates", "rows", "style", "links", "tags", "hideControls", "title",
+                 "editable", "originalTitle", "timepicker", "refresh", "sharedCrosshair",
+                 "timezone", "schemaVersion", "annotations", "overwrite", "startTime",
+                 "endTime", "gnetId", "slug", "version")
+    validStyles = frozenset(["light", "dark"])
+    # Default schema version per major Grafana version
+    schemaVersions = {"2" : 8, "3" : 12}
+    _hash_children = "rows"
     def __init__(self, title, style='dark', rows=[], links=[], tags=[], hideControls=False,
-                       editable=True, originalTitle="", timepicker=Timepicker(),
+                       editable=True, originalTitle="", timepicker=None,
                        refresh='10s', sharedCrosshair=False, timezone='browser',
                        schemaVersion=0, overwrite=False, templates=[], annotations=[],
                        startTime="now-6h", endTime="now", gnetId=None):
-        global dashboard_id
-        self.id = dashboard_id
-        dashboard_id += 1
-        self.templates = templates
-        self.rows = rows
+        self.id = None
+        self.templates = list(templates)
+        self.rows = list(rows)
         self.style = style
-        self.links = links
-        self.tags = tags
+        self.links = list(links)
+        self.tags = list(tags)
         self.hideControls = hideControls
         self.title = title
         self.editable = editable
         self.originalTitle = originalTitle
+        if timepicker == None:
+            timepicker = Timepicker()
         self.timepicker = timepicker
         self.refresh = refresh
         self.sharedCrosshair = sharedCrosshair
         self.timezone = timezone
         self.schemaVersion = schemaVersion
-        self.annotations = annotations
+        self.annotations = list(annotations)
         self.overwrite = overwrite
         self.startTime = startTime
         self.endTime = endTime
         self.gnetId = gnetId
+        self.version = 0
         self.slug = self.title.lower().replace(" ", "-").replace("_","-")
-        self.validStyles = ["light", "dark"]
-        if grafana_version.startswith("2"):
-            self.schemaVersion = 8
-        elif grafana_version.startswith("3"):
-            self.schemaVersion = 12
     def get_slug(self):
         return self.slug
     def add_template(self, t):
         if isinstance(t, Template):
-            x = copy.deepcopy(t)
-            self.templates.append(x)
+            x = _compose(t)
+            self.templates = self.templates + [x]
             return True
         return False
     def add_row(self, r):
         if isinstance(r, Row):
-            x = copy.deepcopy(r)
-            self.rows.append(x)
+            x = _compose(r)
+            self.rows = self.rows + [x]
             return True
         return False
     def add_tag(self, t):
@@ -2017,11 +2659,11 @@ class Dashboard(object):
             except ValueError:
                 print "Tag must be stringifyable"
                 return False
-        self.tag.append(t)
+        self.tags = self.tags + [t]
         return True
     def set_timepicker(self, t):
         if isinstance(t, Timepicker):
-            x = copy.deepcopy(t)
+            x = _compose(t)
             self.timepicker = x
             return True
         elif isinstance(t, dict):
@@ -2117,24 +2759,159 @@ class Dashboard(object):
             self.endTime = t
         if isinstance(t, int) or isinstance(t, float) or isinstance(t, datetime.datetime):
             self.endTime = str(t)
-    def get(self):
+    def _get(self, rows, version):
         origTitle = self.originalTitle
         if not origTitle:
             origTitle = self.title
-        d = {'dashboard': {'version': 0, 'style': self.style, 'rows': [ r.get() for r in self.rows ],
-                'templating': {'list': [ t.get() for t in self.templates] }, 'links': self.links,
+        schemaVersion = self.schemaVersion
+        if not schemaVersion:
+            schemaVersion = self.schemaVersions[version]
+        d = {'dashboard': {'version': self.version, 'style': self.style, 'rows': rows,
+                'templating': {'list': [ t._get_shared(version) for t in self.templates] }, 'links': self.links,
                 'tags': self.tags, 'hideControls': self.hideControls,
                 'title': self.title, 'editable': self.editable, 'id': self.id,
-                'originalTitle': origTitle, 'timepicker': self.timepicker.get(),
+                'originalTitle': origTitle, 'timepicker': self.timepicker._get_shared(version),
                 'refresh': self.refresh, 'sharedCrosshair': self.sharedCrosshair,
                 'time': {'to': self.endTime, 'from': self.startTime}, 'timezone': self.timezone,
-                'schemaVersion': 8, 'annotations': {'list': self.annotations}},
+                'schemaVersion': schemaVersion, 'annotations': {'list': self.annotations}},
                 'overwrite': self.overwrite}
-        #if grafana_version.startswith("3"):
-        #    d.update({"gnetId" : self.gnetId})
         return d
-    def get_json(self):
-        return json.dumps(self.get())
+    def _get_panel_ids(self):
+        return _allocate_ids([p.id for r in self.rows for p in _unwrap(r).panels if p.id != None])
+    @_cached
+    def get(self, version):
+        ids = self._get_panel_ids()
+        rows = []
+        for r in self.rows:
+            r = _unwrap(r)
+            rows.append(r._get(_assign_ids([p._get_shared(version) for p in r.panels], r.panels, "id", ids)))
+        return self._get(rows, version)
+    def _get_content(self, version):
+        return self._get_shared(version)["dashboard"]
+    def get_json(self, version=None):
+        return json.dumps(self._get_shared(version))
+    def iter_json(self, version=None):
+        """
+        Returns a generator with the JSON document of the Dashboard in chunks. The document is
+        the same as get_json() but only a single panel is serialized at a time. The serialized
+        panels are not stored in the cache, so the memory of a panel is released after it is
+        written.
+
+        :param version: Grafana version string, defaults to the version set with set_grafana_version()
+        :return generator of JSON strings
+        """
+        version = get_major(version)
+        ids = self._get_panel_ids()
+        panel = lambda p: _assign_ids([_get_uncached(p, version)], [p], "id", ids)[0]
+        panels = lambda r: r._get(_Stream(r.panels, panel))
+        return _iterencode(self._get(_Stream([_unwrap(r) for r in self.rows], panels), version))
+    def write_json(self, f, version=None):
+        """
+        Writes the JSON document of the Dashboard incrementally to a file-like object like a file or socket.
+
+        :param f: Object with a write() function
+        :param version: Grafana version string, defaults to the version set with set_grafana_version()
+        :return Number of written bytes
+        """
+        n = 0
+        for chunk in self.iter_json(version):
+            f.write(chunk)
+            n += len(chunk)
+        return n
+    def analyze(self, version=None, largest=10):
+        """
+        Returns the size and complexity report of the Dashboard, see report.Analyzer.analyze()
+
+        :param version: Grafana version string, defaults to the version set with set_grafana_version()
+        :param largest: Number of largest subtrees in the report
+        :return dict with sizes in bytes, counts, largest subtrees and duplicate targets
+        """
+        import report
+        return report.Analyzer(version, largest).analyze(self)
+    def read_json(self, j):
+        """
+        Configure Dashboard object according to a Grafana 2.x or 3.x dashboard JSON document.
+        The panels are created by read_panel(). The schemaVersion is not taken over since
+        get() emits the layout of the requested Grafana version.
+
+        :param j: JSON string or dictionary, either the dashboard or a document with the
+                  dashboard in 'dashboard' as returned by the Grafana API
+        :return True/False
+        """
+        j = _load(j)
+        if not isinstance(j, dict):
+            return False
+        if j.has_key("dashboard") and isinstance(j["dashboard"], dict):
+            if j.has_key("overwrite"):
+                self.set_overwrite(j["overwrite"])
+            j = j["dashboard"]
+        if not j.has_key("title"):
+            print "Not a Grafana dashboard"
+            return False
+        self.set_title(j["title"])
+        self.slug = self.title.lower().replace(" ", "-").replace("_","-")
+        if j.has_key("id"):
+            self.id = j["id"]
+        if j.has_key("version"):
+            self.set_version(j["version"])
+        if j.has_key("style"):
+            self.set_style(j["style"])
+        if j.has_key("links") and isinstance(j["links"], list):
+            self.links = list(j["links"])
+        if j.has_key("tags") and isinstance(j["tags"], list):
+            self.tags = list(j["tags"])
+        if j.has_key("hideControls"):
+            self.set_hideControls(j["hideControls"])
+        if j.has_key("editable"):
+            self.set_editable(j["editable"])
+        if j.has_key("originalTitle"):
+            self.set_originalTitle(j["originalTitle"])
+        if j.has_key("refresh"):
+            self.set_refresh(j["refresh"])
+        if j.has_key("sharedCrosshair"):
+            self.set_sharedCrosshair(j["sharedCrosshair"])
+        if j.has_key("timezone"):
+            self.set_timezone(j["timezone"])
+        if j.has_key("gnetId"):
+            self.set_gnetId(j["gnetId"])
+        if j.has_key("time") and isinstance(j["time"], dict):
+            if j["time"].has_key("from"):
+                self.set_startTime(j["time"]["from"])
+            if j["time"].has_key("to"):
+                self.set_endTime(j["time"]["to"])
+        if j.has_key("timepicker") and isinstance(j["timepicker"], dict):
+            t = Timepicker(refresh_intervals=[], time_options=[])
+            t.read_json(j["timepicker"])
+            self.timepicker = t
+        if j.has_key("annotations") and isinstance(j["annotations"], dict):
+            self.annotations = list(j["annotations"].get("list", []))
+        if j.has_key("templating") and isinstance(j["templating"], dict):
+            templates = []
+            for t in j["templating"].get("list", []):
+                o = Template("", "")
+                o.read_json(t)
+                templates.append(o)
+            self.templates = templates
+        if j.has_key("rows") and isinstance(j["rows"], list):
+            rows = []
+            for r in j["rows"]:
+                o = Row()
+                if o.read_json(r):
+                    rows.append(o)
+            self.rows = rows
+        return True
+    def get_versions(self, versions):
+        """
+        Returns the JSON documents of the Dashboard for several Grafana versions. The version
+        independent parts are serialized only once for all versions.
+
+        :param versions: List of Grafana version strings
+        :return dict version -> JSON string
+        """
+        out = {}
+        for v in versions:
+            out[v] = self.get_json(v)
+        return out
     def __str__(self):
         return str(self.get())
     def __repr__(self):
@@ -2146,61 +2923,93 @@ class Dashboard(object):
             t.set_datasource(d)
 
 
-def read_json(self, dstr="{}"):
-    dash = None
-    try:
-        dash = json.loads(dstr)
-    except ValueError as e:
-        print e
+class RawPanel(Panel):
+    """
+    Panel of a type without model class. The settings are kept as they are read, so the panel
+    is written back unchanged.
+    """
+    __slots__ = ("settings",)
+    _versioned = False
+    def __init__(self, settings=None, span=12, editable=True, title=""):
+        Panel.__init__(self, span=span, editable=editable, title=title)
+        if settings == None:
+            settings = {}
+        self.settings = dict(settings)
+    @_cached
+    def get(self, version):
+        d = dict(self.settings)
+        d.update({"id" : self.id, "span" : self.span, "title" : self.title,
+                  "editable" : self.editable})
+        return d
+    def read_json(self, j):
+        j = _load(j)
+        if not isinstance(j, dict):
+            return False
+        Panel.read_json(self, j)
+        self.settings = dict(j)
+        return True
+
+
+# Panel classes by type used by read_panel(), extended with register_panel_type()
+panel_types = {"graph" : GraphPanel, "singlestat" : SingleStat, "text" : TextPanel,
+               "grafana-piechart-panel" : PiePanel}
+
+def register_panel_type(typ, cls):
+    """
+    Register the class used by read_panel() for panels of a type
+
+    :param typ: Panel type like 'graph'
+    :param cls: Subclass of Panel that can be constructed without arguments and has a read_json() function
+    :return True/False
+    """
+    if isinstance(typ, str) and isinstance(cls, type) and issubclass(cls, Panel):
+        panel_types[typ] = cls
+        return True
+    return False
+
+def read_panel(j):
+    """
+    Returns a panel object for the JSON document of a panel. The class is looked up by the
+    panel's type in panel_types, panels of unknown types are kept as RawPanel.
+
+    :param j: JSON string or dictionary
+    :return Panel object or None
+    """
+    j = _load(j)
+    if not isinstance(j, dict):
         return None
-    if isinstance(dash, dict):
-        if dash.has_key("dashboard"):
-            out = read_json(str(dash["dashboard"]))
-            if isinstance(out, Dashboard):
-                out.set_overwrite(dash["overwrite"])
-            return out
-        elif dash.has_key("title"):
-            out = Dashboard(dash["title"])
-            if dash.has_key("version"):
-                out.set_version(dash["version"])
-            if dash.has_key("links"):
-                out.set_style(dash["links"])
-            if dash.has_key("tags"):
-                out.set_version(dash["tags"])
-            if dash.has_key("hideControls"):
-                out.set_hideControls(dash["hideControls"])
-            if dash.has_key("editable"):
-                out.set_editable(dash["editable"])
-            if dash.has_key("originalTitle"):
-                out.set_originalTitle(dash["originalTitle"])
-            if dash.has_key("refresh"):
-                out.set_refresh(dash["refresh"])
-            if dash.has_key("sharedCrosshair"):
-                out.set_sharedCrosshair(dash["sharedCrosshair"])
-            if dash.has_key("timezone"):
-                out.set_timezone(dash["timezone"])
-            if dash.has_key("time"):
-                if dash["time"].has_key("from"):
-                    out.set_startTime(dash["time"]["from"])
-                if dash["time"].has_key("to"):
-                    out.set_endTime(dash["time"]["to"])
-            if dash.has_key("timepicker"):
-                t = Timepicker(refresh_intervals=[], time_options=[])
-                if dash["timepicker"].has_key("refresh_intervals"):
-                    t.set_refresh_intervals(dash["timepicker"]["refresh_intervals"])
-                if dash["timepicker"].has_key("time_options"):
-                    t.set_time_options(dash["timepicker"]["time_options"])
-                out.set_timepicker(t)
-            if dash.has_key("rows"):
-                for row in data["rows"]:
-                    r = Row()
-                    r.read_json(row)
-            return dash
-        else:
-            print "Not a Grafana dashboard"
+    cls = panel_types.get(j.get("type"), RawPanel)
+    p = cls()
+    if p.read_json(j) == False:
+        return None
+    return p
+
+def read_json(j):
+    """
+    Returns a Dashboard object for a Grafana 2.x or 3.x dashboard JSON document. The document
+    is read in a single pass, JSON strings are faster than dictionaries since these have to
+    be converted to str objects first.
+
+    :param j: JSON string, file-like object or dictionary, either the dashboard or a document
+              with the dashboard in 'dashboard' as returned by the Grafana API
+    :return Dashboard object or None
+    """
+    if hasattr(j, "read"):
+        j = j.read()
+    if isinstance(j, basestring):
+        try:
+            j = _load(j)
+        except ValueError as e:
+            print e
             return None
+    elif isinstance(j, dict):
+        j = _encode(j)
     else:
         return None
+    d = Dashboard("")
+    if not d.read_json(j):
+        return None
+    return d
 
 if __name__ == "__main__":
     t = Target("cpi")
@@ -2208,7 +3017,7 @@ if __name__ == "__main__":
     t.add_tag("host","$hostname", operator="=~")
     t.add_groupBy("tag", "host")
     t.set_refId(1)
-    g = Graph()
+    g = GraphPanel()
     g.add_target(t)
     b = SingleStat()
     b.add_target(t)
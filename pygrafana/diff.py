@@ -0,0 +1,248 @@
+#!/usr/bin/python
+
+import copy
+import json
+
+from dashboard import Dashboard
+
+
+# Lists matched by identity instead of position: member name -> fields that identify an
+# element, the first non-empty field is used. Elements with the same identity get the
+# suffixes #2, #3, ... in the order of the list, a # in the field value is written as ##,
+# so a suffix never equals the identity of another element.
+keyed_lists = {"rows" : ("title",),
+               "panels" : ("title", "type"),
+               "targets" : ("refId", "target", "measurement"),
+               "list" : ("name",),
+               "seriesOverrides" : ("alias",),
+               "links" : ("title", "url", "dashboard")}
+
+# Keys that Grafana changes on every save
+default_ignore = frozenset(["id", "version"])
+
+
+def _escape(key):
+    return key.replace("~", "~0").replace("/", "~1")
+
+def _unescape(seg):
+    return seg.replace("~1", "/").replace("~0", "~")
+
+def _str(v):
+    if isinstance(v, unicode):
+        return v.encode("utf-8")
+    return str(v)
+
+def _identities(elements, fields):
+    """
+    Returns the identity strings of the elements of a keyed list
+    """
+    keys = []
+    seen = {}
+    for e in elements:
+        key = ""
+        for f in fields:
+            v = e.get(f)
+            if v not in (None, ""):
+                key = _str(v).replace("#", "##")
+                break
+        n = seen.get(key, 0) + 1
+        seen[key] = n
+        if n > 1:
+            key = "%s#%d" % (key, n,)
+        keys.append(key)
+    return keys
+
+def _is_keyed(name, l):
+    if not keyed_lists.has_key(name):
+        return False
+    for e in l:
+        if not isinstance(e, dict):
+            return False
+    return True
+
+def _load(d, version):
+    if isinstance(d, Dashboard):
+        d = d._get_shared(version)
+    elif isinstance(d, basestring):
+        d = json.loads(d)
+    if isinstance(d, dict) and isinstance(d.get("dashboard"), dict):
+        d = d["dashboard"]
+    return d
+
+
+def _diff(a, b, path, name, ignore, ops):
+    if isinstance(a, dict) and isinstance(b, dict):
+        for k in a:
+            if k in ignore:
+                continue
+            if not b.has_key(k):
+                ops.append({"op" : "remove", "path" : "%s/%s" % (path, _escape(_str(k)),), "old" : a[k]})
+            elif a[k] != b[k]:
+                _diff(a[k], b[k], "%s/%s" % (path, _escape(_str(k)),), k, ignore, ops)
+        for k in b:
+            if k not in ignore and not a.has_key(k):
+                ops.append({"op" : "add", "path" : "%s/%s" % (path, _escape(_str(k)),), "value" : b[k]})
+    elif isinstance(a, list) and isinstance(b, list) and _is_keyed(name, a) and _is_keyed(name, b):
+        fields = keyed_lists[name]
+        akeys = _identities(a, fields)
+        bkeys = _identities(b, fields)
+        bindex = dict(zip(bkeys, range(len(b))))
+        aindex = dict(zip(akeys, range(len(a))))
+        for i, k in enumerate(akeys):
+            if not bindex.has_key(k):
+                ops.append({"op" : "remove", "path" : "%s/%s" % (path, _escape(k),), "old" : a[i]})
+        common = []
+        for i, k in enumerate(akeys):
+            if bindex.has_key(k):
+                common.append(k)
+                if a[i] != b[bindex[k]]:
+                    _diff(a[i], b[bindex[k]], "%s/%s" % (path, _escape(k),), None, ignore, ops)
+        for i, k in enumerate(bkeys):
+            if not aindex.has_key(k):
+                ops.append({"op" : "add", "path" : "%s/%s" % (path, _escape(k),), "value" : b[i], "index" : i})
+        # Added elements are inserted at their position, an order operation is only required
+        # if elements that exist in both lists changed their order
+        if common != [k for k in bkeys if aindex.has_key(k)]:
+            ops.append({"op" : "order", "path" : path, "value" : bkeys, "old" : akeys})
+    else:
+        ops.append({"op" : "replace", "path" : path, "value" : b, "old" : a})
+
+def diff(a, b, version=None, ignore=default_ignore):
+    """
+    Returns the structural differences between two dashboards. Rows, panels, targets,
+    templates, series overrides and links are matched by their identity (see keyed_lists)
+    instead of their position, so inserting a row does not change all following rows.
+    Equal subtrees are skipped after one comparison, the time grows linearly with the size
+    of the dashboards. The values in the operations are shared with the dashboards.
+
+    Operations are dictionaries with 'op', 'path' and depending on the operation 'value',
+    'old' and 'index':
+    'add' (with 'index' in keyed lists), 'remove', 'replace' and 'order' (the identities
+    of a keyed list in the new order). Paths are like JSON pointers but use identities for
+    keyed lists, e.g. '/rows/CPU/panels/load/targets/A/alias'.
+
+    :param a: Old dashboard: Dashboard object, dictionary or JSON string, with or without the API wrapper
+    :param b: New dashboard
+    :param version: Grafana version string used for Dashboard objects
+    :param ignore: Keys that are not compared anywhere in the dashboards
+    :return list of operations, empty if the dashboards are equal
+    """
+    ops = []
+    a = _load(a, version)
+    b = _load(b, version)
+    if a != b:
+        _diff(a, b, "", None, ignore, ops)
+    return ops
+
+def is_changed(a, b, version=None, ignore=default_ignore):
+    return len(diff(a, b, version, ignore)) > 0
+
+
+class _Index(object):
+    """
+    Identity -> element maps of the keyed lists touched while patching
+    """
+    def __init__(self):
+        self.maps = {}
+    def get(self, l, name):
+        m = self.maps.get(id(l))
+        if m == None:
+            m = dict(zip(_identities(l, keyed_lists[name]), l))
+            self.maps[id(l)] = (l, m)
+        else:
+            m = m[1]
+        return m
+
+def _resolve(d, segs, index):
+    """
+    Returns the container, the member name of the container and the key of the last segment
+    """
+    cur = d
+    name = None
+    for seg in segs[:-1]:
+        if isinstance(cur, list):
+            cur = index.get(cur, name)[seg]
+        else:
+            cur = cur[seg]
+        name = seg
+    return cur, name, segs[-1]
+
+def patch(d, ops, version=None):
+    """
+    Applies the operations returned by diff() to a dashboard
+
+    :param d: Dashboard dictionary (changed in place) or a Dashboard object (a copy of its dictionary is changed)
+    :param ops: List of operations from diff()
+    :param version: Grafana version string used for Dashboard objects
+    :raises ValueError: if an operation does not fit the dashboard
+    :return the patched dashboard dictionary
+    """
+    if isinstance(d, Dashboard):
+        d = d.get(version)
+    root = d
+    if isinstance(d, dict) and isinstance(d.get("dashboard"), dict):
+        root = d["dashboard"]
+    index = _Index()
+    for op in ops:
+        segs = [_unescape(s) for s in op["path"].split("/")[1:]]
+        try:
+            if len(segs) == 0:
+                if op["op"] != "replace" or not isinstance(op["value"], dict):
+                    raise ValueError("Only dashboards can replace the whole document")
+                root.clear()
+                root.update(copy.deepcopy(op["value"]))
+                continue
+            parent, name, key = _resolve(root, segs, index)
+            if op["op"] == "order":
+                l = parent[key]
+                m = index.get(l, key)
+                l[:] = [m[k] for k in op["value"]]
+            elif isinstance(parent, list):
+                m = index.get(parent, name)
+                if op["op"] == "add":
+                    value = copy.deepcopy(op["value"])
+                    parent.insert(op.get("index", len(parent)), value)
+                    m[key] = value
+                elif op["op"] == "remove":
+                    e = m.pop(key)
+                    for i in range(len(parent)):
+                        if parent[i] is e:
+                            del parent[i]
+                            break
+                else:
+                    raise ValueError("Invalid operation %s for a list element" % (op["op"],))
+            elif op["op"] in ("add", "replace"):
+                parent[key] = copy.deepcopy(op["value"])
+            elif op["op"] == "remove":
+                del parent[key]
+            else:
+                raise ValueError("Invalid operation %s" % (op["op"],))
+        except (KeyError, IndexError, TypeError) as e:
+            raise ValueError("Cannot apply %s %s: %s not found" % (op["op"], op["path"], e,))
+    return d
+
+def _short(v, width=60):
+    s = json.dumps(v, sort_keys=True)
+    if len(s) > width:
+        s = s[:width-3] + "..."
+    return s
+
+def format_diff(ops):
+    """
+    Returns a compact text with one line per operation
+
+    :param ops: List of operations from diff()
+    :return string
+    """
+    lines = []
+    for op in ops:
+        path = op["path"] or "/"
+        if op["op"] == "add":
+            lines.append("+ %s: %s" % (path, _short(op["value"]),))
+        elif op["op"] == "remove":
+            lines.append("- %s" % (path,))
+        elif op["op"] == "replace":
+            lines.append("~ %s: %s -> %s" % (path, _short(op["old"]), _short(op["value"]),))
+        elif op["op"] == "order":
+            lines.append("= %s: %s" % (path, ", ".join(op["value"]),))
+    return "\n".join(lines)
@@ -0,0 +1,196 @@
+#!/usr/bin/python
+
+import json
+
+from api import Connection
+from parallel import run_parallel
+
+
+# Port of instance specs without 'port', Grafana's default
+default_port = 3000
+
+class FleetReport(object):
+    """
+    Aggregated per-instance results of an operation executed by a Fleet
+    """
+    def __init__(self, operation, results={}):
+        """
+        Construct a new FleetReport object
+
+        :param operation: Name of the executed operation
+        :param results: Dictionary instance name -> {'status': ..., 'result': ..., 'error': ..., 'duration': ...}
+        """
+        self.operation = operation
+        self.results = dict(results)
+    def get_names(self):
+        return sorted(self.results.keys())
+    def get_result(self, name):
+        if self.results.has_key(name):
+            return self.results[name]["result"]
+        return None
+    def get_succeeded(self):
+        return [n for n in self.get_names() if self.results[n]["status"] == "ok"]
+    def get_failed(self):
+        return [n for n in self.get_names() if self.results[n]["status"] != "ok"]
+    def is_success(self):
+        return len(self.get_failed()) == 0
+    def get(self):
+        counts = {"ok" : 0, "error" : 0, "timeout" : 0}
+        for r in self.results.values():
+            counts[r["status"]] += 1
+        return {"operation" : self.operation, "instances" : len(self.results),
+                "counts" : counts, "results" : self.results}
+    def get_json(self):
+        return json.dumps(self.get(), default=str)
+    def __str__(self):
+        s = "Fleet operation %s on %d instances:\n" % (self.operation, len(self.results),)
+        for n in self.get_names():
+            r = self.results[n]
+            s += "\t%s: %s (%.2fs)" % (n, r["status"], r["duration"],)
+            if r["error"]:
+                s += " %s" % (r["error"],)
+            s += "\n"
+        return s
+    def __repr__(self):
+        return str(self.get())
+
+
+def probe_connection(con):
+    con.connected = con.test_connection()
+    if not con.connected:
+        raise ValueError("Connection test failed")
+    return con.get_grafana_version()
+
+
+class Fleet(object):
+    """
+    Holds Connection objects to many Grafana instances and runs operations on all of them concurrently
+    """
+    def __init__(self, connections={}, workers=8, deadline=30):
+        """
+        Construct a new Fleet object
+
+        :param connections: Dictionary instance name -> Connection object
+        :param workers: Maximal number of instances handled at the same time
+        :param deadline: Time limit in seconds for an operation on a single instance. Operations
+                         exceeding it are reported as 'timeout' and abandoned, not cancelled: they
+                         keep running in the background, so more than 'workers' operations can
+                         run at the same time (see run_parallel())
+        """
+        self.connections = {}
+        for name in connections.keys():
+            self.add_connection(connections[name], name=name)
+        self.workers = 8
+        self.deadline = 30
+        self.set_workers(workers)
+        self.set_deadline(deadline)
+    def set_workers(self, workers):
+        if isinstance(workers, int) and workers > 0:
+            self.workers = workers
+            return True
+        return False
+    def set_deadline(self, deadline):
+        if deadline == None or (isinstance(deadline, (int, float)) and deadline > 0):
+            self.deadline = deadline
+            return True
+        return False
+    def add_connection(self, con, name=None):
+        """
+        Add a Connection to the fleet.
+
+        :param con: Connection object
+        :param name: Instance name, defaults to '<hostname>:<port>'
+        :return True/False
+        """
+        if not isinstance(con, Connection):
+            return False
+        if not name:
+            name = "%s:%d" % (con.hostname, con.port,)
+        self.connections[name] = con
+        return True
+    def add_instances(self, instances):
+        """
+        Create Connection objects concurrently and add them to the fleet. Instances that
+        cannot be reached are reported as 'error' and not added.
+
+        :param instances: List of dictionaries with the Connection arguments and an optional 'name', 'port' defaults to default_port
+        :return FleetReport with the Grafana version of every instance
+        """
+        def connect(spec):
+            kwargs = dict(spec)
+            name = kwargs.pop("name")
+            con = Connection(**kwargs)
+            if not con.is_connected():
+                raise ValueError("Cannot establish connection")
+            self.add_connection(con, name=name)
+            return con.get_grafana_version()
+        specs = []
+        names = []
+        for spec in instances:
+            spec = dict(spec)
+            spec.setdefault("port", default_port)
+            if not spec.get("name"):
+                spec["name"] = "%s:%d" % (spec["hostname"], spec["port"],)
+            specs.append(spec)
+            names.append(spec["name"])
+        res = run_parallel(connect, specs, workers=self.workers, timeout=self.deadline)
+        return FleetReport("connect", zip(names, res))
+    def del_connection(self, name):
+        if self.connections.has_key(name):
+            del self.connections[name]
+            return True
+        return False
+    def get_connection(self, name):
+        if self.connections.has_key(name):
+            return self.connections[name]
+        return None
+    def get_names(self):
+        return sorted(self.connections.keys())
+    def run_on(self, names, operation, *args, **kwargs):
+        """
+        Run an operation on a subset of the fleet.
+
+        :param names: List of instance names
+        :param operation: Name of a Connection method like 'add_dashboard' or a callable with the Connection as first argument
+        :param args: Positional arguments for the operation
+        :param kwargs: Keyword arguments for the operation
+        :return FleetReport
+        """
+        if isinstance(operation, str):
+            opname = operation
+            if not hasattr(Connection, operation):
+                print "Unknown Connection method %s" % (operation,)
+                return FleetReport(opname)
+            call = lambda con: getattr(con, opname)(*args, **kwargs)
+        else:
+            opname = getattr(operation, "__name__", str(operation))
+            call = lambda con: operation(con, *args, **kwargs)
+        names = [n for n in names if self.connections.has_key(n)]
+        cons = [self.connections[n] for n in names]
+        res = run_parallel(call, cons, workers=self.workers, timeout=self.deadline)
+        return FleetReport(opname, zip(names, res))
+    def run(self, operation, *args, **kwargs):
+        """
+        Run an operation on all instances of the fleet.
+
+        Example: fleet.run("add_dashboard", dashboard) or fleet.run("get_ds")
+
+        :param operation: Name of a Connection method or a callable with the Connection as first argument
+        :return FleetReport
+        """
+        return self.run_on(self.get_names(), operation, *args, **kwargs)
+    def probe(self):
+        """
+        Health check of all instances based on Connection.test_connection().
+        Updates the connection state of every Connection.
+
+        :return FleetReport with the Grafana version of every reachable instance
+        """
+        return self.run_on(self.get_names(), probe_connection)
+    def __str__(self):
+        s = "Grafana fleet with %d instances:\n" % (len(self.connections),)
+        for n in self.get_names():
+            s += "\t%s: %s\n" % (n, self.connections[n].url,)
+        return s
+    def __repr__(self):
+        return str(self)
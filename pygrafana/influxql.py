@@ -0,0 +1,201 @@
+#!/usr/bin/python
+
+import re
+
+
+# Maximal number of compiled targets kept by compile_target(), 0 disables the cache
+cache_size = 10000
+_cache = {}
+
+def set_cache_size(size):
+    global cache_size
+    if isinstance(size, int) and size >= 0:
+        cache_size = size
+        _cache.clear()
+        return True
+    return False
+
+def clear_cache():
+    _cache.clear()
+
+
+def quote_ident(name):
+    """
+    Returns an InfluxQL identifier in double quotes
+
+    :param name: Name of a measurement, field, tag key or retention policy
+    :return quoted identifier
+    """
+    return '"%s"' % (str(name).replace("\\", "\\\\").replace('"', '\\"'),)
+
+def quote_string(value):
+    """
+    Returns an InfluxQL string literal in single quotes
+
+    :param value: String value
+    :return quoted string
+    """
+    return "'%s'" % (str(value).replace("\\", "\\\\").replace("'", "\\'"),)
+
+def quote_regex(value):
+    """
+    Returns an InfluxQL regular expression. Values already enclosed in slashes are used as
+    they are, otherwise the slashes are added and slashes inside the value are escaped.
+
+    :param value: Regular expression
+    :return regular expression in slashes
+    """
+    value = str(value)
+    if len(value) > 1 and value[0] == "/" and value[-1] == "/":
+        return value
+    return "/%s/" % (re.sub(r"(?<!\\)/", r"\/", value),)
+
+
+def get_select_parts(select):
+    """
+    Returns the select parts as list of lists with one list per selected field. Every list
+    starts with a field (default 'value') and contains at least one function (default 'mean').
+
+    :param select: List of parts {'type': ..., 'params': [...]} for one field or list of such lists
+    :return list of lists of parts
+    """
+    if len(select) > 0 and isinstance(select[0], dict):
+        select = [select]
+    out = []
+    for parts in select:
+        fields = [p for p in parts if p["type"] == "field"]
+        funcs = [p for p in parts if p["type"] != "field"]
+        if len(fields) == 0:
+            fields = [{"params" : ["value"], "type" : "field"}]
+        if len(funcs) == 0:
+            funcs = [{"params" : [], "type" : "mean"}]
+        out.append(fields[:1] + funcs)
+    if len(out) == 0:
+        out.append([{"params" : ["value"], "type" : "field"}, {"params" : [], "type" : "mean"}])
+    return out
+
+def get_group_by(groupBy):
+    """
+    Returns the groupBy options with time first, fill last and the tags in between. Missing
+    time and fill options are added with $interval and null.
+
+    :param groupBy: List of options {'type': 'time'/'tag'/'fill', 'params': [...]}
+    :return list of options
+    """
+    time = None
+    fill = None
+    tags = []
+    for g in groupBy:
+        if g["type"] == "time":
+            time = g
+        elif g["type"] == "fill":
+            fill = g
+        else:
+            tags.append(g)
+    if not time:
+        time = {'type': 'time', 'params': ['$interval']}
+    if not fill:
+        fill = {'type': 'fill', 'params': ['null']}
+    return [time] + tags + [fill]
+
+def build_select(parts):
+    """
+    Returns the select clause for the output of get_select_parts()
+    """
+    columns = []
+    for series in parts:
+        expr = ""
+        alias = ""
+        for p in series:
+            params = [str(x) for x in p.get("params", [])]
+            if p["type"] == "field":
+                expr = quote_ident(params[0])
+            elif p["type"] == "math":
+                expr += " " + " ".join(params).strip()
+            elif p["type"] == "alias":
+                alias = " AS " + quote_ident(params[0])
+            else:
+                expr = "%s(%s)" % (p["type"], ", ".join([expr] + params),)
+        columns.append(expr + alias)
+    return ", ".join(columns)
+
+def build_where(tags):
+    """
+    Returns the conditions for a list of tags {'key': ..., 'value': ..., 'operator': ..., 'condition': ...}
+    """
+    conds = []
+    for i, t in enumerate(tags):
+        op = t.get("operator", "=")
+        val = t["value"]
+        if op in ("=~", "!~"):
+            val = quote_regex(val)
+        elif op not in ("<", ">"):
+            val = quote_string(val)
+        cond = "%s %s %s" % (quote_ident(t["key"]), op, val,)
+        if i > 0:
+            cond = "%s %s" % (t.get("condition", "AND"), cond,)
+        conds.append(cond)
+    return " ".join(conds)
+
+def build_group_by(groupBy):
+    """
+    Returns the GROUP BY clause for the output of get_group_by()
+    """
+    groups = []
+    fill = ""
+    for g in groupBy:
+        param = str(g["params"][0])
+        if g["type"] == "time":
+            groups.append("time(%s)" % (param,))
+        elif g["type"] == "fill":
+            fill = " fill(%s)" % (param,)
+        else:
+            groups.append(quote_ident(param))
+    return ", ".join(groups) + fill
+
+def build_query(measurement, select=[], tags=[], groupBy=[], policy="default"):
+    """
+    Returns the InfluxQL query Grafana generates for a target
+
+    :param measurement: Name of the measurement
+    :param select: Select parts as accepted by get_select_parts()
+    :param tags: List of tags {'key': ..., 'value': ..., 'operator': ..., 'condition': ...}
+    :param groupBy: groupBy options as accepted by get_group_by()
+    :param policy: Retention policy
+    :return query string
+    """
+    source = quote_ident(measurement)
+    if policy and policy != "default":
+        source = quote_ident(policy) + "." + source
+    where = build_where(tags)
+    if where:
+        where += " AND "
+    return "SELECT %s FROM %s WHERE %s$timeFilter GROUP BY %s" % \
+           (build_select(get_select_parts(select)), source, where,
+            build_group_by(get_group_by(groupBy)),)
+
+
+def compile_target(measurement, select, tags, groupBy, policy, version):
+    """
+    Returns the derived settings of a target: the completed select parts and groupBy options
+    and for Grafana 2.x the query. Results are cached by the content of the target, so they
+    are shared and must not be modified.
+
+    :param version: Grafana version string
+    :return dict with 'select', 'groupBy' and 'query' (None for Grafana 3.x)
+    """
+    key = None
+    if cache_size > 0:
+        # repr() is much faster than converting the lists and dictionaries into tuples. Equal
+        # content with a different dictionary order only causes an additional cache entry.
+        key = repr((version[:1], measurement, policy, select, tags, groupBy))
+        if _cache.has_key(key):
+            return _cache[key]
+    c = {"select" : get_select_parts(select), "groupBy" : get_group_by(groupBy), "query" : None}
+    if version.startswith("2"):
+        c["query"] = build_query(measurement, c["select"], tags, c["groupBy"], policy)
+    if key:
+        if len(_cache) >= cache_size:
+            _cache.clear()
+        _cache[key] = c
+    return c
@@ -0,0 +1,440 @@
+#!/usr/bin/python
+
+import collections
+import json
+from json.decoder import WHITESPACE, scanstring
+
+import dashboard
+
+
+# Decoder for skipped values and decoder returning str objects for the values in use
+_skip_decoder = json.JSONDecoder()
+_decoder = json.JSONDecoder(object_pairs_hook=dashboard._encode_pairs)
+# Decoder keeping the order of the members for objects that are patched
+_ordered_decoder = json.JSONDecoder(object_pairs_hook=collections.OrderedDict)
+
+def _skip(s, idx):
+    return WHITESPACE.match(s, idx).end()
+
+def _scan_object(s, idx, nested={}):
+    """
+    Returns the members of the JSON object starting at s[idx] as list of
+    [key, start of member, start of value, end of value, nested members] and the index after
+    the object. Members in nested are scanned as well: 'array' for the element positions of
+    an array, a dictionary for the members of an object with its own nested members.
+    Everything else is skipped by the JSON decoder.
+    """
+    idx = _skip(s, idx)
+    if s[idx:idx+1] != "{":
+        raise ValueError("Expecting object at char %d" % (idx,))
+    idx = _skip(s, idx+1)
+    members = []
+    if s[idx:idx+1] == "}":
+        return members, idx+1
+    while True:
+        if s[idx:idx+1] != '"':
+            raise ValueError("Expecting property name at char %d" % (idx,))
+        start = idx
+        key, idx = scanstring(s, idx+1)
+        idx = _skip(s, idx)
+        if s[idx:idx+1] != ":":
+            raise ValueError("Expecting : delimiter at char %d" % (idx,))
+        idx = _skip(s, idx+1)
+        key = key.encode("utf-8")
+        spec = nested.get(key)
+        sub = None
+        if spec == "array" and s[idx:idx+1] == "[":
+            sub, end = _scan_array(s, idx)
+        elif isinstance(spec, dict) and s[idx:idx+1] == "{":
+            sub, end = _scan_object(s, idx, spec)
+        else:
+            value, end = _skip_decoder.raw_decode(s, idx)
+        members.append([key, start, idx, end, sub])
+        idx = _skip(s, end)
+        if s[idx:idx+1] == "}":
+            return members, idx+1
+        if s[idx:idx+1] != ",":
+            raise ValueError("Expecting , delimiter at char %d" % (idx,))
+        idx = _skip(s, idx+1)
+
+def _scan_array(s, idx):
+    """
+    Returns the elements of the JSON array starting at s[idx] as list of (start, end) and
+    the index after the array
+    """
+    idx = _skip(s, idx)
+    if s[idx:idx+1] != "[":
+        raise ValueError("Expecting array at char %d" % (idx,))
+    idx = _skip(s, idx+1)
+    elements = []
+    if s[idx:idx+1] == "]":
+        return elements, idx+1
+    while True:
+        value, end = _skip_decoder.raw_decode(s, idx)
+        elements.append((idx, end))
+        idx = _skip(s, end)
+        if s[idx:idx+1] == "]":
+            return elements, idx+1
+        if s[idx:idx+1] != ",":
+            raise ValueError("Expecting , delimiter at char %d" % (idx,))
+        idx = _skip(s, idx+1)
+
+def _patch(raw, base, cur):
+    """
+    Returns the decoded JSON raw with the changes of a model object applied. base is the
+    serialization of the object as it was read, cur the serialization after the changes.
+    Only members that differ between base and cur are replaced, members unknown to the model
+    and the values the model would rewrite are kept as they are. Lists are patched element
+    by element, elements added at the end are appended and removed ones at the end dropped.
+    """
+    if base == cur:
+        return raw
+    if isinstance(raw, dict) and isinstance(base, dict) and isinstance(cur, dict):
+        out = collections.OrderedDict(raw)
+        for k, v in cur.iteritems():
+            if raw.has_key(k) and base.has_key(k):
+                out[k] = _patch(raw[k], base[k], v)
+            elif v != base.get(k):
+                out[k] = v
+        for k in base.keys():
+            if not cur.has_key(k) and out.has_key(k):
+                del out[k]
+        return out
+    if isinstance(raw, list) and isinstance(base, list) and isinstance(cur, list) and len(raw) == len(base):
+        n = min(len(base), len(cur))
+        return [_patch(raw[i], base[i], cur[i]) for i in range(n)] + cur[n:]
+    return cur
+
+def _decode(s, start, end):
+    v = _decoder.decode(s[start:end])
+    if isinstance(v, unicode):
+        v = v.encode("utf-8")
+    elif isinstance(v, list):
+        v = dashboard._encode_list(v)
+    return v
+
+
+class LazyObject(object):
+    """
+    JSON object in a dashboard document that keeps the text of its members and decodes them
+    only when they are accessed. get_json() writes unchanged members back verbatim.
+
+    Values returned by get_field() are decoded copies, changes have to be stored with
+    set_field().
+    """
+    # Members holding lists of lazy objects, name -> class
+    children = {}
+    def __init__(self, s, start=0, end=None, members=None):
+        """
+        Construct a new LazyObject object
+
+        :param s: JSON string containing the object
+        :param start: Index of the object in s
+        :param end: Index after the object in s
+        :param members: Result of _scan_object() if the object is already scanned
+        """
+        self.text = s
+        self.start = start
+        self.end = end
+        self.members = members
+        self.values = {}
+        self.changed = set()
+        self.lists = {}
+    def _scan(self):
+        if self.members == None:
+            self.members, end = _scan_object(self.text, self.start, self._get_nested())
+            if self.end == None:
+                self.end = end
+        return self.members
+    def _get_nested(self):
+        nested = {}
+        for key in self.children.keys():
+            nested[key] = "array"
+        return nested
+    def _find(self, key):
+        for m in self._scan():
+            if m[0] == key:
+                return m
+        return None
+    def get_keys(self):
+        return [m[0] for m in self._scan()]
+    def has_key(self, key):
+        return self._find(key) != None
+    def get_field(self, key, default=None):
+        """
+        Returns the decoded value of a member
+
+        :param key: Name of the member
+        :param default: Returned if the member does not exist
+        :return value
+        """
+        if self.values.has_key(key):
+            return self.values[key]
+        m = self._find(key)
+        if not m:
+            return default
+        v = _decode(self.text, m[2], m[3])
+        self.values[key] = v
+        return v
+    def set_field(self, key, value):
+        """
+        Set the value of a member, new members are appended
+
+        :param key: Name of the member
+        :param value: JSON serializable value
+        """
+        if not self._find(key):
+            self.members.append([key, None, None, None, None])
+        self.values[key] = value
+        self.changed.add(key)
+        if self.lists.has_key(key):
+            del self.lists[key]
+    def del_field(self, key):
+        m = self._find(key)
+        if not m:
+            return False
+        self.members.remove(m)
+        self.changed.discard(key)
+        if self.values.has_key(key):
+            del self.values[key]
+        if self.lists.has_key(key):
+            del self.lists[key]
+        return True
+    def _get_list(self, key):
+        """
+        Returns the lazy objects for the elements of a member listed in children
+        """
+        if not self.lists.has_key(key):
+            m = self._find(key)
+            out = []
+            if m and m[4] != None and key not in self.changed:
+                cls = self.children[key]
+                for start, end in m[4]:
+                    out.append(cls(self.text, start, end))
+            self.lists[key] = out
+        return self.lists[key]
+    def is_changed(self):
+        """
+        Returns whether get_json() has to encode anything instead of copying the text
+        """
+        if self.members == None:
+            return False
+        if self.changed:
+            return True
+        for key in self.lists.keys():
+            for o in self.lists[key]:
+                if o.is_changed():
+                    return True
+        return False
+    def _get_member(self, key, version):
+        """
+        Returns the JSON of a member for subclasses that keep members as model objects or None
+        """
+        return None
+    def get_json(self, version=None):
+        """
+        Returns the JSON string of the object. Unchanged members are copied from the text
+
+        :param version: Grafana version string for materialized model objects
+        :return JSON string
+        """
+        if not self.is_changed():
+            return self.text[self.start:self.end]
+        parts = []
+        for key, start, vstart, end, sub in self.members:
+            value = self._get_member(key, version)
+            if value != None:
+                parts.append("%s: %s" % (json.dumps(key), value,))
+            elif key in self.changed:
+                parts.append("%s: %s" % (json.dumps(key), json.dumps(self.values[key]),))
+            elif self.lists.has_key(key):
+                parts.append("%s: [%s]" % (json.dumps(key), ", ".join([o.get_json(version) for o in self.lists[key]]),))
+            else:
+                parts.append(self.text[start:end])
+        return "{%s}" % (", ".join(parts),)
+    def get(self, version=None):
+        return _decoder.decode(self.get_json(version))
+    def __str__(self):
+        return self.get_json()
+    def __repr__(self):
+        return "%s(%d members, changed=%s)" % (self.__class__.__name__, len(self._scan()), str(self.is_changed()),)
+
+
+class LazyPanel(LazyObject):
+    """
+    Panel in a dashboard document. get_panel() creates the model object for the panel with
+    dashboard.read_panel(). get_json() compares the model object with a panel read again
+    from the text and patches only the changed members into the panel's JSON, so members
+    unknown to the model like thresholds are kept.
+    """
+    def __init__(self, s, start=0, end=None):
+        LazyObject.__init__(self, s, start, end)
+        self.panel = None
+    def get_panel(self):
+        """
+        Returns the panel model object like GraphPanel, created on the first call
+
+        :return Panel object
+        """
+        if self.panel == None:
+            self.panel = dashboard.read_panel(self.text[self.start:self.end])
+        return self.panel
+    def get_targets(self):
+        """
+        Returns the Target objects of the panel, this creates the panel model object
+
+        :return list of Target objects
+        """
+        p = self.get_panel()
+        if hasattr(p, "targets"):
+            return p.targets
+        return []
+    def is_changed(self):
+        return self.panel != None or LazyObject.is_changed(self)
+    def get_json(self, version=None):
+        if self.panel != None:
+            text = self.text[self.start:self.end]
+            base = dashboard.read_panel(text).get(version)
+            cur = self.panel.get(version)
+            if base != cur:
+                return json.dumps(_patch(_ordered_decoder.decode(text), base, cur))
+            if not LazyObject.is_changed(self):
+                return text
+        return LazyObject.get_json(self, version)
+
+class LazyRow(LazyObject):
+    """
+    Row in a dashboard document with lazily created panels
+    """
+    children = {"panels" : LazyPanel}
+    def get_panels(self):
+        """
+        Returns the LazyPanel objects of the row
+
+        :return list of LazyPanel objects
+        """
+        return self._get_list("panels")
+
+class LazyDashboard(LazyObject):
+    """
+    View of a dashboard JSON document that decodes only what is accessed. The top-level
+    settings are available with get_field()/set_field(), the rows and panels are created
+    when they are first touched and everything untouched is written back verbatim. Changes
+    of panel and template objects are patched into their JSON, see LazyPanel. The
+    document may be the dashboard itself or the Grafana API document with the dashboard in
+    'dashboard', get_json() returns the same layout.
+    """
+    children = {"rows" : LazyRow}
+    def __init__(self, j):
+        """
+        Construct a new LazyDashboard object
+
+        :param j: JSON string, file-like object or dictionary (dictionaries are encoded first)
+        """
+        if hasattr(j, "read"):
+            j = j.read()
+        elif isinstance(j, dict):
+            j = json.dumps(j)
+        self.wrapper = None
+        nested = self._get_nested()
+        members, end = _scan_object(j, 0, dict(nested, dashboard=nested))
+        outer = LazyObject(j, 0, end, members)
+        m = outer._find("dashboard")
+        if m and m[4] != None and not outer.has_key("rows"):
+            self.wrapper = outer
+            LazyObject.__init__(self, j, m[2], m[3], m[4])
+        else:
+            LazyObject.__init__(self, j, 0, end, members)
+        self.templates = None
+    def get_rows(self):
+        """
+        Returns the LazyRow objects of the dashboard
+
+        :return list of LazyRow objects
+        """
+        return self._get_list("rows")
+    def get_templates(self):
+        """
+        Returns Template objects for the templating list, created on the first call. Templates
+        appended to the list are added to the document.
+
+        :return list of Template objects
+        """
+        if self.templates == None:
+            if not self.has_key("templating"):
+                self.set_field("templating", {"list" : []})
+            self.templates = []
+            for t in self._get_raw_templates():
+                self.templates.append(self._read_template(t))
+        return self.templates
+    def _get_raw_templates(self):
+        m = self._find("templating")
+        if m and m[2] != None and "templating" not in self.changed:
+            templating = _ordered_decoder.decode(self.text[m[2]:m[3]])
+        else:
+            templating = self.get_field("templating")
+        if not isinstance(templating, dict) or not isinstance(templating.get("list"), list):
+            return []
+        return templating["list"]
+    def _read_template(self, t):
+        o = dashboard.Template("", "")
+        o.read_json(t)
+        return o
+    def get_version(self):
+        """
+        Returns the major Grafana version of the document by its schemaVersion or None if
+        the document has none
+        """
+        v = self.get_field("schemaVersion")
+        if not isinstance(v, int) or isinstance(v, bool):
+            return None
+        if v >= dashboard.Dashboard.schemaVersions["3"]:
+            return "3"
+        return "2"
+    def get_dashboard(self):
+        """
+        Returns a Dashboard object with the whole document, see dashboard.read_json()
+
+        :return Dashboard object or None
+        """
+        return dashboard.read_json(self.text)
+    def is_changed(self):
+        return self.templates != None or LazyObject.is_changed(self)
+    def _get_member(self, key, version):
+        if key == "templating" and self.templates != None:
+            m = self._find(key)
+            if m and m[2] != None and key not in self.changed:
+                templating = _ordered_decoder.decode(self.text[m[2]:m[3]])
+            else:
+                templating = collections.OrderedDict(self.get_field(key))
+            raw = self._get_raw_templates()
+            out = []
+            for i, t in enumerate(self.templates):
+                cur = t.get(version)
+                if i < len(raw):
+                    cur = _patch(raw[i], self._read_template(raw[i]).get(version), cur)
+                out.append(cur)
+            templating["list"] = out
+            return json.dumps(templating)
+        return None
+    def get_json(self, version=None):
+        """
+        Returns the JSON document in the layout it was read
+
+        :param version: Grafana version string for the changed members of materialized model objects, defaults to the version of the document, see get_version()
+        :return JSON string
+        """
+        if version == None:
+            version = self.get_version()
+        if self.wrapper == None:
+            return LazyObject.get_json(self, version)
+        if not self.is_changed():
+            return self.text
+        out = LazyObject.get_json(self, version)
+        parts = []
+        for key, start, vstart, end, sub in self.wrapper.members:
+            if key == "dashboard":
+                parts.append("%s: %s" % (json.dumps(key), out,))
+            else:
+                parts.append(self.wrapper.text[start:end])
+        return "{%s}" % (", ".join(parts),)
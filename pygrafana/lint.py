@@ -0,0 +1,234 @@
+#!/usr/bin/python
+
+import copy
+import re
+
+import dashboard
+from dashboard import Dashboard
+
+
+# Cost of a target relative to a grouped query with exact tag matches
+raw_factor = 10
+regex_cost = 2
+
+_group_by_time_pattern = re.compile(r"GROUP\s+BY\s+(.*,\s*)?time\(", re.IGNORECASE)
+_interval_pattern = re.compile(r"(\d+)([smhdw])$")
+_unit_seconds = {"s" : 1, "m" : 60, "h" : 3600, "d" : 86400, "w" : 604800}
+# Regular expressions matching exactly one literal string or one template variable
+_literal_regex_pattern = re.compile(r"/\^([^.^$*+?()\[\]{}|\\/]*)\$/$")
+_variable_regex_pattern = re.compile(r"/\^?(\$\w+|\[\[\w+\]\])\$?/$")
+
+
+def _str(v):
+    if isinstance(v, unicode):
+        return v.encode("utf-8")
+    return str(v)
+
+def get_seconds(interval):
+    """
+    Returns the seconds of an interval like '10s' or '5m' or None
+    """
+    m = _interval_pattern.match(_str(interval))
+    if not m:
+        return None
+    return int(m.group(1)) * _unit_seconds[m.group(2)]
+
+def _is_influx(t):
+    return t.get("dsType", "influxdb") == "influxdb" and not t.has_key("target")
+
+def _groups_by_time(t):
+    if t.get("rawQuery"):
+        return _group_by_time_pattern.search(t.get("query", "")) != None
+    for g in t.get("groupBy", []):
+        if isinstance(g, dict) and g.get("type") == "time":
+            return True
+    return False
+
+def _has_fill(t):
+    if t.get("rawQuery"):
+        return "fill(" in t.get("query", "").lower()
+    for g in t.get("groupBy", []):
+        if isinstance(g, dict) and g.get("type") == "fill":
+            return True
+    return False
+
+def _is_anchored(value):
+    return len(value) > 2 and value[0] == "/" and value[1] == "^"
+
+
+class Linter(object):
+    """
+    Estimates the datasource cost of dashboards and reports expensive query patterns with
+    their paths. The cost of an InfluxDB target is 1, targets returning raw points (no time
+    grouping) cost raw_factor times as much and every unanchored regular expression adds
+    regex_cost. The cost of a panel is the sum of its targets, the cost of a dashboard the
+    sum of the panels and the template queries.
+
+    Reported codes:
+    'raw-points' target without GROUP BY time(), returns every point in the time range
+    'no-fill' target without fill option, relies on the implicit InfluxDB default fill(null)
+    'unanchored-regex' tag regex without ^, InfluxDB has to test every series
+    'exact-regex' tag regex matching one literal value, '=' uses the index
+    'singlestat-raw' singlestat panel showing a single value of raw points
+    'fast-refresh' heavy dashboard refreshed faster than min_refresh
+    """
+    def __init__(self, version=None, min_refresh="1m", heavy_cost=50, anchor_variables=False):
+        """
+        Construct a new Linter object
+
+        :param version: Grafana version string used for model objects, defaults to the version set with set_grafana_version()
+        :param min_refresh: Minimal refresh interval of heavy dashboards
+        :param heavy_cost: Cost from which a dashboard counts as heavy
+        :param anchor_variables: Let fix() anchor regular expressions of a single template variable, see fix()
+        """
+        self.version = version
+        self.min_refresh = min_refresh
+        self.heavy_cost = heavy_cost
+        self.anchor_variables = anchor_variables
+    def _load(self, d):
+        if isinstance(d, (dashboard._Cacheable, dashboard._CowRef)):
+            if isinstance(d, Dashboard):
+                return d._get_shared(self.version)["dashboard"]
+            return d._get_shared(self.version)
+        d = dashboard._load(d)
+        if isinstance(d, dict) and isinstance(d.get("dashboard"), dict):
+            d = d["dashboard"]
+        return d
+    def lint(self, d):
+        """
+        Analyze a dashboard, row, panel or target
+
+        :param d: Model object like Dashboard, Row or Target, dictionary or JSON string
+        :return dict with the total 'cost', the 'panels' as path -> cost, 'cost_per_minute' for dashboards with refresh and the 'issues' as list of (path, code, message)
+        """
+        d = self._load(d)
+        res = {"cost" : 0, "panels" : {}, "issues" : [], "cost_per_minute" : None}
+        if d.has_key("rows"):
+            self.check_dashboard(d, res)
+        elif d.has_key("panels"):
+            self.check_row(d, "", res)
+        elif d.has_key("type"):
+            self.check_panel(d, "", res)
+        else:
+            res["cost"] = self.check_target(d, "", None, res["issues"])
+        return res
+    def check_dashboard(self, d, res):
+        for i, t in enumerate(d.get("templating", {}).get("list", [])):
+            if t.get("type", "query") == "query" and t.get("refresh"):
+                res["cost"] += 1
+        for i, r in enumerate(d.get("rows", [])):
+            self.check_row(r, "rows[%d]" % (i,), res)
+        refresh = get_seconds(d.get("refresh") or "")
+        if refresh:
+            res["cost_per_minute"] = res["cost"] * 60.0 / refresh
+            if refresh < get_seconds(self.min_refresh) and res["cost"] >= self.heavy_cost:
+                res["issues"].append(("refresh", "fast-refresh",
+                                      "Refresh every %s with cost %d, use at least %s" % (d["refresh"], res["cost"], self.min_refresh,)))
+    def check_row(self, r, path, res):
+        prefix = ""
+        if path:
+            prefix = path + "."
+        for i, p in enumerate(r.get("panels", [])):
+            self.check_panel(p, "%spanels[%d]" % (prefix, i,), res)
+    def check_panel(self, p, path, res):
+        cost = 0
+        prefix = ""
+        if path:
+            prefix = path + "."
+        for i, t in enumerate(p.get("targets", [])):
+            cost += self.check_target(t, "%stargets[%d]" % (prefix, i,), p, res["issues"])
+        res["panels"][path] = cost
+        res["cost"] += cost
+    def check_target(self, t, path, panel, issues):
+        """
+        Appends the issues of a target and returns its cost
+        """
+        if t.get("hide"):
+            return 0
+        if not _is_influx(t):
+            return 1
+        prefix = ""
+        if path:
+            prefix = path + "."
+        cost = 1
+        if not _groups_by_time(t):
+            cost = raw_factor
+            issues.append((path, "raw-points", "No GROUP BY time(), every point in the time range is returned"))
+            if panel != None and panel.get("type") == "singlestat":
+                issues.append((path, "singlestat-raw", "Singlestat reduces raw points to %s, group by time($interval)" % (panel.get("valueName", "avg"),)))
+        elif not _has_fill(t):
+            issues.append((path, "no-fill", "No fill option in GROUP BY"))
+        for i, tag in enumerate(t.get("tags", [])):
+            if tag.get("operator") not in ("=~", "!~"):
+                continue
+            tpath = "%stags[%d]" % (prefix, i,)
+            value = _str(tag.get("value", ""))
+            if _literal_regex_pattern.match(value):
+                issues.append((tpath, "exact-regex", "Regex %s matches one value, use '=' or '!='" % (value,)))
+            elif not _is_anchored(value):
+                cost += regex_cost
+                issues.append((tpath, "unanchored-regex", "Regex %s is not anchored with ^" % (value,)))
+        return cost
+    def fix(self, d):
+        """
+        Returns a copy of the dashboard with cheaper equivalents: exact regular expressions
+        become '='/'!=' comparisons and heavy dashboards get min_refresh. Missing fill options
+        are written as fill(null), the InfluxDB default, this does not change the cost but
+        makes the gap handling visible in the query editor. Other issues are only reported.
+
+        Only with anchor_variables regular expressions of a single template variable get
+        anchored like the Grafana query editor writes them (/$host/ becomes /^$host$/). This
+        is not equivalent: the unanchored regex matches every value containing the selected
+        one, e.g. web1 also matches web10.
+
+        :param d: Model object, dictionary or JSON string
+        :return tuple with the dashboard dictionary and the list of (path, code) of the applied rewrites
+        """
+        d = copy.deepcopy(self._load(d))
+        fixed = []
+        res = self.lint(d)
+        for path, code, message in res["issues"]:
+            if code == "fast-refresh":
+                d["refresh"] = self.min_refresh
+                fixed.append((path, code))
+                continue
+            o = _resolve(d, path)
+            if code == "exact-regex":
+                o["value"] = _literal_regex_pattern.match(_str(o["value"])).group(1)
+                o["operator"] = {"=~" : "=", "!~" : "!="}[o["operator"]]
+            elif code == "unanchored-regex":
+                if not self.anchor_variables:
+                    continue
+                m = _variable_regex_pattern.match(_str(o["value"]))
+                if not m:
+                    continue
+                o["value"] = "/^%s$/" % (m.group(1),)
+            elif code == "no-fill":
+                o["groupBy"] = list(o.get("groupBy", [])) + [{"type" : "fill", "params" : ["null"]}]
+            else:
+                continue
+            fixed.append((path, code))
+        return d, fixed
+
+_path_pattern = re.compile(r"(\w+)(?:\[(\d+)\])?")
+
+def _resolve(d, path):
+    o = d
+    for name, index in _path_pattern.findall(path):
+        o = o[name]
+        if index:
+            o = o[int(index)]
+    return o
+
+
+def lint(d, version=None):
+    """
+    Analyze a dashboard with the default settings, see Linter.lint()
+    """
+    return Linter(version).lint(d)
+
+def fix(d, version=None, anchor_variables=False):
+    """
+    Rewrite a dashboard to a cheaper equivalent, see Linter.fix()
+    """
+    return Linter(version, anchor_variables=anchor_variables).fix(d)
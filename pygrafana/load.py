@@ -0,0 +1,258 @@
+#!/usr/bin/python
+
+import heapq
+
+import dashboard
+from dashboard import Dashboard
+from lint import get_seconds
+
+
+def _slugify(title):
+    return title.lower().replace(" ", "-").replace("_", "-")
+
+def _interval(seconds):
+    for unit, factor in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds % factor == 0:
+            return "%d%s" % (seconds / factor, unit,)
+    return "%ds" % (seconds,)
+
+def _get_interval_seconds(interval):
+    if isinstance(interval, (int, long)) and not isinstance(interval, bool):
+        return interval
+    return get_seconds(str(interval).lstrip(">"))
+
+
+class LoadModel(object):
+    """
+    Estimates the steady query load of dashboards per datasource. Every viewer of a dashboard
+    runs all visible targets once per refresh, so a dashboard causes
+    viewers * targets / refresh seconds queries per second. Dashboards without refresh and
+    the template queries, which only run when a dashboard is opened, cause no steady load.
+    """
+    def __init__(self, viewers=1, default_datasource="default", version=None):
+        """
+        Construct a new LoadModel object
+
+        :param viewers: Expected concurrent viewers per dashboard, a number or a dict slug -> number (missing slugs count as one viewer)
+        :param default_datasource: Name used for panels without datasource
+        :param version: Grafana version string used for Dashboard objects
+        """
+        self.viewers = viewers
+        self.default_datasource = default_datasource
+        self.version = version
+    def _load(self, d):
+        if isinstance(d, Dashboard):
+            return d._get_shared(self.version)["dashboard"]
+        d = dashboard._load(d)
+        if isinstance(d, dict) and isinstance(d.get("dashboard"), dict):
+            d = d["dashboard"]
+        return d
+    def get_slug(self, d):
+        if isinstance(d, Dashboard):
+            return d.get_slug()
+        return _slugify(self._load(d).get("title", ""))
+    def get_viewers(self, d):
+        if isinstance(self.viewers, dict):
+            return self.viewers.get(self.get_slug(d), 1)
+        return self.viewers
+    def get_queries(self, d):
+        """
+        Returns the queries of one refresh of a dashboard
+
+        :param d: Dashboard object, dictionary or JSON string
+        :return dict datasource -> number of queries
+        """
+        queries = {}
+        for r in self._load(d).get("rows", []):
+            for p in r.get("panels", []):
+                for t in p.get("targets", []):
+                    if t.get("hide"):
+                        continue
+                    ds = t.get("datasource") or p.get("datasource") or self.default_datasource
+                    queries[ds] = queries.get(ds, 0) + 1
+        return queries
+    def get_refresh(self, d):
+        """
+        Returns the refresh interval of a dashboard in seconds or None
+        """
+        if isinstance(d, Dashboard):
+            return get_seconds(d.refresh or "")
+        return get_seconds(self._load(d).get("refresh") or "")
+    def estimate(self, dashboards):
+        """
+        Estimate the load of a set of dashboards
+
+        :param dashboards: List of Dashboard objects, dictionaries or JSON strings
+        :return dict with 'datasources' as datasource -> queries per second, 'dashboards' as list of datasource -> queries per second in input order and the 'total' queries per second
+        """
+        res = {"datasources" : {}, "dashboards" : [], "total" : 0.0}
+        for d in dashboards:
+            load = {}
+            refresh = self.get_refresh(d)
+            if refresh:
+                viewers = self.get_viewers(d)
+                for ds, n in self.get_queries(d).iteritems():
+                    load[ds] = viewers * n / float(refresh)
+                    res["datasources"][ds] = res["datasources"].get(ds, 0.0) + load[ds]
+                    res["total"] += load[ds]
+            res["dashboards"].append(load)
+        return res
+
+
+class Governor(object):
+    """
+    Keeps the estimated load of a fleet of dashboards within a budget by slowing down their
+    refresh. As long as a datasource is over budget, the dashboard with the highest load on it
+    moves one step up the interval ladder. The result is deterministic for the same input.
+    """
+    def __init__(self, budget, model=None, intervals=["10s", "30s", "1m", "5m", "15m", "30m", "1h", "2h", "1d"],
+                       min_refresh=None, panel_interval=True):
+        """
+        Construct a new Governor object
+
+        :param budget: Queries per second for every datasource or dict datasource -> queries per second
+        :param model: LoadModel object, defaults to LoadModel() with one viewer per dashboard
+        :param intervals: Refresh intervals the dashboards can get, from fast to slow
+        :param min_refresh: Dashboards refreshing faster get this refresh even within budget
+        :param panel_interval: Set the minimal group by interval of the panels with queries to the new refresh
+        """
+        self.budget = budget
+        if model == None:
+            model = LoadModel()
+        self.model = model
+        self.intervals = sorted([get_seconds(i) for i in intervals])
+        self.min_refresh = None
+        if min_refresh:
+            self.min_refresh = get_seconds(min_refresh)
+        self.panel_interval = panel_interval
+    def _get_budget(self, ds):
+        if isinstance(self.budget, dict):
+            return self.budget.get(ds)
+        return self.budget
+    def plan(self, dashboards):
+        """
+        Computes the refresh intervals without changing the dashboards
+
+        :param dashboards: List of Dashboard objects, dictionaries or JSON strings
+        :return list with the new refresh in seconds per dashboard, None for unchanged ones
+        """
+        rates = []
+        refresh = []
+        loads = {}
+        for d in dashboards:
+            r = self.model.get_refresh(d)
+            rate = {}
+            if r:
+                viewers = self.model.get_viewers(d)
+                for ds, n in self.model.get_queries(d).iteritems():
+                    rate[ds] = float(viewers * n)
+                if self.min_refresh and r < self.min_refresh:
+                    r = self.min_refresh
+                for ds, n in rate.iteritems():
+                    loads[ds] = loads.get(ds, 0.0) + n / r
+            rates.append(rate)
+            refresh.append(r)
+        new = list(refresh)
+        for ds in sorted(loads.keys()):
+            budget = self._get_budget(ds)
+            if budget == None or loads[ds] <= budget:
+                continue
+            heap = [(-rates[i][ds] / new[i], i) for i in range(len(new)) if new[i] and rates[i].has_key(ds)]
+            heapq.heapify(heap)
+            while heap and loads[ds] > budget:
+                load, i = heapq.heappop(heap)
+                if -load != rates[i][ds] / new[i]:
+                    heapq.heappush(heap, (-rates[i][ds] / new[i], i))
+                    continue
+                slower = [s for s in self.intervals if s > new[i]]
+                if not slower:
+                    continue
+                for x, n in rates[i].iteritems():
+                    loads[x] += n / slower[0] - n / new[i]
+                new[i] = slower[0]
+                heapq.heappush(heap, (-rates[i][ds] / new[i], i))
+        out = []
+        for i in range(len(new)):
+            r = self.model.get_refresh(dashboards[i])
+            if new[i] != r:
+                out.append(new[i])
+            else:
+                out.append(None)
+        return out
+    def apply(self, dashboards):
+        """
+        Rewrites refresh, the refresh intervals of the time picker and the minimal interval of
+        the panels. Dashboard objects are changed with their setters, dictionaries in place.
+        Panel objects with queries but without interval setting keep their interval, they
+        are listed in 'skipped'.
+
+        :param dashboards: List of Dashboard objects or dictionaries
+        :return dict with the estimated 'before' and 'after' load (see LoadModel.estimate), the 'changes' as list of (slug, old refresh, new refresh) and the 'skipped' panels as list of (slug, panel title)
+        """
+        before = self.model.estimate(dashboards)
+        changes = []
+        skipped = []
+        for d, seconds in zip(dashboards, self.plan(dashboards)):
+            if seconds == None:
+                continue
+            refresh = _interval(seconds)
+            if isinstance(d, Dashboard):
+                old = d.refresh
+                d.set_refresh(refresh)
+                d.timepicker.set_refresh_intervals(self._get_intervals(d.timepicker.refresh_intervals, seconds, refresh))
+                panels = [p for r in d.rows for p in r.panels]
+            else:
+                d = self.model._load(d)
+                old = d.get("refresh")
+                d["refresh"] = refresh
+                timepicker = d.setdefault("timepicker", {})
+                timepicker["refresh_intervals"] = self._get_intervals(timepicker.get("refresh_intervals", []), seconds, refresh)
+                panels = [p for r in d.get("rows", []) for p in r.get("panels", [])]
+            slug = self.model.get_slug(d)
+            if self.panel_interval:
+                for p in panels:
+                    if not self._set_panel_interval(p, seconds):
+                        skipped.append((slug, p.title))
+            changes.append((slug, old, refresh))
+        return {"before" : before, "after" : self.model.estimate(dashboards), "changes" : changes,
+                "skipped" : skipped}
+    def _get_intervals(self, intervals, seconds, refresh):
+        out = [i for i in intervals if get_seconds(i) and get_seconds(i) >= seconds]
+        if refresh not in out:
+            out.insert(0, refresh)
+        return out
+    def _set_panel_interval(self, p, seconds):
+        """
+        Raises the minimal group by interval of a panel with queries to seconds. Returns
+        False if the panel has queries but no interval setting.
+        """
+        settings = None
+        if isinstance(p, dict):
+            settings = p
+        elif isinstance(dashboard._unwrap(p), dashboard.RawPanel):
+            settings = p.settings
+        if settings != None:
+            if not settings.get("targets"):
+                return True
+            current = settings.get("interval")
+        elif not getattr(p, "targets", None):
+            return True
+        elif hasattr(p, "interval"):
+            current = p.interval
+        else:
+            return False
+        if current:
+            s = _get_interval_seconds(current)
+            if s == None or s >= seconds:
+                return True
+        interval = ">" + _interval(seconds)
+        if isinstance(p, dict):
+            p["interval"] = interval
+        elif settings != None:
+            p.settings = dict(settings, interval=interval)
+        elif hasattr(p, "set_interval"):
+            # PiePanel only accepts intervals in seconds
+            return p.set_interval(interval) or p.set_interval(seconds)
+        else:
+            p.interval = interval
+        return True
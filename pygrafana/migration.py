@@ -0,0 +1,196 @@
+#!/usr/bin/python
+
+import json
+import threading
+import time
+import Queue
+
+
+_stop = object()
+
+
+def remap_datasources(d, mapping):
+    """
+    Replaces datasource names in a dashboard dictionary in place. Walks the whole
+    document, so panels, targets, templates and annotations are covered.
+
+    :param d: Dashboard dictionary
+    :param mapping: Dictionary old datasource name -> new datasource name
+    :return d
+    """
+    if isinstance(d, dict):
+        for k, v in d.items():
+            if k == "datasource" and isinstance(v, basestring) and mapping.has_key(v):
+                d[k] = mapping[v]
+            elif isinstance(v, (dict, list)):
+                remap_datasources(v, mapping)
+    elif isinstance(d, list):
+        for v in d:
+            remap_datasources(v, mapping)
+    return d
+
+
+class _Stage(object):
+    """
+    Pool of worker threads reading from one queue and writing into the next one
+    """
+    def __init__(self, func, inq, outq, workers, failed):
+        self.func = func
+        self.inq = inq
+        self.outq = outq
+        self.failed = failed
+        self.count = 0
+        self.lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._work) for i in range(max(1, workers))]
+        for t in self.threads:
+            t.daemon = True
+            t.start()
+    def _work(self):
+        while True:
+            item = self.inq.get()
+            if item is _stop:
+                break
+            key, data = item
+            try:
+                out = self.func(key, data)
+            except Exception as e:
+                self.failed[key] = "%s: %s" % (e.__class__.__name__, e,)
+                continue
+            with self.lock:
+                self.count += 1
+            if self.outq != None:
+                self.outq.put((key, out))
+    def join(self):
+        for t in self.threads:
+            self.inq.put(_stop)
+        for t in self.threads:
+            t.join()
+
+
+class Migration(object):
+    """
+    Copies dashboards from one Grafana instance to another with a fetch -> transform -> push pipeline
+
+    Every stage has its own pool of worker threads and the stages are connected by bounded
+    queues, so downloads from the source and uploads to the target overlap. The active
+    organization is a per-user setting in Grafana, therefore organizations are migrated one
+    after another.
+    """
+    def __init__(self, source, target, orgs={}, datasources={}, transforms=[],
+                       fetch_workers=4, transform_workers=1, push_workers=4,
+                       queue_size=16, create_orgs=False):
+        """
+        Construct a new Migration object
+
+        :param source: Connection object of the source instance
+        :param target: Connection object of the target instance
+        :param orgs: Dictionary source organization ID -> target organization ID. Unmapped organizations are matched by name.
+        :param datasources: Dictionary source datasource name -> target datasource name
+        :param transforms: List of functions f(dashboard_dict) returning the rewritten dashboard dictionary
+        :param fetch_workers: Number of parallel downloads from the source
+        :param transform_workers: Number of threads running the transforms
+        :param push_workers: Number of parallel uploads to the target
+        :param queue_size: Capacity of the queues between the stages
+        :param create_orgs: Create missing organizations on the target
+        """
+        self.source = source
+        self.target = target
+        self.orgs = dict(orgs)
+        self.datasources = dict(datasources)
+        self.transforms = list(transforms)
+        self.fetch_workers = fetch_workers
+        self.transform_workers = transform_workers
+        self.push_workers = push_workers
+        self.queue_size = queue_size
+        self.create_orgs = create_orgs
+    def add_org_mapping(self, source_oid, target_oid):
+        self.orgs[source_oid] = target_oid
+    def add_datasource_mapping(self, source_name, target_name):
+        self.datasources[source_name] = target_name
+    def add_transform(self, func):
+        if callable(func):
+            self.transforms.append(func)
+            return True
+        return False
+    def _get_target_org(self, source_org):
+        if self.orgs.has_key(source_org["id"]):
+            return self.orgs[source_org["id"]]
+        oid = self.target.get_orgid_by_name(source_org["name"])
+        if oid < 0 and self.create_orgs:
+            oid = self.target.add_org(source_org["name"])
+        if oid > 0:
+            self.orgs[source_org["id"]] = oid
+        return oid
+    def _fetch(self, key, slug):
+        data = self.source.get_dashboard(slug)
+        if not data.has_key("dashboard"):
+            raise ValueError("Cannot get dashboard %s" % (slug,))
+        return data["dashboard"]
+    def _transform(self, key, dash):
+        dash["id"] = None
+        if len(self.datasources) > 0:
+            remap_datasources(dash, self.datasources)
+        for func in self.transforms:
+            dash = func(dash)
+        return dash
+    def _push(self, key, dash):
+        res = self.target.add_dashboard(json.dumps({"dashboard" : dash, "overwrite" : True}))
+        if not isinstance(res, dict) or res.get("status") != "success":
+            raise ValueError("Upload failed: %s" % (str(res),))
+        return res
+    def migrate_org(self, source_oid, target_oid, slugs=None):
+        """
+        Migrate the dashboards of one organization.
+
+        :param source_oid: Organization ID on the source
+        :param target_oid: Organization ID on the target
+        :param slugs: List of dashboard slugs, defaults to all dashboards of the organization
+        :return dict with the number of fetched and pushed dashboards and the failed ones
+        """
+        failed = {}
+        if not self.source.change_active_org(source_oid):
+            return {"fetched" : 0, "pushed" : 0, "failed" : {"%d/*" % source_oid : "Cannot switch source organization"}}
+        if not self.target.change_active_org(target_oid):
+            return {"fetched" : 0, "pushed" : 0, "failed" : {"%d/*" % source_oid : "Cannot switch target organization"}}
+        if slugs == None:
+            slugs = [e["uri"].split("/")[-1] for e in self.source.get_dashboards()
+                     if e.get("type", "dash-db") == "dash-db" and e.has_key("uri")]
+        todo = Queue.Queue()
+        fetched = Queue.Queue(self.queue_size)
+        transformed = Queue.Queue(self.queue_size)
+        for slug in slugs:
+            todo.put(("%d/%s" % (source_oid, slug,), slug))
+        push = _Stage(self._push, transformed, None, self.push_workers, failed)
+        transform = _Stage(self._transform, fetched, transformed, self.transform_workers, failed)
+        fetch = _Stage(self._fetch, todo, fetched, self.fetch_workers, failed)
+        fetch.join()
+        transform.join()
+        push.join()
+        return {"fetched" : fetch.count, "pushed" : push.count, "failed" : failed}
+    def run(self, oids=None):
+        """
+        Migrate all dashboards of the given or all organizations of the source.
+
+        :param oids: List of source organization IDs, defaults to all organizations
+        :return dict with the number of fetched and pushed dashboards, the failed ones and the duration
+        """
+        if not (self.source.is_connected() and self.target.is_connected()):
+            print "Source and target connections required"
+            return {}
+        start = time.time()
+        report = {"fetched" : 0, "pushed" : 0, "failed" : {}}
+        orgs = [o for o in self.source.get_orgs() if o.has_key("id")]
+        if oids:
+            orgs = [o for o in orgs if o["id"] in oids]
+        for o in orgs:
+            target_oid = self._get_target_org(o)
+            if target_oid < 0:
+                print "No target organization for %s (ID %d)" % (o["name"], o["id"],)
+                report["failed"]["%d/*" % (o["id"],)] = "No target organization"
+                continue
+            r = self.migrate_org(o["id"], target_oid)
+            report["fetched"] += r["fetched"]
+            report["pushed"] += r["pushed"]
+            report["failed"].update(r["failed"])
+        report["duration"] = time.time() - start
+        return report
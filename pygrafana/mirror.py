@@ -0,0 +1,250 @@
+#!/usr/bin/python
+
+import json
+import sqlite3
+import time
+
+from parallel import run_parallel
+import changes
+
+
+_schema = [
+    "CREATE TABLE IF NOT EXISTS orgs (id INTEGER PRIMARY KEY, name TEXT)",
+    "CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, login TEXT, email TEXT, name TEXT, isAdmin INTEGER)",
+    "CREATE TABLE IF NOT EXISTS memberships (uid INTEGER, oid INTEGER, role TEXT, PRIMARY KEY (uid, oid))",
+    "CREATE TABLE IF NOT EXISTS datasources (id INTEGER PRIMARY KEY, oid INTEGER, name TEXT, type TEXT, url TEXT, database TEXT, isDefault INTEGER, data TEXT)",
+    "CREATE TABLE IF NOT EXISTS dashboards (oid INTEGER, slug TEXT, id INTEGER, title TEXT, version INTEGER, updated TEXT, data TEXT, PRIMARY KEY (oid, slug))",
+    "CREATE TABLE IF NOT EXISTS dashboard_tags (oid INTEGER, slug TEXT, tag TEXT)",
+    "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)",
+    "CREATE INDEX IF NOT EXISTS idx_users_login ON users (login)",
+    "CREATE INDEX IF NOT EXISTS idx_datasources_name ON datasources (name)",
+    "CREATE INDEX IF NOT EXISTS idx_dashboard_tags_tag ON dashboard_tags (tag)",
+]
+
+
+def _slug_from_entry(e):
+    if e.has_key("uri"):
+        return e["uri"].split("/")[-1]
+    if e.has_key("slug"):
+        return e["slug"]
+    return None
+
+
+class Mirror(object):
+    """
+    Local SQLite copy of the orgs, users, memberships, datasources and dashboards of a Grafana instance
+
+    The database file can be shared between processes. Only refresh() talks to Grafana,
+    all get_* functions are answered from the local database.
+    """
+    def __init__(self, con, path="grafana_mirror.db", workers=8, timeout=None):
+        """
+        Construct a new Mirror object
+
+        :param con: Connection object used for refreshing. Requires admin permissions for orgs and users.
+        :param path: Path of the SQLite database file
+        :param workers: Number of parallel requests when fetching dashboards and memberships
+        :param timeout: Deadline per fetched object in seconds
+        """
+        self.con = con
+        self.path = path
+        self.workers = workers
+        self.timeout = timeout
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        for stmt in _schema:
+            self.db.execute(stmt)
+        self.db.commit()
+    def close(self):
+        self.db.close()
+    def _fetch(self, func, items):
+        res = run_parallel(func, items, workers=self.workers, timeout=self.timeout)
+        out = []
+        for item, r in zip(items, res):
+            if r["status"] == "ok":
+                out.append((item, r["result"]))
+            else:
+                print "Fetching %s failed: %s" % (str(item), r["error"],)
+        return out
+    def _refresh_orgs(self):
+        orgs = self.con.get_orgs()
+        if not isinstance(orgs, list):
+            return {"added" : 0, "removed" : 0, "changed" : 0}
+        old = dict([(r["id"], r["name"]) for r in self.db.execute("SELECT id, name FROM orgs")])
+        new = dict([(o["id"], o["name"]) for o in orgs if o.has_key("id")])
+        removed = [oid for oid in old.keys() if not new.has_key(oid)]
+        changed = [oid for oid in new.keys() if old.has_key(oid) and old[oid] != new[oid]]
+        added = [oid for oid in new.keys() if not old.has_key(oid)]
+        for oid in removed:
+            for table in ("orgs", "memberships", "datasources", "dashboards", "dashboard_tags"):
+                col = "oid"
+                if table == "orgs":
+                    col = "id"
+                self.db.execute("DELETE FROM %s WHERE %s = ?" % (table, col,), (oid,))
+        for oid in added + changed:
+            self.db.execute("INSERT OR REPLACE INTO orgs (id, name) VALUES (?, ?)", (oid, new[oid]))
+        return {"added" : len(added), "removed" : len(removed), "changed" : len(changed)}
+    def _refresh_users(self):
+        users = self.con.get_users()
+        if not isinstance(users, list):
+            return {"added" : 0, "removed" : 0, "changed" : 0}
+        def key(u):
+            return (u.get("login"), u.get("email"), u.get("name"), int(bool(u.get("isAdmin"))))
+        old = dict([(r["id"], (r["login"], r["email"], r["name"], r["isAdmin"]))
+                    for r in self.db.execute("SELECT * FROM users")])
+        new = dict([(u["id"], key(u)) for u in users if u.has_key("id")])
+        removed = [uid for uid in old.keys() if not new.has_key(uid)]
+        changed = [uid for uid in new.keys() if old.has_key(uid) and old[uid] != new[uid]]
+        added = [uid for uid in new.keys() if not old.has_key(uid)]
+        for uid in removed:
+            self.db.execute("DELETE FROM users WHERE id = ?", (uid,))
+            self.db.execute("DELETE FROM memberships WHERE uid = ?", (uid,))
+        for uid in added + changed:
+            self.db.execute("INSERT OR REPLACE INTO users (id, login, email, name, isAdmin) VALUES (?, ?, ?, ?, ?)",
+                            (uid,) + new[uid])
+        return {"added" : len(added), "removed" : len(removed), "changed" : len(changed)}
+    def _refresh_memberships(self, oids):
+        res = self._fetch(self.con.get_users_in_oid, oids)
+        for oid, users in res:
+            if not isinstance(users, list):
+                continue
+            self.db.execute("DELETE FROM memberships WHERE oid = ?", (oid,))
+            for u in users:
+                if u.has_key("userId"):
+                    self.db.execute("INSERT OR REPLACE INTO memberships (uid, oid, role) VALUES (?, ?, ?)",
+                                    (u["userId"], oid, u.get("role")))
+        return len(res)
+    def _refresh_org_content(self, oid, full=False, verify=True):
+        """
+        Datasources and dashboards are only reachable through the active organization which is
+        a per-user setting in Grafana. Therefore organizations are processed one after another
+        and only the dashboard downloads of a single organization run in parallel.
+        """
+        if not self.con.change_active_org(oid):
+            print "Cannot switch to organization %d" % (oid,)
+            return 0
+        dss = self.con.get_ds()
+        if isinstance(dss, list):
+            self.db.execute("DELETE FROM datasources WHERE oid = ?", (oid,))
+            for ds in dss:
+                self.db.execute("INSERT OR REPLACE INTO datasources (id, oid, name, type, url, database, isDefault, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                (ds.get("id"), oid, ds.get("name"), ds.get("type"), ds.get("url"),
+                                 ds.get("database"), int(bool(ds.get("isDefault"))), json.dumps(ds)))
+        entries = self.con.get_dashboards()
+        if not isinstance(entries, list):
+            return 0
+        old = {}
+        for r in self.db.execute("SELECT slug, id, title, version, updated FROM dashboards WHERE oid = ?", (oid,)):
+            tags = [t["tag"] for t in self.db.execute("SELECT tag FROM dashboard_tags WHERE oid = ? AND slug = ?", (oid, r["slug"]))]
+            old[r["slug"]] = {"id" : r["id"], "title" : r["title"], "tags" : tags,
+                              "version" : r["version"], "updated" : r["updated"]}
+        new = {}
+        for e in entries:
+            slug = _slug_from_entry(e)
+            if slug and e.get("type", "dash-db") == "dash-db":
+                new[slug] = e
+        for slug in old.keys():
+            if not new.has_key(slug):
+                self.db.execute("DELETE FROM dashboards WHERE oid = ? AND slug = ?", (oid, slug))
+                self.db.execute("DELETE FROM dashboard_tags WHERE oid = ? AND slug = ?", (oid, slug))
+        fetch = changes.get_fetch(new, old, verify or full)
+        updates = 0
+        for slug, data in self._fetch(self.con.get_dashboard, fetch):
+            if not data.has_key("dashboard"):
+                continue
+            dash = data["dashboard"]
+            state = changes.dashboard_state(new[slug], data)
+            if not full and not changes.is_changed(state, old.get(slug)):
+                continue
+            self.db.execute("INSERT OR REPLACE INTO dashboards (oid, slug, id, title, version, updated, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (oid, slug, dash.get("id"), dash.get("title"), state["version"], state["updated"], json.dumps(dash)))
+            self.db.execute("DELETE FROM dashboard_tags WHERE oid = ? AND slug = ?", (oid, slug))
+            for tag in dash.get("tags", []):
+                self.db.execute("INSERT INTO dashboard_tags (oid, slug, tag) VALUES (?, ?, ?)", (oid, slug, tag))
+            updates += 1
+        return updates
+    def refresh(self, full=False, verify=True):
+        """
+        Synchronize the local database with Grafana.
+
+        Orgs and users are compared with the stored lists and only the differences are written.
+        The search listing of Grafana has no version, so by default every dashboard is
+        downloaded but only the ones with a different id, title, tags, 'version' or 'updated'
+        timestamp are rewritten. With verify=False only dashboards that are new or whose id,
+        title or tags changed in the listing are downloaded, edits of the content are missed.
+
+        :param full: Rewrite all dashboards
+        :param verify: Download all dashboards to detect changes of the content
+        :return dict with the number of changes per object type
+        """
+        if not self.con.is_connected():
+            print "Connection not established"
+            return {}
+        if not verify and not full:
+            changes.warn_unverified()
+        start = time.time()
+        stats = {"orgs" : self._refresh_orgs(), "users" : self._refresh_users()}
+        oids = [r["id"] for r in self.db.execute("SELECT id FROM orgs ORDER BY id")]
+        stats["memberships"] = self._refresh_memberships(oids)
+        stats["dashboards"] = 0
+        current = self.con.get_current_org()
+        for oid in oids:
+            stats["dashboards"] += self._refresh_org_content(oid, full=full, verify=verify)
+        if current.has_key("id"):
+            self.con.change_active_org(current["id"])
+        self.db.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('last_refresh', ?)", (str(time.time()),))
+        self.db.commit()
+        stats["duration"] = time.time() - start
+        return stats
+    def get_last_refresh(self):
+        r = self.db.execute("SELECT value FROM state WHERE key = 'last_refresh'").fetchone()
+        if r:
+            return float(r["value"])
+        return None
+    def query(self, sql, params=()):
+        """
+        Run an arbitrary SQL query on the local database
+
+        :return list of dicts
+        """
+        return [dict(r) for r in self.db.execute(sql, params)]
+    def get_orgs(self):
+        return self.query("SELECT id, name FROM orgs ORDER BY id")
+    def get_users(self):
+        return self.query("SELECT id, login, email, name, isAdmin FROM users ORDER BY id")
+    def get_orgid_by_name(self, orgname):
+        r = self.db.execute("SELECT id FROM orgs WHERE name = ?", (orgname,)).fetchone()
+        if r:
+            return r["id"]
+        return -1
+    def get_ds(self, oid=None):
+        if oid:
+            return [json.loads(r["data"]) for r in self.db.execute("SELECT data FROM datasources WHERE oid = ? ORDER BY id", (oid,))]
+        return [json.loads(r["data"]) for r in self.db.execute("SELECT data FROM datasources ORDER BY id")]
+    def get_orgs_by_ds(self, dsname):
+        """
+        Which organizations have a datasource with the given name
+        """
+        return self.query("SELECT DISTINCT orgs.id, orgs.name FROM orgs JOIN datasources ON datasources.oid = orgs.id WHERE datasources.name = ? ORDER BY orgs.id", (dsname,))
+    def get_dashboards_by_tag(self, tag):
+        """
+        Which dashboards are tagged with the given tag
+        """
+        return self.query("SELECT dashboards.oid, dashboards.slug, dashboards.title FROM dashboards JOIN dashboard_tags ON dashboard_tags.oid = dashboards.oid AND dashboard_tags.slug = dashboards.slug WHERE dashboard_tags.tag = ? ORDER BY dashboards.oid, dashboards.slug", (tag,))
+    def get_orgs_by_user(self, login):
+        """
+        In which organizations is the user with the given login or email and with which role
+        """
+        return self.query("SELECT orgs.id, orgs.name, memberships.role FROM users JOIN memberships ON memberships.uid = users.id JOIN orgs ON orgs.id = memberships.oid WHERE users.login = ? OR users.email = ? ORDER BY orgs.id", (login, login))
+    def get_users_in_oid(self, oid):
+        return self.query("SELECT users.id, users.login, users.email, memberships.role FROM users JOIN memberships ON memberships.uid = users.id WHERE memberships.oid = ? ORDER BY users.id", (oid,))
+    def get_dashboard(self, slug, oid):
+        r = self.db.execute("SELECT data FROM dashboards WHERE oid = ? AND slug = ?", (oid, slug)).fetchone()
+        if r:
+            return json.loads(r["data"])
+        return {}
+    def get_dashboards(self, oid=None):
+        if oid:
+            return self.query("SELECT oid, slug, id, title, version, updated FROM dashboards WHERE oid = ? ORDER BY slug", (oid,))
+        return self.query("SELECT oid, slug, id, title, version, updated FROM dashboards ORDER BY oid, slug")
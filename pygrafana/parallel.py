@@ -0,0 +1,140 @@
+#!/usr/bin/python
+
+import collections
+import itertools
+import threading
+import time
+import Queue
+
+
+class _Job(threading.Thread):
+    """
+    Worker thread running a single call of run_parallel
+    """
+    def __init__(self, func, item, index, done):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.func = func
+        self.item = item
+        self.index = index
+        self.done = done
+        self.started = time.time()
+        self.status = "error"
+        self.result = None
+        self.error = None
+        self.duration = 0.0
+    def run(self):
+        try:
+            self.result = self.func(self.item)
+            self.status = "ok"
+        except Exception as e:
+            self.error = "%s: %s" % (e.__class__.__name__, e,)
+        self.duration = time.time() - self.started
+        self.done.put(self)
+    def get(self):
+        return {"status" : self.status, "result" : self.result,
+                "error" : self.error, "duration" : self.duration}
+
+
+def run_parallel(func, items, workers=8, timeout=None):
+    """
+    Calls func(item) for every item with at most 'workers' calls running at the same time
+
+    Every call gets its own deadline of 'timeout' seconds. Python threads cannot be
+    cancelled, so a call that exceeds its deadline is reported as 'timeout' and abandoned:
+    it keeps running in the background while its slot is handed to the next item. With
+    timeouts more than 'workers' calls can therefore run at the same time, and the side
+    effects of an abandoned call (e.g. a dashboard upload) can still happen after
+    run_parallel() returned.
+
+    :param func: Callable with a single argument
+    :param items: Iterable with the arguments for func
+    :param workers: Maximal number of concurrent calls
+    :param timeout: Deadline per call in seconds or None for no deadline
+    :return list with one dict {'status': 'ok'/'error'/'timeout', 'result': ..., 'error': ..., 'duration': ...} per item in input order
+    """
+    items = list(items)
+    workers = max(1, int(workers))
+    results = [None] * len(items)
+    done = Queue.Queue()
+    running = {}
+    nxt = 0
+    while nxt < len(items) or len(running) > 0:
+        while nxt < len(items) and len(running) < workers:
+            job = _Job(func, items[nxt], nxt, done)
+            running[nxt] = job
+            job.start()
+            nxt += 1
+        wait = None
+        if timeout:
+            now = time.time()
+            for idx, job in running.items():
+                if now - job.started >= timeout:
+                    results[idx] = {"status" : "timeout", "result" : None,
+                                    "error" : "Deadline of %.1f seconds exceeded" % (timeout,),
+                                    "duration" : now - job.started}
+                    del running[idx]
+            if len(running) == 0:
+                continue
+            wait = max(0.0, min([j.started for j in running.values()]) + timeout - now)
+        try:
+            job = done.get(True, wait)
+        except Queue.Empty:
+            continue
+        if running.has_key(job.index):
+            del running[job.index]
+            results[job.index] = job.get()
+    return results
+
+
+def _call_chunk(func, items):
+    """
+    Runs in the worker processes of imap_bounded: calls func for a chunk of items
+    """
+    return [func(item) for item in items]
+
+def imap_bounded(pool, func, items, processes, chunksize=1, ordered=True):
+    """
+    Calls func(item) for every item in a multiprocessing pool like Pool.imap()
+
+    The feeder thread of Pool.imap() reads the whole iterable up front. Here the items are
+    read in chunks as the results are consumed: at most two chunks per process are
+    submitted and not yet returned, so a generator of items is not read into memory at
+    once. In ordered mode a slow chunk holds back the submission of further chunks until
+    its results are returned.
+
+    :param pool: multiprocessing.Pool object, closing it is left to the caller
+    :param func: Module-level function with a single argument, sent to the worker processes
+    :param items: Iterable with the arguments for func
+    :param processes: Number of worker processes of the pool
+    :param chunksize: Number of items sent to a worker at once
+    :param ordered: Return the results in input order, otherwise as they complete
+    :return generator of the results of func
+    """
+    items = iter(items)
+    chunksize = max(1, int(chunksize))
+    pending = collections.deque()
+    def submit():
+        while len(pending) < 2 * processes:
+            chunk = list(itertools.islice(items, chunksize))
+            if len(chunk) == 0:
+                break
+            pending.append(pool.apply_async(_call_chunk, (func, chunk)))
+    submit()
+    while len(pending) > 0:
+        if ordered:
+            chunk = pending.popleft()
+        else:
+            chunk = None
+            while chunk == None:
+                for r in pending:
+                    if r.ready():
+                        chunk = r
+                        break
+                else:
+                    pending[0].wait(0.01)
+            pending.remove(chunk)
+        results = chunk.get()
+        submit()
+        for res in results:
+            yield res
@@ -0,0 +1,440 @@
+#!/usr/bin/python
+
+import json
+import re
+import threading
+import time
+
+from dashboard import Dashboard
+from parallel import run_parallel
+
+
+_ds_fields = ["type", "url", "access", "database", "user", "isDefault", "basicAuth", "basicAuthUser"]
+
+
+def _slugify(title):
+    return title.lower().replace(" ", "-").replace("_", "-")
+
+def _slug_key(s):
+    """
+    Returns the letters and digits of a title or slug. Grafana versions differ in how they
+    turn punctuation into slugs, dashboards with the same key can get the same slug.
+    """
+    return re.sub(r"[^a-z0-9]", "", s.lower())
+
+
+def _check(res, what):
+    if res == -1 or res == False or res == {} or (isinstance(res, tuple) and res[0] != 200):
+        raise ValueError("%s failed" % (what,))
+    return res
+
+
+class Operation(object):
+    """
+    A single API operation planned by a Reconciler
+    """
+    def __init__(self, kind, name, func, deps=[], org=None, requests=1):
+        """
+        Construct a new Operation object
+
+        :param kind: Type of operation like 'create_org' or 'update_datasource'
+        :param name: Name of the affected object
+        :param func: Function without arguments performing the API calls
+        :param deps: List of Operation objects that have to finish before
+        :param org: Organization name if the operation works on the active organization
+        :param requests: Estimated number of HTTP requests
+        """
+        self.kind = kind
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.org = org
+        self.requests = requests
+        self.status = "planned"
+        self.error = None
+    def __str__(self):
+        s = "%s %s" % (self.kind, self.name,)
+        if self.org:
+            s += " in org %s" % (self.org,)
+        return s
+    def __repr__(self):
+        return str(self)
+
+
+class Reconciler(object):
+    """
+    Brings a Grafana instance into a declared state with a minimal set of API operations
+
+    The desired state is a dictionary:
+    {"users": [{"login": ..., "email": ..., "name": ..., "password": ...}],
+     "orgs": [{"name": ...,
+               "members": {login: role},
+               "datasources": [{"name": ..., "type": ..., "url": ..., "database": ..., ...}],
+               "dashboards": [Dashboard objects or dashboard dictionaries]}]}
+
+    Users and organizations are never deleted. With prune=True members, datasources and
+    dashboards that are not part of the desired state are removed from the listed organizations.
+    Dashboards are matched by their title with the dashboards of the search listing and
+    addressed by the slug Grafana reports, dashboards with a desired title are never pruned.
+    """
+    def __init__(self, con, state, prune=False, workers=8):
+        """
+        Construct a new Reconciler object
+
+        :param con: Connection object with admin permissions
+        :param state: Desired state dictionary
+        :param prune: Delete members, datasources and dashboards missing in the desired state
+        :param workers: Maximal number of concurrent operations
+        """
+        self.con = con
+        self.state = state
+        self.prune = prune
+        self.workers = workers
+        self.ids = {}
+        self.reads = 0
+        self.operations = []
+    def _read_current(self):
+        cur = {"users" : {}, "orgs" : {}}
+        self.reads = 0
+        users = self.con.get_users()
+        orgs = self.con.get_orgs()
+        self.reads += 2
+        if isinstance(users, list):
+            for u in users:
+                cur["users"][u["login"]] = u
+        if isinstance(orgs, list):
+            for o in orgs:
+                cur["orgs"][o["name"]] = {"id" : o["id"], "members" : {},
+                                          "datasources" : {}, "dashboards" : {}}
+        wanted = [o for o in self.state.get("orgs", []) if cur["orgs"].has_key(o["name"])]
+        oids = [cur["orgs"][o["name"]]["id"] for o in wanted]
+        res = run_parallel(self.con.get_users_in_oid, oids, workers=self.workers)
+        self.reads += len(oids)
+        for o, r in zip(wanted, res):
+            if r["status"] == "ok" and isinstance(r["result"], list):
+                for m in r["result"]:
+                    cur["orgs"][o["name"]]["members"][m["login"]] = m
+        active = self.con.get_current_org()
+        self.reads += 1
+        for o in wanted:
+            c = cur["orgs"][o["name"]]
+            if not self.con.change_active_org(c["id"]):
+                continue
+            dss = self.con.get_ds()
+            if isinstance(dss, list):
+                for ds in dss:
+                    c["datasources"][ds["name"]] = ds
+            entries = self.con.get_dashboards()
+            self.reads += 3
+            slugs = {}
+            titles = {}
+            if isinstance(entries, list):
+                for e in entries:
+                    if e.get("type", "dash-db") == "dash-db" and e.has_key("uri"):
+                        slug = e["uri"].split("/")[-1]
+                        slugs[slug] = None
+                        titles[slug] = e.get("title")
+            c["titles"] = titles
+            c["slugs"] = self._get_slugs(titles)
+            desired = [self._find_dashboard(self._get_dashboard(d)[1], c) for d in o.get("dashboards", [])]
+            fetch = [s for s in desired if s != None]
+            res = run_parallel(self.con.get_dashboard, fetch, workers=self.workers)
+            self.reads += len(fetch)
+            for s, r in zip(fetch, res):
+                if r["status"] == "ok" and r["result"].has_key("dashboard"):
+                    slugs[s] = r["result"]["dashboard"]
+            c["dashboards"] = slugs
+        if active.has_key("id"):
+            self.con.change_active_org(active["id"])
+            self.reads += 1
+        return cur
+    def _get_dashboard(self, d):
+        if isinstance(d, Dashboard):
+            return d.get_slug(), d.get(self.con.grafana_version)["dashboard"]
+        if isinstance(d, basestring):
+            d = json.loads(d)
+        if d.has_key("dashboard"):
+            d = d["dashboard"]
+        return _slugify(d["title"]), d
+    def _get_slugs(self, titles):
+        slugs = {}
+        for slug in sorted(titles.keys(), reverse=True):
+            slugs[titles[slug]] = slug
+        return slugs
+    def _find_dashboard(self, dash, c):
+        """
+        Returns the slug of a dashboard on the server or None. Dashboards are matched by their
+        title since the slugs Grafana derives from titles with punctuation differ between
+        versions, with the slug from the search listing as identifier.
+        """
+        slug = c.get("slugs", {}).get(dash.get("title"))
+        if slug == None and c.get("titles", {}).has_key(_slugify(dash.get("title", ""))):
+            slug = _slugify(dash.get("title", ""))
+        return slug
+    def _dashboard_differs(self, desired, current):
+        if not current:
+            return True
+        for k in desired.keys():
+            if k in ("id", "version"):
+                continue
+            if json.dumps(desired[k], sort_keys=True) != json.dumps(current.get(k), sort_keys=True):
+                return True
+        return False
+    def plan(self):
+        """
+        Read the current state and compute the operations required to reach the desired state.
+
+        :return list of Operation objects
+        """
+        cur = self._read_current()
+        ops = []
+        con = self.con
+        ids = self.ids
+        user_ops = {}
+        for u in self.state.get("users", []):
+            login = u["login"]
+            key = "user:%s" % (login,)
+            if not cur["users"].has_key(login):
+                def create_user(u=u, key=key):
+                    _check(con.admin_add_user(login=u["login"], email=u.get("email"),
+                                              password=u.get("password"), name=u.get("name")), "admin_add_user")
+                    ids[key] = _check(con.get_uid(u["login"]), "get_uid")
+                user_ops[login] = Operation("create_user", login, create_user, requests=2)
+                ops.append(user_ops[login])
+                continue
+            c = cur["users"][login]
+            ids[key] = c["id"]
+            if (u.has_key("email") and u["email"] != c.get("email")) or \
+               (u.has_key("name") and u["name"] != c.get("name")):
+                def update_user(u=u, key=key):
+                    _check(con.upd_user_by_uid(ids[key], login=u["login"], email=u.get("email"),
+                                               name=u.get("name")), "upd_user_by_uid")
+                ops.append(Operation("update_user", login, update_user))
+        for o in self.state.get("orgs", []):
+            name = o["name"]
+            okey = "org:%s" % (name,)
+            org_deps = []
+            if cur["orgs"].has_key(name):
+                c = cur["orgs"][name]
+                ids[okey] = c["id"]
+            else:
+                c = {"members" : {}, "datasources" : {}, "dashboards" : {}}
+                def create_org(name=name, okey=okey):
+                    ids[okey] = _check(con.add_org(name), "add_org")
+                org_deps = [Operation("create_org", name, create_org)]
+                ops += org_deps
+            members = o.get("members", {})
+            for login in sorted(members.keys()):
+                role = members[login]
+                ukey = "user:%s" % (login,)
+                deps = org_deps + [user_ops[login]] if user_ops.has_key(login) else list(org_deps)
+                if not c["members"].has_key(login):
+                    def add_member(login=login, role=role, ukey=ukey, okey=okey):
+                        _check(con.add_uid_to_orgid(ids[ukey], ids[okey], login=login, role=role), "add_uid_to_orgid")
+                    ops.append(Operation("add_member", "%s as %s" % (login, role,), add_member, deps=deps))
+                elif c["members"][login].get("role") != role:
+                    def update_member(role=role, ukey=ukey, okey=okey):
+                        _check(con.upd_uid_in_orgid(ids[ukey], ids[okey], role), "upd_uid_in_orgid")
+                    ops.append(Operation("update_member", "%s to %s" % (login, role,), update_member, deps=deps))
+            if self.prune:
+                for login in sorted(c["members"].keys()):
+                    if members.has_key(login) or login == con.username:
+                        continue
+                    def remove_member(uid=c["members"][login]["userId"], okey=okey):
+                        _check(con.del_uid_from_orgid(uid, ids[okey]), "del_uid_from_orgid")
+                    ops.append(Operation("remove_member", login, remove_member, deps=org_deps))
+            ds_ops = []
+            wanted = {}
+            for ds in o.get("datasources", []):
+                wanted[ds["name"]] = ds
+                if not c["datasources"].has_key(ds["name"]):
+                    def add_datasource(ds=ds):
+                        _check(con.add_ds(ds["name"], ds["type"], ds["url"], ds.get("database", ""),
+                                          access=ds.get("access", "proxy"), user=ds.get("user", ""),
+                                          password=ds.get("password", ""), basicAuth=ds.get("basicAuth", False),
+                                          basicAuthUser=ds.get("basicAuthUser", ""),
+                                          basicAuthPassword=ds.get("basicAuthPassword", ""),
+                                          isDefault=ds.get("isDefault", False),
+                                          jsonData=ds.get("jsonData")), "add_ds")
+                    ds_ops.append(Operation("create_datasource", ds["name"], add_datasource, deps=org_deps, org=name))
+                    continue
+                cds = c["datasources"][ds["name"]]
+                differs = False
+                for f in _ds_fields:
+                    if ds.has_key(f) and ds[f] != cds.get(f):
+                        differs = True
+                if differs:
+                    merged = {}
+                    for k, v in cds.items():
+                        if isinstance(v, unicode):
+                            v = v.encode("utf-8")
+                        merged[k] = v
+                    merged.update(ds)
+                    def update_datasource(ds=merged):
+                        _check(con.upd_ds(ds["id"], name=ds["name"], typ=ds["type"], access=ds.get("access"),
+                                          url=ds.get("url"), username=ds.get("user"), password=ds.get("password"),
+                                          database=ds.get("database"), basicAuth=ds.get("basicAuth"),
+                                          basicAuthUser=ds.get("basicAuthUser"),
+                                          basicAuthPassword=ds.get("basicAuthPassword"),
+                                          isDefault=ds.get("isDefault")), "upd_ds")
+                    ds_ops.append(Operation("update_datasource", ds["name"], update_datasource, org=name, requests=2))
+            if self.prune:
+                for dsname in sorted(c["datasources"].keys()):
+                    if not wanted.has_key(dsname):
+                        def delete_datasource(dsid=c["datasources"][dsname]["id"]):
+                            _check(con.del_ds(dsid), "del_ds")
+                        ds_ops.append(Operation("delete_datasource", dsname, delete_datasource, org=name))
+            ops += ds_ops
+            matched = {}
+            desired = {}
+            push_ops = []
+            titles = c.get("titles", {})
+            for d in o.get("dashboards", []):
+                slug, dash = self._get_dashboard(d)
+                desired[dash.get("title")] = True
+                current = None
+                server = self._find_dashboard(dash, c)
+                if server != None:
+                    matched[server] = True
+                    slug = server
+                    current = c["dashboards"].get(server)
+                if not self._dashboard_differs(dash, current):
+                    continue
+                dash = dict(dash)
+                dash["id"] = None
+                if current:
+                    dash["id"] = current.get("id")
+                def push_dashboard(dash=dash):
+                    res = con.add_dashboard(json.dumps({"dashboard" : dash, "overwrite" : True}))
+                    if not isinstance(res, dict) or res.get("status") != "success":
+                        raise ValueError("add_dashboard failed")
+                op = Operation("push_dashboard", slug, push_dashboard, deps=org_deps + ds_ops, org=name)
+                push_ops.append((op, _slug_key(dash.get("title", ""))))
+            ops += [op for op, key in push_ops]
+            if self.prune:
+                for slug in sorted(c["dashboards"].keys()):
+                    # Never delete a dashboard that is part of the desired state
+                    if matched.has_key(slug) or desired.has_key(titles.get(slug)):
+                        continue
+                    def delete_dashboard(slug=slug):
+                        _check(con.del_dashboard(slug), "del_dashboard")
+                    op = Operation("delete_dashboard", slug, delete_dashboard, deps=org_deps, org=name)
+                    ops.append(op)
+                    # A pushed dashboard can get the slug of the deleted one, delete it first
+                    for push, key in push_ops:
+                        if key == _slug_key(slug):
+                            push.deps.append(op)
+        self.operations = ops
+        return ops
+    def get_request_estimate(self):
+        """
+        Estimated number of HTTP requests to apply the current plan including organization switches
+        """
+        n = sum([op.requests for op in self.operations])
+        orgs = {}
+        for op in self.operations:
+            if op.org:
+                orgs[op.org] = True
+        return n + len(orgs)
+    def print_plan(self):
+        print "Plan with %d operations after %d read requests:" % (len(self.operations), self.reads,)
+        for op in self.operations:
+            s = "\t%s" % (str(op),)
+            if len(op.deps) > 0:
+                s += " after %s" % (", ".join([str(d) for d in op.deps]),)
+            print s
+        print "Estimated requests: %d" % (self.get_request_estimate(),)
+    def _execute(self, org=None):
+        cond = threading.Condition()
+        ctx = {"running" : 0, "org_running" : 0, "org" : org}
+        remaining = list(self.operations)
+        def work(op):
+            try:
+                op.func()
+                op.status = "done"
+            except Exception as e:
+                op.status = "failed"
+                op.error = "%s: %s" % (e.__class__.__name__, e,)
+            cond.acquire()
+            ctx["running"] -= 1
+            if op.org:
+                ctx["org_running"] -= 1
+            cond.notify()
+            cond.release()
+        cond.acquire()
+        try:
+            while len(remaining) > 0 or ctx["running"] > 0:
+                progressed = False
+                # Prefer operations that do not require switching the active organization
+                candidates = sorted(remaining, key=lambda op: (op.org not in (None, ctx["org"]),
+                                                              self.operations.index(op)))
+                for op in candidates:
+                    if ctx["running"] >= self.workers:
+                        break
+                    states = [d.status for d in op.deps]
+                    if "failed" in states or "skipped" in states:
+                        op.status = "skipped"
+                        remaining.remove(op)
+                        progressed = True
+                        continue
+                    if len([s for s in states if s != "done"]) > 0:
+                        continue
+                    if op.org and op.org != ctx["org"]:
+                        if ctx["org_running"] > 0:
+                            continue
+                        if not self.con.change_active_org(self.ids.get("org:%s" % (op.org,))):
+                            op.status = "failed"
+                            op.error = "Cannot switch to organization %s" % (op.org,)
+                            remaining.remove(op)
+                            progressed = True
+                            continue
+                        ctx["org"] = op.org
+                    if op.org:
+                        ctx["org_running"] += 1
+                    ctx["running"] += 1
+                    remaining.remove(op)
+                    op.status = "running"
+                    t = threading.Thread(target=work, args=(op,))
+                    t.daemon = True
+                    t.start()
+                    progressed = True
+                if progressed:
+                    continue
+                if ctx["running"] == 0:
+                    for op in remaining:
+                        op.status = "skipped"
+                    break
+                cond.wait()
+        finally:
+            cond.release()
+    def apply(self, dry_run=False):
+        """
+        Plan and execute the operations. Operations run in parallel as soon as their
+        dependencies are done. Operations on the active organization only run in parallel
+        with operations of the same organization.
+
+        :param dry_run: Only print the plan and the estimated number of requests
+        :return dict with the number of planned and done operations, the failed and skipped ones
+        """
+        if not self.con.is_connected():
+            print "Connection not established"
+            return {}
+        start = time.time()
+        self.plan()
+        if dry_run:
+            self.print_plan()
+            return {"planned" : len(self.operations), "done" : 0, "failed" : {}, "skipped" : [],
+                    "requests" : self.get_request_estimate(), "duration" : time.time() - start}
+        active = self.con.get_current_org()
+        org = None
+        for key in self.ids.keys():
+            if key.startswith("org:") and self.ids[key] == active.get("id"):
+                org = key[4:]
+        self._execute(org=org)
+        if active.has_key("id"):
+            self.con.change_active_org(active["id"])
+        return {"planned" : len(self.operations),
+                "done" : len([op for op in self.operations if op.status == "done"]),
+                "failed" : dict([(str(op), op.error) for op in self.operations if op.status == "failed"]),
+                "skipped" : [str(op) for op in self.operations if op.status == "skipped"],
+                "requests" : self.get_request_estimate(), "duration" : time.time() - start}
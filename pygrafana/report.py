@@ -0,0 +1,205 @@
+#!/usr/bin/python
+
+import heapq
+import json
+
+import dashboard
+
+
+_encode_string = json.encoder.encode_basestring_ascii
+
+# Target members that do not change the query
+_query_ignore = frozenset(["refId", "alias", "hide"])
+
+
+def _query_key(t):
+    """
+    Returns a key equal for targets with the same query. The members are sorted, their
+    values are encoded as they are, which is faster than the canonical encoding and equal
+    for targets created by the same code.
+    """
+    return tuple(sorted([(k, dashboard._encoder.encode(v)) for k, v in t.iteritems() if k not in _query_ignore]))
+
+def _format_path(stack):
+    path = ""
+    for s in stack:
+        if isinstance(s, int):
+            path += "[%d]" % (s,)
+        elif path:
+            path += "." + s
+        else:
+            path = s
+    return path
+
+
+class Analyzer(object):
+    """
+    Reports the size and complexity of dashboards. The sizes are the bytes of the JSON
+    encoding sent by Connection.add_dashboard() (json.dumps() with the default separators).
+    They are summed up in one pass over the document: every member of the panels and of the
+    dashboard besides the rows is encoded once, the sizes of the panels, rows and the
+    dashboard are the sums of their members. Only the members of the targets are encoded
+    a second time to find duplicate queries.
+    """
+    def __init__(self, version=None, largest=10):
+        """
+        Construct a new Analyzer object
+
+        :param version: Grafana version string used for Dashboard objects, defaults to the version set with set_grafana_version()
+        :param largest: Number of largest subtrees in the report
+        """
+        self.version = version
+        self.largest = largest
+    def _load(self, d):
+        if isinstance(d, dashboard.Dashboard):
+            return d._get_shared(self.version)["dashboard"]
+        d = dashboard._load(d)
+        if isinstance(d, dict) and isinstance(d.get("dashboard"), dict):
+            d = d["dashboard"]
+        return d
+    def analyze(self, d):
+        """
+        Analyze a dashboard
+
+        :param d: Dashboard object, dictionary or JSON string, with or without the API wrapper
+        :return dict with the total 'bytes', the 'sizes' of the rows, panels and templating as path -> bytes, the 'counts' of rows, panels, targets, templates and series_overrides, the 'largest' objects and values below the top level as list of (path, bytes) and the 'duplicates' as list of lists of paths of targets with equal queries
+        """
+        d = self._load(d)
+        res = {"bytes" : 0, "sizes" : {}, "largest" : [], "duplicates" : [],
+               "counts" : {"rows" : 0, "panels" : 0, "targets" : 0, "templates" : 0, "series_overrides" : 0}}
+        queries = {}
+        heap = []
+        res["bytes"] = self._walk(d, [], res, queries, heap)
+        res["largest"] = [(path, size) for size, path in sorted(heap, reverse=True)]
+        for paths in queries.itervalues():
+            if len(paths) > 1:
+                res["duplicates"].append(paths)
+        res["duplicates"].sort()
+        return res
+    def _walk(self, o, stack, res, queries, heap):
+        """
+        Returns the encoded size of o. Recurses into the dashboard, the rows and the panels
+        and encodes all other values in one piece, the members of the panels are the
+        smallest reported subtrees.
+        """
+        node = self._is_node(stack)
+        if node and isinstance(o, dict):
+            size = 2 + 2 * max(len(o) - 1, 0)
+            for k, v in o.iteritems():
+                stack.append(k)
+                size += len(_encode_string(k)) + 2 + self._walk(v, stack, res, queries, heap)
+                stack.pop()
+        elif node and isinstance(o, list):
+            size = 2 + 2 * max(len(o) - 1, 0)
+            for i, v in enumerate(o):
+                stack.append(i)
+                size += self._walk(v, stack, res, queries, heap)
+                stack.pop()
+        elif isinstance(o, basestring):
+            size = len(_encode_string(o))
+        else:
+            size = len(dashboard._encoder.encode(o))
+        self._record(o, stack, size, res, queries)
+        # The rows and panels lists are left out, they are as large as the row or dashboard
+        if len(stack) > 1 and self.largest > 0 and not (node and isinstance(o, list)):
+            if len(heap) < self.largest:
+                heapq.heappush(heap, (size, _format_path(stack)))
+            elif size > heap[0][0]:
+                heapq.heapreplace(heap, (size, _format_path(stack)))
+        return size
+    def _is_node(self, stack):
+        n = len(stack)
+        if n == 0:
+            return True
+        return stack[0] == "rows" and (n < 3 or (n < 5 and stack[2] == "panels"))
+    def _record(self, o, stack, size, res, queries):
+        n = len(stack)
+        if n == 1 and stack[0] == "templating":
+            res["sizes"]["templating"] = size
+            if isinstance(o, dict) and isinstance(o.get("list"), list):
+                res["counts"]["templates"] = len(o["list"])
+        if n < 2 or stack[0] != "rows":
+            return
+        if n == 2:
+            res["counts"]["rows"] += 1
+            res["sizes"][_format_path(stack)] = size
+        elif n == 4 and stack[2] == "panels":
+            res["counts"]["panels"] += 1
+            res["sizes"][_format_path(stack)] = size
+        elif n == 5 and stack[2] == "panels" and isinstance(o, list):
+            if stack[4] == "targets":
+                res["counts"]["targets"] += len(o)
+                for i, t in enumerate(o):
+                    if isinstance(t, dict) and not t.get("hide"):
+                        key = _query_key(t)
+                        queries.setdefault(key, []).append("%s[%d]" % (_format_path(stack), i,))
+            elif stack[4] == "seriesOverrides":
+                res["counts"]["series_overrides"] += len(o)
+
+
+class Budget(object):
+    """
+    Size and complexity limits of a dashboard, e.g. for CI checks before uploading
+    dashboards with Connection.add_dashboard(budget=...). Limits set to None are not checked.
+    """
+    def __init__(self, max_bytes=None, max_row_bytes=None, max_panel_bytes=None,
+                       max_panels=None, max_targets=None, max_duplicates=None, version=None):
+        """
+        Construct a new Budget object
+
+        :param max_bytes: Maximal size of the dashboard in bytes
+        :param max_row_bytes: Maximal size of a row in bytes
+        :param max_panel_bytes: Maximal size of a panel in bytes
+        :param max_panels: Maximal number of panels
+        :param max_targets: Maximal number of targets
+        :param max_duplicates: Maximal number of targets repeating the query of another target
+        :param version: Grafana version string used for Dashboard objects
+        """
+        self.max_bytes = max_bytes
+        self.max_row_bytes = max_row_bytes
+        self.max_panel_bytes = max_panel_bytes
+        self.max_panels = max_panels
+        self.max_targets = max_targets
+        self.max_duplicates = max_duplicates
+        self.analyzer = Analyzer(version, largest=0)
+    def check(self, d):
+        """
+        Check a dashboard against the budget
+
+        :param d: Dashboard object, dictionary or JSON string, with or without the API wrapper
+        :return list of (path, message), empty if the dashboard is within the budget
+        """
+        return self.check_report(self.analyzer.analyze(d))
+    def check_report(self, res):
+        """
+        Check the result of Analyzer.analyze() against the budget
+        """
+        errors = []
+        if self.max_bytes != None and res["bytes"] > self.max_bytes:
+            errors.append(("", "Size %d bytes exceeds %d bytes" % (res["bytes"], self.max_bytes,)))
+        for path, size in sorted(res["sizes"].iteritems()):
+            if path.endswith("]"):
+                if ".panels[" in path:
+                    limit = self.max_panel_bytes
+                else:
+                    limit = self.max_row_bytes
+                if limit != None and size > limit:
+                    errors.append((path, "Size %d bytes exceeds %d bytes" % (size, limit,)))
+        if self.max_panels != None and res["counts"]["panels"] > self.max_panels:
+            errors.append(("rows", "%d panels exceed %d panels" % (res["counts"]["panels"], self.max_panels,)))
+        if self.max_targets != None and res["counts"]["targets"] > self.max_targets:
+            errors.append(("rows", "%d targets exceed %d targets" % (res["counts"]["targets"], self.max_targets,)))
+        if self.max_duplicates != None:
+            duplicates = sum([len(paths) - 1 for paths in res["duplicates"]])
+            if duplicates > self.max_duplicates:
+                errors.append(("rows", "%d duplicate targets exceed %d, e.g. %s" % (duplicates, self.max_duplicates, ", ".join(res["duplicates"][0]),)))
+        return errors
+    def is_within(self, d):
+        return len(self.check(d)) == 0
+
+
+def analyze(d, version=None, largest=10):
+    """
+    Report the size and complexity of a dashboard, see Analyzer.analyze()
+    """
+    return Analyzer(version, largest).analyze(d)
@@ -0,0 +1,360 @@
+#!/usr/bin/python
+
+import collections
+import json
+import multiprocessing
+import tarfile
+import time
+import StringIO
+
+from parallel import imap_bounded
+
+
+class Step(object):
+    """
+    Transformation of dashboard dictionaries to a schema version
+
+    The function gets the dashboard dictionary, changes it in place and returns whether it
+    changed anything. Functions have to be defined at module level to run in worker processes.
+    """
+    def __init__(self, version, name, func):
+        """
+        Construct a new Step object
+
+        :param version: Schema version of the dashboards after the step
+        :param name: Name of the step used in the reports
+        :param func: Function changing a dashboard dictionary in place, returns True/False
+        """
+        self.version = version
+        self.name = name
+        self.func = func
+    def apply(self, d):
+        return bool(self.func(d))
+    def __str__(self):
+        return "Step(%d, %s)" % (self.version, self.name,)
+    def __repr__(self):
+        return self.__str__()
+
+
+def _panels(d, typ=None):
+    for r in d.get("rows", []):
+        for p in r.get("panels", []):
+            if typ == None or p.get("type") == typ:
+                yield p
+
+def _influx_targets(d):
+    for p in _panels(d):
+        for t in p.get("targets", []):
+            if t.get("dsType", "influxdb") == "influxdb" and not t.has_key("target"):
+                yield t
+
+def nest_select(d):
+    """
+    Rewrites InfluxDB targets of the Grafana 2.x query editor: 'fields' and 'groupByTags'
+    become 'select' and 'groupBy' and flat select lists become one list per field
+    """
+    changed = False
+    for t in _influx_targets(d):
+        if t.has_key("fields"):
+            select = []
+            for f in t.pop("fields"):
+                select.append([{"type" : "field", "params" : [f.get("name", "value")]},
+                               {"type" : f.get("func", "mean"), "params" : []}])
+            t["select"] = select
+            changed = True
+        if t.has_key("groupByTags") or (t.has_key("interval") and not t.has_key("groupBy")):
+            groupBy = [{"type" : "time", "params" : [t.pop("interval", None) or "$interval"]}]
+            for tag in t.pop("groupByTags", []):
+                groupBy.append({"type" : "tag", "params" : [tag]})
+            if t.has_key("fill"):
+                groupBy.append({"type" : "fill", "params" : [t.pop("fill")]})
+            t["groupBy"] = t.get("groupBy", []) + groupBy
+            changed = True
+        select = t.get("select")
+        if isinstance(select, list) and len(select) > 0 and isinstance(select[0], dict):
+            t["select"] = [select]
+            changed = True
+    return changed
+
+def rename_axes(d):
+    """
+    Replaces the 'x-axis' and 'y-axis' flags of graph panels by 'xaxis' and 'yaxes'
+    """
+    changed = False
+    for p in _panels(d, "graph"):
+        if p.has_key("x-axis"):
+            p["xaxis"] = {"show" : p.pop("x-axis")}
+            changed = True
+        if p.has_key("y-axis"):
+            show = p.pop("y-axis")
+            if not p.has_key("yaxes"):
+                p["yaxes"] = [{}, {}]
+            for axis in p["yaxes"]:
+                axis["show"] = show
+            changed = True
+    return changed
+
+def grid_to_yaxes(d):
+    """
+    Moves the y-axis limits, log bases, formats and labels of graph panels from 'grid',
+    'y_formats' and the label settings into 'yaxes'
+    """
+    changed = False
+    for p in _panels(d, "graph"):
+        if not p.has_key("grid") and not p.has_key("y_formats") and \
+           not p.has_key("leftYAxisLabel") and not p.has_key("rightYAxisLabel"):
+            continue
+        grid = p.get("grid", {})
+        formats = p.pop("y_formats", None) or ["short", "short"]
+        yaxes = p.get("yaxes", [])
+        while len(yaxes) < 2:
+            yaxes.append({})
+        for i, side in enumerate(("left", "right")):
+            axis = yaxes[i]
+            axis.setdefault("show", True)
+            axis["logBase"] = grid.pop(side + "LogBase", axis.get("logBase", 1))
+            axis["max"] = grid.pop(side + "Max", axis.get("max"))
+            axis["min"] = grid.pop(side + "Min", axis.get("min"))
+            axis["format"] = formats[i]
+            axis["label"] = p.pop(side + "YAxisLabel", axis.get("label"))
+        p["yaxes"] = yaxes
+        changed = True
+    return changed
+
+def influx_policy(d):
+    """
+    Grafana 3.x creates InfluxDB queries itself: generated queries are removed and the
+    retention policy is set
+    """
+    changed = False
+    for t in _influx_targets(d):
+        if t.has_key("query") and not t.get("rawQuery"):
+            del t["query"]
+            changed = True
+        if not t.has_key("policy"):
+            t["policy"] = "default"
+            changed = True
+    return changed
+
+def tooltip_defaults(d):
+    """
+    Adds the tooltip settings of Grafana 3.x graph panels
+    """
+    changed = False
+    for p in _panels(d, "graph"):
+        tooltip = p.get("tooltip")
+        if isinstance(tooltip, dict):
+            if not tooltip.has_key("sort"):
+                tooltip["sort"] = 0
+                changed = True
+            if not tooltip.has_key("msResolution"):
+                tooltip["msResolution"] = True
+                changed = True
+    return changed
+
+# Steps from the Grafana 2.x (schema version 8) to the 3.x layout (12) of the dashboard module
+default_steps = [Step(9, "nest_select", nest_select),
+                 Step(10, "rename_axes", rename_axes),
+                 Step(11, "grid_to_yaxes", grid_to_yaxes),
+                 Step(12, "influx_policy", influx_policy),
+                 Step(12, "tooltip_defaults", tooltip_defaults)]
+
+
+class Migrator(object):
+    """
+    Migrates dashboard dictionaries by applying the steps between their schemaVersion and
+    the target version in order. Every applied step sets the schemaVersion of the dashboard.
+    """
+    def __init__(self, steps=None, target=12):
+        """
+        Construct a new Migrator object
+
+        :param steps: List of Step objects, defaults to default_steps
+        :param target: Schema version after the migration
+        """
+        self.steps = []
+        if steps == None:
+            steps = default_steps
+        for s in steps:
+            self.add_step(s)
+        self.target = target
+    def add_step(self, step):
+        """
+        Add a step after all steps with the same or a lower version
+
+        :param step: Step object
+        :return True/False
+        """
+        if not isinstance(step, Step):
+            return False
+        i = len(self.steps)
+        while i > 0 and self.steps[i-1].version > step.version:
+            i -= 1
+        self.steps.insert(i, step)
+        return True
+    def set_target(self, target):
+        if isinstance(target, int):
+            self.target = target
+            return True
+        return False
+    def get_steps(self, version):
+        """
+        Returns the steps applied to a dashboard with the given schemaVersion
+        """
+        return [s for s in self.steps if version < s.version <= self.target]
+    def migrate(self, d):
+        """
+        Migrate a dashboard dictionary in place
+
+        :param d: Dashboard dictionary or a document with the dashboard in 'dashboard'
+        :return list with the names of the steps that changed the dashboard
+        """
+        if d.has_key("dashboard") and isinstance(d["dashboard"], dict):
+            d = d["dashboard"]
+        version = d.get("schemaVersion", 0)
+        applied = []
+        for s in self.get_steps(version):
+            if s.apply(d):
+                applied.append(s.name)
+            d["schemaVersion"] = s.version
+        if version < self.target:
+            d["schemaVersion"] = self.target
+        return applied
+    def migrate_json(self, s):
+        """
+        Migrate a dashboard JSON document
+
+        :param s: JSON string
+        :return tuple with the migrated JSON string and the names of the applied steps
+        """
+        d = json.loads(s)
+        applied = self.migrate(d)
+        return json.dumps(d), applied
+    def __str__(self):
+        return "Migrator(target=%d, steps=%s)" % (self.target, str(self.steps),)
+    def __repr__(self):
+        return self.__str__()
+
+
+_worker_migrator = None
+
+def _init_worker(migrator):
+    global _worker_migrator
+    _worker_migrator = migrator
+
+def _migrate_job(job):
+    """
+    Runs in the worker processes: migrates one JSON document
+    """
+    name, data = job
+    start = time.time()
+    res = {"name" : name, "status" : "error", "result" : None, "steps" : [],
+           "error" : None, "duration" : 0.0}
+    try:
+        res["result"], res["steps"] = _worker_migrator.migrate_json(data)
+        res["status"] = "ok"
+    except Exception as e:
+        res["error"] = "%s: %s" % (e.__class__.__name__, e,)
+    res["duration"] = time.time() - start
+    return res
+
+def migrate_many(docs, migrator=None, processes=None, chunksize=16):
+    """
+    Migrates JSON documents in a pool of processes. The documents are read in chunks as the
+    results are consumed, see parallel.imap_bounded().
+
+    :param docs: Iterable of (name, JSON string), read in chunks while the results are consumed
+    :param migrator: Migrator object, defaults to Migrator() with the default steps
+    :param processes: Number of worker processes, defaults to the number of CPUs
+    :param chunksize: Number of documents sent to a worker at once
+    :return generator of dicts {'name': ..., 'status': 'ok'/'error', 'result': JSON string, 'steps': [...], 'error': ..., 'duration': ...} in input order
+    """
+    if migrator == None:
+        migrator = Migrator()
+    if not processes:
+        processes = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes, _init_worker, (migrator,))
+    try:
+        for res in imap_bounded(pool, _migrate_job, docs, processes, chunksize):
+            yield res
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+def _read_archive(tar, others):
+    for member in tar:
+        f = None
+        if member.isfile():
+            f = tar.extractfile(member)
+        if f and member.name.endswith(".json"):
+            yield member.name, f.read()
+        else:
+            data = None
+            if f:
+                data = f.read()
+            others.append((member, data))
+
+def migrate_archive(src, dst, migrator=None, processes=None, chunksize=16):
+    """
+    Migrates all dashboards in a tar archive like the ones written by backup.Backup into a
+    new archive. The source is read as a stream and the dashboards are migrated in a pool
+    of processes, members that are no JSON documents are copied. Dashboards that fail are
+    copied unchanged and reported.
+
+    :param src: Path of the source archive (any compression supported by tarfile)
+    :param dst: Path of the destination archive, compressed with gzip if it ends with .gz
+    :param migrator: Migrator object, defaults to Migrator() with the default steps
+    :param processes: Number of worker processes, defaults to the number of CPUs
+    :param chunksize: Number of documents sent to a worker at once
+    :return dict with the number of dashboards, migrated, unchanged and failed ones, the failures, bytes, duration and dashboards per second
+    """
+    start = time.time()
+    mode = "w"
+    if dst.endswith(".gz"):
+        mode = "w:gz"
+    stats = {"archive" : dst, "dashboards" : 0, "migrated" : 0, "unchanged" : 0, "failed" : 0,
+             "errors" : {}, "steps" : {}, "bytes" : 0}
+    others = []
+    inp = tarfile.open(src, "r|*")
+    out = tarfile.open(dst, mode)
+    try:
+        docs = _read_archive(inp, others)
+        pending = collections.deque()
+        def source():
+            for name, data in docs:
+                pending.append(data)
+                yield name, data
+        for res in migrate_many(source(), migrator, processes, chunksize):
+            name = res["name"]
+            data = pending.popleft()
+            stats["dashboards"] += 1
+            stats["bytes"] += len(data)
+            if res["status"] != "ok":
+                stats["failed"] += 1
+                stats["errors"][name] = res["error"]
+            elif len(res["steps"]) > 0:
+                stats["migrated"] += 1
+                data = res["result"]
+                for s in res["steps"]:
+                    stats["steps"][s] = stats["steps"].get(s, 0) + 1
+            else:
+                stats["unchanged"] += 1
+                data = res["result"]
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = time.time()
+            out.addfile(info, StringIO.StringIO(data))
+        for member, data in others:
+            if data != None:
+                out.addfile(member, StringIO.StringIO(data))
+            else:
+                out.addfile(member)
+    finally:
+        out.close()
+        inp.close()
+    stats["duration"] = time.time() - start
+    stats["rate"] = 0.0
+    if stats["duration"] > 0:
+        stats["rate"] = stats["dashboards"] / stats["duration"]
+    return stats
@@ -0,0 +1,193 @@
+#!/usr/bin/python
+
+from dashboard import Dashboard, Row, RawPanel, _unwrap
+
+
+def get_panel_cost(p):
+    """
+    Returns the number of targets of a panel, every target is one query when the panel is loaded
+
+    :param p: Panel object
+    :return number of targets
+    """
+    p = _unwrap(p)
+    if isinstance(p, RawPanel):
+        targets = p.settings.get("targets", [])
+    else:
+        targets = getattr(p, "targets", [])
+    if isinstance(targets, list):
+        return len(targets)
+    return 0
+
+def get_template_cost(d):
+    """
+    Returns the number of queries of the template variables when a dashboard is loaded
+    """
+    return len([t for t in d.templates if t.type == "query" and t.refresh])
+
+
+class Splitter(object):
+    """
+    Partitions the rows of large dashboards into several dashboards within a budget of panels,
+    targets and estimated queries per dashboard. Every part gets copies of the templates and
+    links to all parts.
+
+    The split is deterministic: the rows are filled into the parts in their order and part n
+    always gets the same title and slug, so updates overwrite the same dashboards. The first
+    part keeps the title of the dashboard, so existing links still work. Rows exceeding the budget on their
+    own are split into rows with the same title. A panel exceeding the budget on its own, or
+    template queries exceeding max_queries, cannot be split further: their parts are over
+    budget, see check().
+    """
+    def __init__(self, max_panels=None, max_targets=None, max_queries=None,
+                       title_format="%(title)s %(part)d", link_parts=True):
+        """
+        Construct a new Splitter object
+
+        :param max_panels: Maximal number of panels per dashboard or None
+        :param max_targets: Maximal number of targets per dashboard or None
+        :param max_queries: Maximal number of queries when loading a dashboard (targets and template queries) or None
+        :param title_format: Title of the parts after the first one, with %(title)s and %(part)d
+        :param link_parts: Add links to all parts to every part
+        """
+        self.max_panels = max_panels
+        self.max_targets = max_targets
+        self.max_queries = max_queries
+        self.title_format = title_format
+        self.link_parts = link_parts
+    def _fits(self, panels, targets, queries):
+        if self.max_panels != None and panels > self.max_panels:
+            return False
+        if self.max_targets != None and targets > self.max_targets:
+            return False
+        if self.max_queries != None and queries > self.max_queries:
+            return False
+        return True
+    def _get_units(self, d, fixed):
+        """
+        Returns the rows as list of (row, panels, panel count, target count). Rows exceeding
+        the budget are split into several units.
+        """
+        units = []
+        for r in d.rows:
+            r = _unwrap(r)
+            panels = []
+            targets = 0
+            for p in r.panels:
+                cost = get_panel_cost(p)
+                if len(panels) > 0 and not self._fits(len(panels) + 1, targets + cost, fixed + targets + cost):
+                    units.append((r, panels, len(panels), targets))
+                    panels = []
+                    targets = 0
+                panels.append(p)
+                targets += cost
+            units.append((r, panels, len(panels), targets))
+        return units
+    def get_partition(self, d):
+        """
+        Returns the partition of the rows without creating the dashboards
+
+        :param d: Dashboard object
+        :return list of parts, each a list of (row, panels)
+        """
+        fixed = get_template_cost(d)
+        parts = [[]]
+        panels = 0
+        targets = 0
+        for r, ps, n, t in self._get_units(d, fixed):
+            if len(parts[-1]) > 0 and not self._fits(panels + n, targets + t, fixed + targets + t):
+                parts.append([])
+                panels = 0
+                targets = 0
+            parts[-1].append((r, ps))
+            panels += n
+            targets += t
+        return parts
+    def _check_part(self, rows, fixed):
+        panels = sum([len(ps) for r, ps in rows])
+        targets = sum([get_panel_cost(p) for r, ps in rows for p in ps])
+        errors = []
+        if self.max_panels != None and panels > self.max_panels:
+            errors.append("%d panels exceed %d panels" % (panels, self.max_panels,))
+        if self.max_targets != None and targets > self.max_targets:
+            errors.append("%d targets exceed %d targets" % (targets, self.max_targets,))
+        if self.max_queries != None and fixed + targets > self.max_queries:
+            errors.append("%d queries (%d of templates) exceed %d queries" % (fixed + targets, fixed, self.max_queries,))
+        return errors
+    def check(self, d):
+        """
+        Returns the parts of the partition that exceed the budget. This happens if a single
+        panel has more targets than max_targets or max_queries allow or the template queries
+        alone exceed max_queries.
+
+        :param d: Dashboard object
+        :return list of (part number, message), empty if all parts are within the budget
+        """
+        d = _unwrap(d)
+        fixed = get_template_cost(d)
+        errors = []
+        for i, rows in enumerate(self.get_partition(d)):
+            for e in self._check_part(rows, fixed):
+                titles = ", ".join(["'%s'" % (r.title,) for r, ps in rows])
+                errors.append((i+1, "Rows %s: %s" % (titles, e,)))
+        return errors
+    def get_title(self, d, part):
+        if part == 1:
+            return d.title
+        return self.title_format % {"title" : d.title, "part" : part}
+    def split(self, d):
+        """
+        Split a dashboard. Parts that cannot meet the budget are reported with a warning,
+        see check().
+
+        :param d: Dashboard object
+        :return list of Dashboard objects, [d] if the dashboard fits into the budget
+        """
+        d = _unwrap(d)
+        for part, e in self.check(d):
+            print "WARNING: Part %d of dashboard '%s' exceeds the budget: %s" % (part, d.title, e,)
+        parts = self.get_partition(d)
+        if len(parts) == 1:
+            return [d]
+        titles = [self.get_title(d, i+1) for i in range(len(parts))]
+        out = []
+        for title, rows in zip(titles, parts):
+            part = Dashboard(title, style=d.style, links=d.links, tags=d.tags,
+                             hideControls=d.hideControls, editable=d.editable,
+                             timepicker=d.timepicker.clone(), refresh=d.refresh,
+                             sharedCrosshair=d.sharedCrosshair, timezone=d.timezone,
+                             schemaVersion=d.schemaVersion, overwrite=d.overwrite,
+                             annotations=d.annotations, startTime=d.startTime,
+                             endTime=d.endTime)
+            if len(out) == 0:
+                part.id = d.id
+            for t in d.templates:
+                part.add_template(_unwrap(t))
+            for r, panels in rows:
+                if len(panels) == len(r.panels):
+                    part.add_row(r)
+                else:
+                    x = Row(r.title, editable=r.editable, collapse=r.collapse, height=r.height,
+                            showTitle=r.showTitle, repeat=r.repeat)
+                    for p in panels:
+                        x.add_panel(_unwrap(p))
+                    part.add_row(x)
+            out.append(part)
+        if self.link_parts:
+            links = []
+            for part in out:
+                links.append({"type" : "link", "title" : part.title,
+                              "url" : "/dashboard/db/%s" % (part.get_slug(),),
+                              "keepTime" : True, "includeVars" : True, "asDropdown" : False,
+                              "icon" : "dashboard", "tags" : [], "targetBlank" : False})
+            for part in out:
+                part.links = part.links + links
+        return out
+
+def split(d, max_panels=None, max_targets=None, max_queries=None):
+    """
+    Split a dashboard into parts within the budget, see Splitter
+
+    :return list of Dashboard objects
+    """
+    return Splitter(max_panels, max_targets, max_queries).split(d)
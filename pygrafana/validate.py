@@ -0,0 +1,280 @@
+#!/usr/bin/python
+
+import re
+
+import dashboard
+from dashboard import Dashboard, Target, Grid, GraphPanel, SingleStat, Template, check_color, check_timerange
+
+
+_refresh_pattern = re.compile(r"\d+[smhdwMy]$")
+# Template variables in queries: $name or [[name]]
+_variable_pattern = re.compile(r"\$(\w+)|\[\[(\w+)\]\]")
+_builtin_variables = frozenset(["timeFilter", "interval", "__interval", "__interval_ms"])
+_number_types = (int, long, float)
+
+
+class Validator(object):
+    """
+    Validates whole dashboards in one pass and collects all errors as (path, message) with
+    paths like 'rows[1].panels[0].targets[2].measurement'. Dashboard objects are serialized
+    for the given Grafana version, dictionaries and JSON documents are checked as they are.
+
+    Panel checks are looked up by panel type in panel_checks, add functions
+    func(validator, panel, path, errors) with add_panel_check() for other panel types.
+    """
+    def __init__(self, version=None, check_variables=True):
+        """
+        Construct a new Validator object
+
+        :param version: Grafana version string used for Dashboard objects, defaults to the version set with set_grafana_version()
+        :param check_variables: Report template variables used in queries that are not defined
+        """
+        self.version = version
+        self.check_variables = check_variables
+        self.panel_checks = {"graph" : Validator.check_graph,
+                             "singlestat" : Validator.check_singlestat}
+    def add_panel_check(self, typ, func):
+        if isinstance(typ, str) and callable(func):
+            self.panel_checks[typ] = func
+            return True
+        return False
+    def _load(self, d):
+        if isinstance(d, Dashboard):
+            d = d._get_shared(self.version)
+        elif hasattr(d, "read"):
+            d = dashboard._load(d.read())
+        elif not isinstance(d, dict):
+            d = dashboard._load(d)
+        if isinstance(d, dict) and isinstance(d.get("dashboard"), dict):
+            d = d["dashboard"]
+        return d
+    def validate(self, d):
+        """
+        Validate a dashboard
+
+        :param d: Dashboard object, dictionary, JSON string or file-like object, with or without the API wrapper
+        :return list of (path, message), empty if the dashboard is valid
+        """
+        errors = []
+        try:
+            d = self._load(d)
+        except ValueError as e:
+            return [("", "Invalid JSON document: %s" % (e,))]
+        if not isinstance(d, dict):
+            return [("", "Dashboard must be an object")]
+        self.check_dashboard(d, errors)
+        return errors
+    def is_valid(self, d):
+        return len(self.validate(d)) == 0
+    def validate_many(self, dashboards):
+        """
+        Validate a batch of dashboards, e.g. before uploading them
+
+        :param dashboards: Iterable of dashboards as accepted by validate()
+        :return dict index -> list of (path, message) for the invalid dashboards
+        """
+        failed = {}
+        for i, d in enumerate(dashboards):
+            errors = self.validate(d)
+            if errors:
+                failed[i] = errors
+        return failed
+    def check_dashboard(self, d, errors):
+        title = d.get("title")
+        if not isinstance(title, basestring) or not title:
+            errors.append(("title", "Title must be a non-empty string"))
+        style = d.get("style", "dark")
+        if style not in Dashboard.validStyles:
+            errors.append(("style", "Invalid style %s" % (style,)))
+        time = d.get("time", {})
+        if isinstance(time, dict):
+            for k in ("from", "to"):
+                if time.has_key(k) and not check_timerange(_str(time[k])):
+                    errors.append(("time.%s" % (k,), "Invalid time %s" % (time[k],)))
+        else:
+            errors.append(("time", "Time must be an object"))
+        refresh = d.get("refresh")
+        if refresh and not (isinstance(refresh, basestring) and _refresh_pattern.match(refresh)):
+            errors.append(("refresh", "Invalid refresh interval %s" % (refresh,)))
+        tags = d.get("tags", [])
+        if not isinstance(tags, list) or not all([isinstance(t, basestring) for t in tags]):
+            errors.append(("tags", "Tags must be a list of strings"))
+        if d.has_key("schemaVersion") and not isinstance(d["schemaVersion"], int):
+            errors.append(("schemaVersion", "Schema version must be an integer"))
+        variables = self.check_templating(d.get("templating", {}), errors)
+        if not self.check_variables:
+            variables = None
+        rows = d.get("rows", [])
+        if not isinstance(rows, list):
+            errors.append(("rows", "Rows must be a list"))
+            return
+        ids = {}
+        for i, r in enumerate(rows):
+            self.check_row(r, "rows[%d]" % (i,), ids, variables, errors)
+    def check_templating(self, templating, errors):
+        """
+        Checks the template list and returns the names of the defined variables
+        """
+        names = set()
+        if not isinstance(templating, dict) or not isinstance(templating.get("list", []), list):
+            errors.append(("templating", "Templating must be an object with a list"))
+            return names
+        for i, t in enumerate(templating.get("list", [])):
+            path = "templating.list[%d]" % (i,)
+            if not isinstance(t, dict):
+                errors.append((path, "Template must be an object"))
+                continue
+            name = t.get("name")
+            if not isinstance(name, basestring) or not name:
+                errors.append((path + ".name", "Name must be a non-empty string"))
+            elif name in names:
+                errors.append((path + ".name", "Duplicate template name %s" % (name,)))
+            else:
+                names.add(name)
+            typ = t.get("type", "query")
+            if typ not in Template.validTypes:
+                errors.append((path + ".type", "Invalid template type %s" % (typ,)))
+            elif typ == "query" and not t.get("query"):
+                errors.append((path + ".query", "Query templates need a query"))
+        return names
+    def check_row(self, r, path, ids, variables, errors):
+        if not isinstance(r, dict):
+            errors.append((path, "Row must be an object"))
+            return
+        height = r.get("height", "250px")
+        if not dashboard._height_pattern.match(_str(height)):
+            errors.append((path + ".height", "Invalid height %s" % (height,)))
+        panels = r.get("panels", [])
+        if not isinstance(panels, list):
+            errors.append((path + ".panels", "Panels must be a list"))
+            return
+        for i, p in enumerate(panels):
+            self.check_panel(p, "%s.panels[%d]" % (path, i,), ids, variables, errors)
+    def check_panel(self, p, path, ids, variables, errors):
+        if not isinstance(p, dict):
+            errors.append((path, "Panel must be an object"))
+            return
+        pid = p.get("id")
+        if not isinstance(pid, int):
+            errors.append((path + ".id", "Panel id must be an integer"))
+        elif ids.has_key(pid):
+            errors.append((path + ".id", "Duplicate panel id %d, already used by %s" % (pid, ids[pid],)))
+        else:
+            ids[pid] = path
+        typ = p.get("type")
+        if not isinstance(typ, basestring) or not typ:
+            errors.append((path + ".type", "Type must be a non-empty string"))
+        span = p.get("span", 12)
+        if not isinstance(span, _number_types) or not 0 < span <= 12:
+            errors.append((path + ".span", "Span must be a number between 1 and 12"))
+        if self.panel_checks.has_key(typ):
+            self.panel_checks[typ](self, p, path, errors)
+        targets = p.get("targets")
+        if targets == None:
+            return
+        if not isinstance(targets, list):
+            errors.append((path + ".targets", "Targets must be a list"))
+            return
+        refIds = set()
+        for i, t in enumerate(targets):
+            tpath = "%s.targets[%d]" % (path, i,)
+            if not isinstance(t, dict):
+                errors.append((tpath, "Target must be an object"))
+                continue
+            refId = t.get("refId")
+            if refId != None:
+                if refId in refIds:
+                    errors.append((tpath + ".refId", "Duplicate refId %s" % (refId,)))
+                refIds.add(refId)
+            self.check_target(t, tpath, variables, errors)
+    def check_target(self, t, path, variables, errors):
+        queries = []
+        if t.has_key("target"):
+            if not isinstance(t["target"], basestring) or not t["target"]:
+                errors.append((path + ".target", "Target must be a non-empty string"))
+            else:
+                queries.append(("target", t["target"]))
+        elif t.get("rawQuery"):
+            if not isinstance(t.get("query"), basestring) or not t.get("query"):
+                errors.append((path + ".query", "Raw queries need a query"))
+            else:
+                queries.append(("query", t["query"]))
+        else:
+            if not isinstance(t.get("measurement"), basestring) or not t.get("measurement"):
+                errors.append((path + ".measurement", "Measurement must be a non-empty string"))
+            for i, g in enumerate(t.get("groupBy", [])):
+                if not isinstance(g, dict) or g.get("type") not in Target.validGroupBy:
+                    errors.append(("%s.groupBy[%d]" % (path, i,), "Invalid groupBy option"))
+            for i, tag in enumerate(t.get("tags", [])):
+                if not isinstance(tag, dict) or not tag.get("key") or not tag.has_key("value"):
+                    errors.append(("%s.tags[%d]" % (path, i,), "Tags need a key and a value"))
+                else:
+                    queries.append(("tags[%d].value" % (i,), _str(tag["value"])))
+        if variables == None:
+            return
+        for key, query in queries:
+            if "$" not in query and "[[" not in query:
+                continue
+            for m in _variable_pattern.finditer(query):
+                name = m.group(1) or m.group(2)
+                if name not in variables and name not in _builtin_variables:
+                    errors.append(("%s.%s" % (path, key,), "Undefined template variable %s" % (name,)))
+    def check_graph(self, p, path, errors):
+        formats = p.get("y_formats", [])
+        for axis in p.get("yaxes", []):
+            if isinstance(axis, dict):
+                formats = formats + [axis.get("format")]
+                if axis.get("logBase", 1) not in Grid.validLogBases:
+                    errors.append((path + ".yaxes", "Invalid log base %s" % (axis.get("logBase"),)))
+        for f in formats:
+            if f != None and f not in GraphPanel.validYFormats:
+                errors.append((path + ".yaxes", "Invalid y-axis format %s" % (f,)))
+        grid = p.get("grid", {})
+        if isinstance(grid, dict):
+            for k in ("threshold1Color", "threshold2Color"):
+                if grid.get(k) != None and not check_color(_str(grid[k])):
+                    errors.append(("%s.grid.%s" % (path, k,), "Invalid color %s" % (grid[k],)))
+            for side in ("left", "right"):
+                if grid.get(side + "LogBase", 1) not in Grid.validLogBases:
+                    errors.append(("%s.grid.%sLogBase" % (path, side,), "Invalid log base %s" % (grid.get(side + "LogBase"),)))
+        if p.has_key("nullPointMode") and p["nullPointMode"] not in GraphPanel.validNullPointModes:
+            errors.append((path + ".nullPointMode", "Invalid null point mode %s" % (p["nullPointMode"],)))
+        if p.has_key("renderer") and p["renderer"] not in GraphPanel.validRenderer:
+            errors.append((path + ".renderer", "Invalid renderer %s" % (p["renderer"],)))
+        for i, o in enumerate(p.get("seriesOverrides", [])):
+            if not isinstance(o, dict) or not o.get("alias"):
+                errors.append(("%s.seriesOverrides[%d]" % (path, i,), "Series overrides need an alias"))
+    def check_singlestat(self, p, path, errors):
+        for i, c in enumerate(p.get("colors", [])):
+            if not check_color(_str(c)):
+                errors.append(("%s.colors[%d]" % (path, i,), "Invalid color %s" % (c,)))
+        if p.has_key("valueName") and p["valueName"] not in SingleStat.validValueNames:
+            errors.append((path + ".valueName", "Invalid value name %s" % (p["valueName"],)))
+        for k in ("valueFontSize", "prefixFontSize", "postfixFontSize"):
+            if p.has_key(k) and not dashboard._font_size_pattern.match(_str(p[k])):
+                errors.append(("%s.%s" % (path, k,), "Invalid font size %s" % (p[k],)))
+        if p.has_key("format") and p["format"] not in GraphPanel.validYFormats:
+            errors.append((path + ".format", "Invalid format %s" % (p["format"],)))
+
+def _str(v):
+    if isinstance(v, unicode):
+        return v.encode("utf-8")
+    return str(v)
+
+
+_default = Validator()
+
+def validate(d, version=None):
+    """
+    Validate a dashboard with the default checks, see Validator.validate()
+
+    :param d: Dashboard object, dictionary, JSON string or file-like object
+    :param version: Grafana version string used for Dashboard objects
+    :return list of (path, message), empty if the dashboard is valid
+    """
+    if version != None:
+        return Validator(version).validate(d)
+    return _default.validate(d)
+
+def is_valid(d, version=None):
+    return len(validate(d, version)) == 0
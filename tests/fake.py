@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+# In-memory stand-in for pygrafana.api.Connection used by the tests, covers the calls of
+# the backup, mirror and reconcile modules for a single organization. Dashboards get
+# slugs like Grafana 3.x, with runs of punctuation replaced by one '-'
+
+import copy
+import json
+import re
+
+
+class FakeConnection(object):
+    def __init__(self, dashboards=None, grafana_version="3.1.1"):
+        """
+        :param dashboards: Dictionary slug -> dashboard dictionary
+        """
+        self.grafana_version = grafana_version
+        self.dashboards = {}
+        self.updated = {}
+        self.fetched = []
+        self.pushed = []
+        self.deleted = []
+        self.listing_fails = False
+        for slug, d in (dashboards or {}).iteritems():
+            self.dashboards[slug] = copy.deepcopy(d)
+            self.updated[slug] = "t1"
+    def is_connected(self):
+        return True
+    def get_orgs(self):
+        return [{"id" : 1, "name" : "Main Org."}]
+    def get_current_org(self):
+        return {"id" : 1, "name" : "Main Org."}
+    def change_active_org(self, oid):
+        return oid == 1
+    def get_ds(self):
+        return []
+    def get_users(self):
+        return []
+    def get_users_in_oid(self, oid):
+        return []
+    def add_dashboard(self, j):
+        d = json.loads(j)["dashboard"]
+        slug = re.sub(r"[^a-z0-9]+", "-", d["title"].lower()).strip("-")
+        self.pushed.append(slug)
+        if not self.dashboards.has_key(slug):
+            d["id"] = len(self.dashboards) + 100
+        self.dashboards[slug] = d
+        self.updated[slug] = "t1"
+        return {"status" : "success", "slug" : slug}
+    def del_dashboard(self, slug):
+        if not self.dashboards.has_key(slug):
+            return {}
+        self.deleted.append(slug)
+        del self.dashboards[slug]
+        return {"title" : slug}
+    def get_dashboards(self):
+        if self.listing_fails:
+            return {}
+        return [{"id" : d.get("id"), "title" : d["title"], "uri" : "db/" + slug,
+                 "tags" : d.get("tags", []), "type" : "dash-db"}
+                for slug, d in sorted(self.dashboards.iteritems())]
+    def get_dashboard(self, slug):
+        self.fetched.append(slug)
+        if not self.dashboards.has_key(slug):
+            return {}
+        return {"dashboard" : copy.deepcopy(self.dashboards[slug]),
+                "meta" : {"slug" : slug, "updated" : self.updated[slug]}}
+    def edit(self, slug, **kwargs):
+        d = self.dashboards[slug]
+        d.update(kwargs)
+        d["version"] = d.get("version", 0) + 1
+        self.updated[slug] = "t%d" % (d["version"],)
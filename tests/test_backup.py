@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+# Behavior of the incremental backup. Runs without a Grafana instance:
+# python tests/test_backup.py
+
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.backup import Backup
+from fake import FakeConnection
+
+def get_connection():
+    return FakeConnection({"a" : {"id" : 1, "title" : "A", "version" : 1, "rows" : []},
+                           "b" : {"id" : 2, "title" : "B", "version" : 1, "rows" : []}})
+
+def run(f):
+    directory = tempfile.mkdtemp()
+    try:
+        f(directory)
+    finally:
+        shutil.rmtree(directory)
+
+def check_incremental(directory):
+    con = get_connection()
+    b = Backup(con, directory, workers=2)
+    assert b.run()["archived"] == 2
+    stats = b.run()
+    assert stats["archived"] == 0 and stats["archive"] == None
+    con.edit("b", rows=[{"title" : "new"}])
+    stats = b.run()
+    assert stats["archived"] == 1
+    assert b.get_dashboard(1, "b")["dashboard"]["rows"] == [{"title" : "new"}]
+
+def check_failed_listing(directory):
+    con = get_connection()
+    b = Backup(con, directory, workers=2)
+    b.run()
+    con.listing_fails = True
+    stats = b.run()
+    assert stats["removed"] == 0 and len(stats["errors"]) == 1
+    assert sorted(b.load_manifest()["dashboards"].keys()) == ["1/a", "1/b"]
+    con.listing_fails = False
+    assert b.run()["archived"] == 0
+
+def check_removed(directory):
+    con = get_connection()
+    b = Backup(con, directory, workers=2)
+    b.run()
+    del con.dashboards["a"]
+    assert b.run()["removed"] == 1
+    assert b.load_manifest()["dashboards"].keys() == ["1/b"]
+
+def test_incremental():
+    run(check_incremental)
+
+def test_failed_listing():
+    run(check_failed_listing)
+
+def test_removed():
+    run(check_removed)
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+# Behavior of the dashboard generation in worker processes. Runs without a Grafana
+# instance: python tests/test_bulk.py
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.dashboard import Dashboard, Row
+from pygrafana.bulk import generate
+
+def host_dashboard(host):
+    if host == "broken":
+        raise ValueError("No such host")
+    d = Dashboard("Host %s" % (host,))
+    d.add_row(Row(host))
+    return d
+
+def get_params(n, read):
+    for i in range(n):
+        read[0] = i + 1
+        yield "web%d" % (i,)
+
+def test_results():
+    res = list(generate(host_dashboard, ["web1", "broken", "web2"], processes=2, chunksize=1))
+    assert [r["index"] for r in res] == [0, 1, 2]
+    assert [r["status"] for r in res] == ["ok", "error", "ok"]
+    assert json.loads(res[2]["result"])["dashboard"]["title"] == "Host web2"
+    assert res[1]["error"] == "ValueError: No such host" and res[1]["params"] == "broken"
+
+def test_unordered():
+    read = [0]
+    res = list(generate(host_dashboard, get_params(40, read), processes=2, ordered=False, chunksize=3))
+    assert sorted([r["index"] for r in res]) == range(40)
+
+def test_streaming():
+    read = [0]
+    results = generate(host_dashboard, get_params(3000, read), processes=2, chunksize=4)
+    first = results.next()
+    assert first["index"] == 0 and first["status"] == "ok"
+    # At most two chunks per process in flight and the chunk submitted after the first result
+    assert read[0] <= 2 * 2 * 4 + 4, "%d parameter sets read" % (read[0],)
+    results.close()
+
+def test_unpicklable():
+    try:
+        generate(lambda p: Dashboard(p), ["a"]).next()
+    except ValueError:
+        pass
+    else:
+        assert False, "Lambda accepted as factory"
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
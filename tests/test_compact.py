@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+# Behavior of the collapsing of repeated rows and panels. Runs without a Grafana instance:
+# python tests/test_compact.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.compact import compact, get_entities
+
+def get_panel(host, pid):
+    return {"id" : pid, "title" : "CPU %s" % (host,), "type" : "graph",
+            "targets" : [{"measurement" : "cpu", "alias" : "%s idle" % (host,),
+                          "tags" : [{"key" : "host", "operator" : "=~", "value" : "/^%s$/" % (host,)}]}]}
+
+def get_row(host, pid):
+    return {"title" : host, "panels" : [get_panel(host, pid)]}
+
+def test_entities():
+    assert get_entities(get_row("web1", 1)) == {"host" : "web1"}
+    row = get_row("web1", 1)
+    row["panels"].append(get_panel("web2", 2))
+    assert get_entities(row) == {}
+
+def test_rows():
+    hosts = ["web%d" % (i,) for i in range(8)]
+    d = {"title" : "Hosts", "rows" : [get_row(h, i) for i, h in enumerate(hosts)] + [{"title" : "other", "panels" : []}]}
+    out, report = compact(d)
+    assert len(d["rows"]) == 9
+    assert report["rows_before"] == 9 and report["rows_after"] == 2
+    assert report["repeats"] == [("rows[0]", "host", hosts)]
+    assert report["bytes_after"] < report["bytes_before"]
+    row = out["rows"][0]
+    assert row["repeat"] == "host" and row["title"] == "$host"
+    target = row["panels"][0]["targets"][0]
+    assert target["alias"] == "$host idle" and target["tags"][0]["value"] == "/^$host$/"
+    template = out["templating"]["list"][0]
+    assert template["name"] == "host" and template["current"]["value"] == hosts
+
+def test_panels():
+    row = {"title" : "r", "panels" : [get_panel(h, i) for i, h in enumerate(["a", "b"])]}
+    out, report = compact({"title" : "d", "rows" : [row], "templating" : {"list" : [{"name" : "host"}]}})
+    assert report["panels_before"] == 2 and report["panels_after"] == 1
+    assert report["repeats"] == [("rows[0].panels[0]", "host_2", ["a", "b"])]
+    assert out["rows"][0]["panels"][0]["repeat"] == "host_2"
+
+def test_different():
+    rows = [get_row("web1", 1), get_row("web2", 2)]
+    rows[1]["panels"][0]["span"] = 6
+    out, report = compact({"title" : "d", "rows" : rows})
+    assert report["repeats"] == [] and out["rows"] == rows
+    out, report = compact({"title" : "d", "rows" : [get_row("web1", 1), get_row("web2", 2)]}, min_repeat=3)
+    assert report["repeats"] == []
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
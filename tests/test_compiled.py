@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+# Behavior of the precompiled dashboards with slots. Runs without a Grafana instance:
+# python tests/test_compiled.py
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.dashboard import Dashboard, Row, GraphPanel, Target
+from pygrafana.compiled import CompiledDashboard, slot
+
+def get_template():
+    host = slot("host")
+    query = "SELECT mean(\"value\") FROM \"%s\" WHERE \"host\" = '%s' AND \"dc\" =~ /^%s$/" % (slot("measurement"), host, host,)
+    return {"title" : "Host %s" % (host,),
+            "rows" : [{"title" : host, "panels" : [{"title" : "cpu", "type" : "graph",
+                       "targets" : [{"rawQuery" : True, "query" : query,
+                                     "tags" : [{"key" : "host", "operator" : "=~", "value" : "/^%s$/" % (host,)}]}]}]}]}
+
+def test_render():
+    c = CompiledDashboard(get_template())
+    assert sorted(c.get_slots()) == ["host", "measurement"]
+    d = json.loads(c.render(host="web1", measurement="cpu"))
+    assert d["title"] == "Host web1"
+    t = d["rows"][0]["panels"][0]["targets"][0]
+    assert t["query"] == "SELECT mean(\"value\") FROM \"cpu\" WHERE \"host\" = 'web1' AND \"dc\" =~ /^web1$/"
+    assert t["tags"][0]["value"] == "/^web1$/"
+
+def test_escaping():
+    c = CompiledDashboard(get_template())
+    host = "o'hara.example/\"x\""
+    d = json.loads(c.render(host=host, measurement="c\"pu"))
+    assert d["title"] == "Host " + host
+    t = d["rows"][0]["panels"][0]["targets"][0]
+    assert "FROM \"c\\\"pu\"" in t["query"]
+    assert "\"host\" = 'o\\'hara.example/\"x\"'" in t["query"]
+    assert "/^o'hara\\.example\\/\"x\"$/" in t["query"]
+    assert t["tags"][0]["value"] == "/^o'hara\\.example\\/\"x\"$/"
+
+def test_objects():
+    d = Dashboard("Host %s" % (slot("host"),))
+    r = Row("r")
+    r.add_panel(GraphPanel(title="cpu", targets=[Target("cpu", alias=slot("host"))]))
+    d.add_row(r)
+    c = CompiledDashboard(d)
+    out = json.loads(c.render({"host" : u"h\xf6st"}))
+    assert out["dashboard"]["title"] == u"Host h\xf6st"
+    assert out["dashboard"]["rows"][0]["panels"][0]["targets"][0]["alias"] == u"h\xf6st"
+    assert [json.loads(s)["dashboard"]["title"] for s in c.render_many([{"host" : "a"}, {"host" : "b"}])] == ["Host a", "Host b"]
+
+def test_missing_value():
+    try:
+        CompiledDashboard(get_template()).render(host="web1")
+    except ValueError:
+        pass
+    else:
+        assert False, "Rendered without a value for measurement"
+    try:
+        slot("no-slot")
+    except ValueError:
+        pass
+    else:
+        assert False, "Invalid slot name accepted"
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+# Behavior of the canonical encoding and the content hashes. Runs without a Grafana
+# instance: python tests/test_content_hash.py
+
+import collections
+import copy
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.dashboard import read_json, content_hash, canonical_json
+
+data = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+def load_export(name):
+    return json.load(open(os.path.join(data, name)))
+
+def test_ids_ignored():
+    a = load_export("grafana3_export.json")
+    b = copy.deepcopy(a)
+    b["id"] = 4711
+    b["version"] = 12
+    b["rows"][0]["panels"][0]["id"] = 99
+    assert content_hash(a) == content_hash(b)
+    b["rows"][0]["panels"][0]["span"] = 3
+    assert content_hash(a) != content_hash(b)
+
+def test_member_order():
+    a = load_export("grafana3_export.json")
+    b = json.loads(json.dumps(a), object_pairs_hook=lambda pairs: collections.OrderedDict(reversed(pairs)))
+    assert canonical_json(a) == canonical_json(b)
+    assert content_hash(a) == content_hash(json.dumps(b))
+
+def test_floats():
+    assert canonical_json({"span" : 6.0}) == canonical_json({"span" : 6})
+    try:
+        canonical_json({"max" : float("nan")})
+    except ValueError:
+        pass
+    else:
+        assert False, "NaN encoded"
+
+def test_objects():
+    d = read_json(load_export("grafana3_export.json"))
+    for version in ("2.6.0", "3.1.1"):
+        assert d.content_hash(version) == content_hash(d.get(version))
+        assert d.content_hash(version) == content_hash({"dashboard" : d.get(version)["dashboard"]})
+    before = d.content_hash("3.1.1")
+    row = d.rows[0].content_hash("3.1.1")
+    d.rows[0].panels[0].targets[0].add_tag("dc", "eu")
+    assert d.content_hash("3.1.1") != before
+    assert d.rows[0].content_hash("3.1.1") != row
+    assert d.content_hash("3.1.1") == content_hash(d.get("3.1.1"))
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
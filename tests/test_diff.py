@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+# Behavior of the structural diff and patch of dashboards. Runs without a Grafana instance:
+# python tests/test_diff.py
+
+import copy
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.diff import diff, patch, is_changed
+
+data = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+def load_export(name):
+    return json.load(open(os.path.join(data, name)))
+
+def get_dashboard(titles):
+    return {"title" : "d", "rows" : [{"title" : "r", "panels" : [{"title" : t, "type" : "graph", "span" : 4}
+                                                                for t in titles]}]}
+
+def check_roundtrip(a, b):
+    ops = diff(a, b)
+    assert patch(copy.deepcopy(a), ops) == b, ops
+    return ops
+
+def test_roundtrip():
+    a = load_export("grafana3_export.json")
+    b = copy.deepcopy(a)
+    b["rows"][0]["panels"][0]["targets"][0]["alias"] = "changed"
+    b["rows"][0]["panels"][0]["title"] = "renamed"
+    b["rows"].insert(0, {"title" : "first", "panels" : []})
+    b["templating"]["list"].reverse()
+    del b["links"]
+    check_roundtrip(a, b)
+
+def test_insert_row():
+    a = {"title" : "d", "rows" : [{"title" : "r%d" % (i,), "panels" : []} for i in range(5)]}
+    b = copy.deepcopy(a)
+    b["rows"].insert(1, {"title" : "new", "panels" : []})
+    ops = check_roundtrip(a, b)
+    assert [op["op"] for op in ops] == ["add"], ops
+
+def test_duplicate_identities():
+    a = get_dashboard(["cpu", "cpu", "cpu#2"])
+    b = copy.deepcopy(a)
+    b["rows"][0]["panels"][1]["span"] = 6
+    b["rows"][0]["panels"][2]["span"] = 8
+    ops = check_roundtrip(a, b)
+    assert len(set([op["path"] for op in ops])) == 2, ops
+    b = get_dashboard(["cpu#2", "cpu", "cpu"])
+    check_roundtrip(a, b)
+
+def test_escaped_paths():
+    a = get_dashboard(["in/out", "a~b"])
+    b = copy.deepcopy(a)
+    for p in b["rows"][0]["panels"]:
+        p["span"] = 12
+    check_roundtrip(a, b)
+
+def test_ignore():
+    a = get_dashboard(["cpu"])
+    b = copy.deepcopy(a)
+    b["id"] = 7
+    b["version"] = 3
+    assert not is_changed(a, b)
+    assert is_changed(a, b, ignore=[])
+
+def test_invalid_patch():
+    ops = diff(get_dashboard(["cpu"]), get_dashboard(["mem"]))
+    try:
+        patch(get_dashboard(["disk"]), ops)
+    except ValueError:
+        pass
+    else:
+        assert False, "Patch of another dashboard applied"
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+# Behavior of operations on many Grafana instances. Uses connections to a closed port, so it
+# runs without a Grafana instance: python tests/test_fleet.py
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.api import Connection
+from pygrafana.fleet import Fleet, FleetReport
+
+def get_connection():
+    return Connection("127.0.0.1", 1, apitoken="token", timeout=1)
+
+def get_fleet(n):
+    return Fleet(dict([("g%d" % (i,), get_connection()) for i in range(n)]), workers=2, deadline=0.5)
+
+def test_connections():
+    fleet = get_fleet(2)
+    assert fleet.get_names() == ["g0", "g1"]
+    assert not fleet.add_connection(object(), "g2")
+    assert fleet.add_connection(get_connection())
+    assert fleet.get_names() == ["127.0.0.1:1", "g0", "g1"]
+    assert fleet.del_connection("g0") and not fleet.del_connection("g0")
+    assert not fleet.set_workers(0) and not fleet.set_deadline(-1)
+
+def test_run():
+    fleet = get_fleet(4)
+    release = threading.Event()
+    def operation(con, value):
+        if con is fleet.get_connection("g1"):
+            raise ValueError("Broken")
+        if con is fleet.get_connection("g2"):
+            release.wait(5)
+        return value
+    report = fleet.run(operation, 7)
+    release.set()
+    assert report.operation == "operation"
+    assert report.get_succeeded() == ["g0", "g3"] and report.get_failed() == ["g1", "g2"]
+    assert report.get_result("g0") == 7 and report.get_result("g1") == None
+    assert report.get()["counts"] == {"ok" : 2, "error" : 1, "timeout" : 1}
+    assert not report.is_success()
+
+def test_methods():
+    fleet = get_fleet(2)
+    report = fleet.run_on(["g1", "unknown"], "is_connected")
+    assert report.get_names() == ["g1"] and report.get_result("g1") == False
+    assert fleet.run("no_such_method").get_names() == []
+    assert fleet.probe().get_failed() == ["g0", "g1"]
+
+def test_add_instances():
+    fleet = Fleet(workers=2)
+    report = fleet.add_instances([{"hostname" : "127.0.0.1", "port" : 1, "apitoken" : "token"}])
+    assert report.get_failed() == ["127.0.0.1:1"] and fleet.get_names() == []
+
+def test_report():
+    report = FleetReport("op", {"a" : {"status" : "ok", "result" : 1, "error" : None, "duration" : 0.1}})
+    assert report.is_success() and report.get()["instances"] == 1
+    assert "a: ok" in str(report)
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
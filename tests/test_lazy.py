@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+# Behavior of the lazily decoded dashboards. Runs without a Grafana instance:
+# python tests/test_lazy.py
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.lazy import LazyDashboard
+
+data = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+def load_export(name):
+    d = json.load(open(os.path.join(data, name)))
+    # Member unknown to the model objects
+    d["rows"][0]["panels"][0]["thresholds"] = [{"value" : 90, "colorMode" : "critical"}]
+    return d
+
+def test_unchanged():
+    s = json.dumps(load_export("grafana3_export.json"), indent=3)
+    d = LazyDashboard(s)
+    assert d.get_field("title") == "Cluster Overview"
+    d.get_rows()[0].get_panels()[0].get_field("targets")
+    assert not d.is_changed()
+    assert d.get_json() == s
+    wrapped = json.dumps({"meta" : {"slug" : "x"}, "dashboard" : json.loads(s)})
+    assert LazyDashboard(wrapped).get_json() == wrapped
+
+def test_set_field():
+    src = load_export("grafana3_export.json")
+    d = LazyDashboard(json.dumps(src))
+    d.set_field("refresh", "1m")
+    d.set_field("new", [1])
+    assert d.del_field("gnetId")
+    out = json.loads(d.get_json())
+    del src["gnetId"]
+    src["refresh"] = "1m"
+    src["new"] = [1]
+    assert out == src
+
+def test_patch_panel():
+    src = load_export("grafana3_export.json")
+    d = LazyDashboard({"dashboard" : src, "overwrite" : True})
+    panel = d.get_rows()[0].get_panels()[0]
+    panel.get_targets()[1].add_tag("host", "web1")
+    out = json.loads(d.get_json())
+    assert out["overwrite"] == True
+    p = out["dashboard"]["rows"][0]["panels"][0]
+    assert p["thresholds"] == src["rows"][0]["panels"][0]["thresholds"]
+    assert p["targets"][0] == src["rows"][0]["panels"][0]["targets"][0]
+    assert "\"host\" = 'web1'" in p["targets"][1]["query"]
+    del p["targets"]
+    expected = dict(src["rows"][0]["panels"][0])
+    del expected["targets"]
+    assert p == expected
+
+def test_templates():
+    src = load_export("grafana3_export.json")
+    d = LazyDashboard(json.dumps(src))
+    t = d.get_templates()[0]
+    assert t.name == src["templating"]["list"][0]["name"]
+    t.set_refresh(False)
+    out = json.loads(d.get_json())
+    template = out["templating"]["list"][0]
+    assert not template["refresh"]
+    for k, v in src["templating"]["list"][0].iteritems():
+        assert k == "refresh" or template[k] == v, k
+    assert out["rows"] == src["rows"]
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
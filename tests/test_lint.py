@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+# Behavior of the query cost lint and its rewrites. Runs without a Grafana instance:
+# python tests/test_lint.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.lint import Linter, lint, fix
+
+def get_target(value, operator="=~", groupBy=None):
+    if groupBy == None:
+        groupBy = [{"type" : "time", "params" : ["$interval"]}]
+    return {"measurement" : "cpu", "refId" : "A", "groupBy" : groupBy,
+            "tags" : [{"key" : "host", "operator" : operator, "value" : value}]}
+
+def get_dashboard(targets, refresh="5s"):
+    return {"title" : "d", "refresh" : refresh,
+            "rows" : [{"title" : "r", "panels" : [{"title" : "p", "type" : "graph", "targets" : targets}]}]}
+
+def get_codes(res):
+    return [(path, code) for path, code, message in res["issues"]]
+
+def test_costs():
+    grouped = {"measurement" : "cpu", "groupBy" : [{"type" : "time", "params" : ["1m"]}, {"type" : "fill", "params" : ["none"]}]}
+    assert lint(grouped) == {"cost" : 1, "panels" : {}, "issues" : [], "cost_per_minute" : None}
+    res = lint(get_dashboard([grouped, {"measurement" : "cpu"}], refresh="30s"))
+    assert res["cost"] == 11 and res["cost_per_minute"] == 22.0
+    assert get_codes(res) == [("rows[0].panels[0].targets[1]", "raw-points")]
+
+def test_regex():
+    res = lint(get_target("/web/"))
+    assert get_codes(res) == [("", "no-fill"), ("tags[0]", "unanchored-regex")] and res["cost"] == 3
+    res = lint(get_target("/^web1$/"))
+    assert get_codes(res) == [("", "no-fill"), ("tags[0]", "exact-regex")] and res["cost"] == 1
+
+def test_fix():
+    d = get_dashboard([get_target("/^web1$/", "!~"), get_target("/$host/")])
+    fixed, applied = Linter(heavy_cost=1).fix(d)
+    assert d["refresh"] == "5s" and d["rows"][0]["panels"][0]["targets"][0]["tags"][0]["value"] == "/^web1$/"
+    targets = fixed["rows"][0]["panels"][0]["targets"]
+    assert targets[0]["tags"][0] == {"key" : "host", "operator" : "!=", "value" : "web1"}
+    assert targets[0]["groupBy"][-1] == {"type" : "fill", "params" : ["null"]}
+    assert targets[1]["tags"][0]["value"] == "/$host/"
+    assert fixed["refresh"] == "1m"
+    assert ("refresh", "fast-refresh") in applied
+    assert ("rows[0].panels[0].targets[1].tags[0]", "unanchored-regex") not in applied
+
+def test_anchor_variables():
+    fixed, applied = fix(get_target("/$host/"), anchor_variables=True)
+    assert fixed["tags"][0]["value"] == "/^$host$/"
+    fixed, applied = fix(get_target("/web/"), anchor_variables=True)
+    assert fixed["tags"][0]["value"] == "/web/"
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
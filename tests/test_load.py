@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+# Behavior of the query load estimate and the refresh governor. Runs without a Grafana
+# instance: python tests/test_load.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.dashboard import Dashboard, Row, GraphPanel, SingleStat, Target
+from pygrafana.load import LoadModel, Governor
+
+def get_dashboard(title, targets, refresh="10s", datasource=None):
+    p = {"title" : "p", "type" : "graph", "targets" : [{"measurement" : "cpu"} for i in range(targets)]}
+    if datasource:
+        p["datasource"] = datasource
+    return {"title" : title, "refresh" : refresh, "rows" : [{"title" : "r", "panels" : [p]}]}
+
+def test_estimate():
+    dashboards = [get_dashboard("A", 10), get_dashboard("B", 5, refresh="1m", datasource="graphite"),
+                  get_dashboard("C", 10, refresh="")]
+    res = LoadModel(viewers={"a" : 3}).estimate(dashboards)
+    assert res["dashboards"] == [{"default" : 3.0}, {"graphite" : 5 / 60.0}, {}]
+    assert res["total"] == 3.0 + 5 / 60.0
+
+def test_plan():
+    dashboards = [get_dashboard("A", 10), get_dashboard("B", 10), get_dashboard("C", 1, datasource="other")]
+    governor = Governor({"default" : 1.0})
+    assert governor.plan(dashboards) == [30, 30, None]
+    assert governor.plan(dashboards) == [30, 30, None]
+    assert Governor(10.0).plan(dashboards) == [None, None, None]
+    assert Governor(10.0, min_refresh="1m").plan(dashboards) == [60, 60, 60]
+
+def test_apply_dictionaries():
+    dashboards = [get_dashboard("A", 10), get_dashboard("B", 1)]
+    res = Governor(0.5).apply(dashboards)
+    assert res["changes"] == [("a", "10s", "30s")] and res["skipped"] == []
+    assert res["after"]["total"] <= 0.5 < res["before"]["total"]
+    assert dashboards[0]["rows"][0]["panels"][0]["interval"] == ">30s"
+    assert dashboards[0]["timepicker"]["refresh_intervals"] == ["30s"]
+    assert not dashboards[1]["rows"][0]["panels"][0].has_key("interval")
+
+def test_apply_objects():
+    d = Dashboard("Objects", refresh="10s")
+    r = Row("r")
+    r.add_panel(GraphPanel(title="graph", targets=[Target("cpu") for i in range(5)]))
+    r.add_panel(SingleStat(title="stat", targets=[Target("mem")], interval=">1h"))
+    d.add_row(r)
+    res = Governor(0.2).apply([d])
+    assert res["changes"] == [("objects", "10s", "30s")] and res["skipped"] == []
+    assert d.refresh == "30s" and "30s" in d.timepicker.refresh_intervals
+    panels = d.rows[0].panels
+    assert panels[0].interval == ">30s" and panels[1].interval == ">1h"
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+# Behavior of the local SQLite mirror. Runs without a Grafana instance:
+# python tests/test_mirror.py
+
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.mirror import Mirror
+from fake import FakeConnection
+
+def get_connection():
+    return FakeConnection({"a" : {"id" : 1, "title" : "A", "version" : 1, "tags" : ["web"], "rows" : []},
+                           "b" : {"id" : 2, "title" : "B", "version" : 1, "tags" : [], "rows" : []}})
+
+def run(f):
+    directory = tempfile.mkdtemp()
+    try:
+        f(directory)
+    finally:
+        shutil.rmtree(directory)
+
+def check_refresh(directory):
+    con = get_connection()
+    m = Mirror(con, os.path.join(directory, "mirror.db"), workers=2)
+    stats = m.refresh()
+    assert stats["orgs"]["added"] == 1 and stats["dashboards"] == 2
+    assert m.get_orgs() == [{"id" : 1, "name" : "Main Org."}]
+    assert [d["slug"] for d in m.get_dashboards(1)] == ["a", "b"]
+    assert m.get_dashboard("a", 1)["title"] == "A"
+    assert m.get_dashboards_by_tag("web") == [{"oid" : 1, "slug" : "a", "title" : "A"}]
+    assert m.get_last_refresh() != None
+    m.close()
+
+def check_incremental(directory):
+    con = get_connection()
+    m = Mirror(con, os.path.join(directory, "mirror.db"), workers=2)
+    m.refresh()
+    assert m.refresh()["dashboards"] == 0
+    con.edit("b", tags=["web"])
+    del con.dashboards["a"]
+    assert m.refresh()["dashboards"] == 1
+    assert m.get_dashboards_by_tag("web") == [{"oid" : 1, "slug" : "b", "title" : "B"}]
+    assert m.get_dashboard("a", 1) == {}
+    assert m.refresh(full=True)["dashboards"] == 1
+    m.close()
+
+def check_shared(directory):
+    path = os.path.join(directory, "mirror.db")
+    m = Mirror(get_connection(), path)
+    m.refresh()
+    m.close()
+    reader = Mirror(FakeConnection(), path)
+    assert [d["slug"] for d in reader.get_dashboards()] == ["a", "b"]
+    reader.close()
+
+def test_refresh():
+    run(check_refresh)
+
+def test_incremental():
+    run(check_incremental)
+
+def test_shared():
+    run(check_shared)
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+# Behavior of the concurrent calls with deadlines. Runs without a Grafana instance:
+# python tests/test_parallel.py
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.parallel import run_parallel
+
+def test_results():
+    def call(x):
+        if x == 3:
+            raise KeyError(x)
+        time.sleep(0.01 * (5 - x))
+        return x * x
+    res = run_parallel(call, range(5), workers=3)
+    assert [r["status"] for r in res] == ["ok", "ok", "ok", "error", "ok"]
+    assert [r["result"] for r in res] == [0, 1, 4, None, 16]
+    assert res[3]["error"] == "KeyError: 3"
+
+def test_workers():
+    lock = threading.Lock()
+    running = [0, 0]
+    def call(x):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+    run_parallel(call, range(12), workers=3)
+    assert running[1] == 3
+
+def test_timeout():
+    release = threading.Event()
+    def call(x):
+        if x == 0:
+            release.wait(5)
+        return x
+    start = time.time()
+    res = run_parallel(call, range(4), workers=1, timeout=0.2)
+    assert time.time() - start < 2
+    assert [r["status"] for r in res] == ["timeout", "ok", "ok", "ok"]
+    assert [r["result"] for r in res] == [None, 1, 2, 3]
+    release.set()
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
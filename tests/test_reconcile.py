@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+# Behavior of the reconciliation of dashboards. Runs without a Grafana instance:
+# python tests/test_reconcile.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.dashboard import Dashboard, Row, GraphPanel, Target, set_grafana_version
+from pygrafana.reconcile import Reconciler
+from fake import FakeConnection
+
+def get_dashboard(title):
+    d = Dashboard(title)
+    r = Row("CPU")
+    r.add_panel(GraphPanel(title="cpu", targets=[Target("cpu")]))
+    d.add_row(r)
+    return d
+
+def get_state(dashboards):
+    return {"orgs" : [{"name" : "Main Org.", "dashboards" : dashboards}]}
+
+def get_kinds(ops):
+    return [op.kind for op in ops]
+
+def test_push_and_steady():
+    con = FakeConnection()
+    state = get_state([get_dashboard("Web Hosts")])
+    res = Reconciler(con, state, prune=True).apply()
+    assert con.pushed == ["web-hosts"], con.pushed
+    assert get_kinds(Reconciler(con, state, prune=True).plan()) == []
+
+def test_connection_version():
+    # Dashboards are compared in the layout of the connection's Grafana version
+    con = FakeConnection(grafana_version="3.1.1")
+    set_grafana_version("3.1.1")
+    Reconciler(con, get_state([get_dashboard("Web Hosts")])).apply()
+    set_grafana_version("2.6.0")
+    try:
+        ops = Reconciler(con, get_state([get_dashboard("Web Hosts")])).plan()
+    finally:
+        set_grafana_version("3.1.1")
+    assert get_kinds(ops) == []
+    assert con.dashboards["web-hosts"]["rows"][0]["panels"][0].has_key("yaxes")
+
+def test_prune_keeps_desired_titles():
+    # The naive slug of "Web_Hosts (prod)" differs from the slug Grafana reports
+    con = FakeConnection()
+    Reconciler(con, get_state([get_dashboard("Web_Hosts (prod)")])).apply()
+    con.add_dashboard(get_dashboard("Old").get_json())
+    ops = Reconciler(con, get_state([get_dashboard("Web_Hosts (prod)")]), prune=True).plan()
+    assert [(op.kind, op.name) for op in ops] == [("delete_dashboard", "old")]
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
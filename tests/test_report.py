@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+# Behavior of the size report and the dashboard budgets. Runs without a Grafana instance:
+# python tests/test_report.py
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.dashboard import read_json
+from pygrafana.report import analyze, Budget
+
+data = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+def load_export(name):
+    return json.load(open(os.path.join(data, name)))
+
+def get_dashboard():
+    d = load_export("grafana3_export.json")
+    # Decoded again instead of copied, the keys of the duplicate targets have the same order
+    panel = load_export("grafana3_export.json")["rows"][0]["panels"][0]
+    d["rows"].append({"title" : "copy", "panels" : [panel]})
+    return d
+
+def test_sizes():
+    d = get_dashboard()
+    res = analyze(d)
+    assert res["bytes"] == len(json.dumps(d))
+    assert res["sizes"]["rows[1].panels[0]"] == len(json.dumps(d["rows"][1]["panels"][0]))
+    assert res["counts"]["rows"] == 2 and res["counts"]["panels"] == 2
+    assert analyze(json.dumps({"dashboard" : d}))["bytes"] == res["bytes"]
+
+def test_objects():
+    d = read_json(load_export("grafana3_export.json"))
+    assert analyze(d, "3.1.1")["bytes"] == len(json.dumps(d.get("3.1.1")["dashboard"]))
+
+def test_duplicates():
+    res = analyze(get_dashboard())
+    assert res["duplicates"] == [["rows[0].panels[0].targets[0]", "rows[1].panels[0].targets[0]"]]
+
+def test_budget():
+    d = get_dashboard()
+    res = analyze(d)
+    assert Budget(max_bytes=res["bytes"], max_panels=2, max_duplicates=1).check(d) == []
+    errors = Budget(max_bytes=res["bytes"] - 1, max_panels=1, max_duplicates=0,
+                    max_panel_bytes=res["sizes"]["rows[0].panels[0]"] - 1).check(d)
+    paths = [path for path, message in errors]
+    assert paths == ["", "rows[0].panels[0]", "rows[1].panels[0]", "rows", "rows"], errors
+    assert "rows[0].panels[0].targets[0]" in errors[-1][1]
+    assert not Budget(max_targets=1).is_within(d)
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+# Reads a dashboard exported from Grafana 3.x into the object model and checks that the
+# panels, targets and template queries are written back unchanged. Runs without a Grafana
+# instance: python tests/test_roundtrip.py
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.dashboard import read_json
+
+data = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+def load_export(name):
+    return json.load(open(os.path.join(data, name)))
+
+def get_panels(d):
+    return [p for r in d["rows"] for p in r["panels"]]
+
+def test_panels_3():
+    src = load_export("grafana3_export.json")
+    out = read_json(src).get("3.1.1")["dashboard"]
+    for sp, op in zip(get_panels(src), get_panels(out)):
+        for k in sp.keys():
+            assert sp[k] == op.get(k), "Panel %s: %s != %s" % (k, sp[k], op.get(k))
+
+def test_targets_2():
+    src = load_export("grafana3_export.json")
+    out = read_json(src).get("2.6.0")["dashboard"]
+    raw, hidden = get_panels(out)[0]["targets"]
+    assert raw["rawQuery"] == True
+    assert raw["query"] == get_panels(src)[0]["targets"][0]["query"]
+    assert hidden["rawQuery"] == False and hidden["hide"] == True
+    assert hidden["query"].startswith('SELECT mean("usage_idle") FROM "cpu"')
+
+def test_edit_targets():
+    src = load_export("grafana3_export.json")
+    d = read_json(src)
+    raw, built = d.rows[0].panels[0].targets
+    raw.add_tag("dc", "eu")
+    built.add_tag("host", "web1")
+    for version in ("2.6.0", "3.1.1"):
+        out = get_panels(d.get(version)["dashboard"])[0]["targets"]
+        assert out[0]["query"] == get_panels(src)[0]["targets"][0]["query"]
+        assert "\"host\" = 'web1'" in out[1]["query"]
+
+def test_series_overrides():
+    src = load_export("grafana3_export.json")
+    for version in ("2.6.0", "3.1.1"):
+        out = read_json(src).get(version)["dashboard"]
+        assert get_panels(out)[0]["seriesOverrides"] == get_panels(src)[0]["seriesOverrides"]
+
+def test_template_queries():
+    src = load_export("grafana3_export.json")
+    out = read_json(src).get("3.1.1")["dashboard"]
+    for st, ot in zip(src["templating"]["list"], out["templating"]["list"]):
+        assert st["query"] == ot["query"]
+
+def test_json():
+    src = load_export("grafana3_export.json")
+    d = read_json(src)
+    assert read_json(d.get_json("3.1.1")).get("3.1.1") == d.get("3.1.1")
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+
+# Behavior of the migration of stored dashboards. Runs without a Grafana instance:
+# python tests/test_schema.py
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.schema import migrate_many
+
+def get_docs(n, read):
+    for i in range(n):
+        read[0] = i + 1
+        yield "%d.json" % (i,), json.dumps({"title" : "d%d" % (i,), "rows" : []})
+
+def test_migrate_many_streaming():
+    read = [0]
+    results = migrate_many(get_docs(3000, read), processes=2, chunksize=4)
+    first = results.next()
+    assert first["name"] == "0.json" and first["status"] == "ok"
+    # At most two chunks per process in flight and the chunk submitted after the first result
+    assert read[0] <= 2 * 2 * 4 + 4, "%d documents read" % (read[0],)
+    results.close()
+
+def test_migrate_many_order():
+    read = [0]
+    names = [res["name"] for res in migrate_many(get_docs(50, read), processes=2, chunksize=3)]
+    assert names == ["%d.json" % (i,) for i in range(50)]
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
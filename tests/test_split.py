@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+
+# Behavior of the splitting of large dashboards. Runs without a Grafana instance:
+# python tests/test_split.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.dashboard import Dashboard, Row, GraphPanel, Target, Template
+from pygrafana.split import Splitter, split
+
+def get_dashboard(rows, panels, targets):
+    d = Dashboard("Hosts")
+    d.add_template(Template("host", "SHOW TAG VALUES WITH KEY = host"))
+    for i in range(rows):
+        r = Row("r%d" % (i,))
+        for j in range(panels):
+            r.add_panel(GraphPanel(title="p%d" % (j,), targets=[Target("cpu") for k in range(targets)]))
+        d.add_row(r)
+    return d
+
+def get_panels(d):
+    return [(r.title, p.title) for r in d.rows for p in r.panels]
+
+def test_within_budget():
+    d = get_dashboard(2, 2, 1)
+    assert split(d, max_panels=4) == [d]
+
+def test_parts():
+    d = get_dashboard(5, 3, 2)
+    parts = split(d, max_panels=6, max_targets=12)
+    assert [p.title for p in parts] == ["Hosts", "Hosts 2", "Hosts 3"]
+    assert [len(p.rows) for p in parts] == [2, 2, 1]
+    assert sum([get_panels(p) for p in parts], []) == get_panels(d)
+    for p in parts:
+        assert len(p.templates) == 1
+        assert [l["title"] for l in p.links] == ["Hosts", "Hosts 2", "Hosts 3"]
+    # Deterministic: the same input gives the same parts
+    assert [get_panels(p) for p in split(d, max_panels=6, max_targets=12)] == [get_panels(p) for p in parts]
+
+def test_large_row():
+    d = get_dashboard(1, 5, 1)
+    parts = split(d, max_panels=2)
+    assert [[r.title for r in p.rows] for p in parts] == [["r0"], ["r0"], ["r0"]]
+    assert sum([get_panels(p) for p in parts], []) == get_panels(d)
+
+def test_check():
+    d = get_dashboard(2, 1, 4)
+    assert Splitter(max_targets=4).check(d) == []
+    errors = Splitter(max_targets=3, max_queries=4).check(d)
+    assert [part for part, e in errors] == [1, 1, 2, 2], errors
+    assert "4 targets exceed 3 targets" in errors[0][1]
+    assert "5 queries (1 of templates) exceed 4 queries" in errors[1][1]
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+# Behavior of the validation of whole dashboards. Runs without a Grafana instance:
+# python tests/test_validate.py
+
+import copy
+import json
+import os
+import StringIO
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pygrafana.dashboard import read_json
+from pygrafana.validate import Validator, validate, is_valid
+
+data = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+def load_export(name):
+    return json.load(open(os.path.join(data, name)))
+
+def test_valid():
+    d = load_export("grafana3_export.json")
+    assert validate(d) == []
+    assert validate({"dashboard" : d}) == []
+    assert validate(json.dumps(d)) == []
+    assert validate(open(os.path.join(data, "grafana3_export.json"))) == []
+    assert validate(StringIO.StringIO(json.dumps(d))) == []
+    assert is_valid(read_json(d), "3.1.1")
+
+def test_errors():
+    d = load_export("grafana3_export.json")
+    d["refresh"] = "often"
+    panel = d["rows"][0]["panels"][0]
+    panel["span"] = 13
+    panel["targets"][1]["refId"] = panel["targets"][0]["refId"]
+    panel["targets"][1]["tags"] = [{"key" : "host", "operator" : "=~", "value" : "/^$server$/"}]
+    d["rows"].append({"title" : "copy", "panels" : [copy.deepcopy(panel)]})
+    paths = [path for path, message in validate(d)]
+    assert paths == ["refresh", "rows[0].panels[0].span", "rows[0].panels[0].targets[1].refId",
+                     "rows[0].panels[0].targets[1].tags[0].value", "rows[1].panels[0].id",
+                     "rows[1].panels[0].span", "rows[1].panels[0].targets[1].refId",
+                     "rows[1].panels[0].targets[1].tags[0].value"], paths
+    assert Validator(check_variables=False).validate({"title" : "t", "rows" : [{"panels" : [panel]}]}) == \
+           [("rows[0].panels[0].span", "Span must be a number between 1 and 12"),
+            ("rows[0].panels[0].targets[1].refId", "Duplicate refId %s" % (panel["targets"][0]["refId"],))]
+
+def test_invalid_documents():
+    assert validate("{")[0][0] == ""
+    assert validate(StringIO.StringIO("[]")) == [("", "Dashboard must be an object")]
+
+def test_panel_checks():
+    v = Validator()
+    def check_text(validator, p, path, errors):
+        if not p.get("content"):
+            errors.append((path + ".content", "Text panels need content"))
+    assert v.add_panel_check("text", check_text)
+    d = {"title" : "t", "rows" : [{"panels" : [{"id" : 1, "type" : "text"}]}]}
+    assert v.validate(d) == [("rows[0].panels[0].content", "Text panels need content")]
+    assert validate(d) == []
+
+def test_validate_many():
+    good = load_export("grafana3_export.json")
+    failed = Validator().validate_many([good, {"title" : ""}, good])
+    assert failed.keys() == [1]
+
+
+if __name__ == "__main__":
+    for name, f in sorted(globals().items()):
+        if name.startswith("test_"):
+            f()
+            print "%s ok" % (name,)